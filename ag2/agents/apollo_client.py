@@ -5,56 +5,97 @@ keeps only the business-relevant fields you care about.
 ENV
 ----
   APOLLO_API_KEY
+  PROVIDER_MODE   live | record | replay, see agents/cassette.py
+  APOLLO_REQUESTS_PER_MINUTE / APOLLO_MAX_CONCURRENCY / APOLLO_LATENCY_TARGET, see agents/rate_limiter.py
 
 TWEAK
 -----
   • Change MAX_PROSPECTS to control how many contacts you process per run.
   • Edit `wanted_top`, `wanted_employment`, … if you need more/less fields.
 """
-import os, json, requests
+import asyncio, os, json
+from contextlib import nullcontext
+import httpx
+from agents.cassette import REPLAY, CassetteMissError, get_cassette
+from agents.http_client import get_async_client
+from agents.metrics import provider_span
+from agents.provider_retry import TransientProviderError, call_with_retries
+from agents.rate_limiter import RateLimitedError, get_rate_limiter, parse_retry_after
+from agents.single_flight import get_single_flight, request_key
+from agents.usage_ledger import record_usage
 from typing import Dict, List, Any
 
 
 # ─────────── CONFIG ─────────── #
 API_KEY = os.getenv("APOLLO_API_KEY")
-BASE    = "https://api.apollo.io/api/v1"
+BASE    = os.getenv("APOLLO_BASE_URL", "https://api.apollo.io/api/v1")
 PEOPLE_SEARCH_ENDPOINT = "/mixed_people/search"
 PEOPLE_MATCH_ENDPOINT = "/people/match"
+PEOPLE_BULK_MATCH_ENDPOINT = "/people/bulk_match"
+BULK_MATCH_BATCH_SIZE = 10  # apollo accepts at most 10 people per bulk_match request
+APOLLO_TIMEOUT = 30
 
 class ApolloClient():
     """
     Specialist agent for interacting with the Apollo API and enriching contact info.
     """
 
-    def request_people_enrichment(self, name: str, title: str, company: str) -> Dict:
-        """Request Apollo to get a person's data https://docs.apollo.io/reference/people-enrichment"""
-        url = f"{BASE}{PEOPLE_MATCH_ENDPOINT}"
+    def __init__(self):
+        self.cassette = get_cassette()
+        # shared by every ApolloClient in the process, so all jobs draw from one budget
+        self.rate_limiter = get_rate_limiter("apollo")
+        # identical lookups already in flight (from any job) are joined instead of sent again
+        self.single_flight = get_single_flight("apollo")
 
-        headers = {
+    def headers(self) -> Dict:
+        return {
             "x-api-key": API_KEY,
             "accept": "application/json",
             "Content-Type": "application/json",
             "Cache-Control": "no-cache",
         }
 
-        params = {
-            "name": name, 
-            "organization_name": company,
-            "reveal_personal_emails": "true",
-            "reveal_personal_number": "false"
-            # TODO: add webhook_url, you need this for the phone number, apollo will send it in JSON there
-        }
-        response = requests.post(url, headers=headers, params=params, timeout=30)
+    async def post(self, endpoint: str, params: Dict = None, json_body: Dict = None, raise_transient: bool = False) -> Dict:
+        """
+        POST to an Apollo endpoint on the shared connection pool, printing (not raising) on errors.
+
+        With raise_transient, a 429 raises RateLimitedError and a 5xx, timeout or connection error raises
+        TransientProviderError instead, so the caller can retry it.
+        """
+        url = f"{BASE}{endpoint}"
+        client = get_async_client()
+        # apollo bills in credits per matched person rather than tokens, so only requests are counted
+        record_usage("apollo", endpoint, cost=0.0)
+
+        try:
+            async with (self.rate_limiter.slot() if self.rate_limiter else nullcontext(None)) as permit:
+                with provider_span("apollo", endpoint):
+                    response = await client.post(url, headers=self.headers(), params=params, json=json_body, timeout=APOLLO_TIMEOUT)
+                if response.status_code == 429 and permit is not None:
+                    permit.rate_limited(parse_retry_after(response.headers.get("retry-after")))
+                elif response.status_code >= 500 and permit is not None:
+                    permit.failed()
+        except httpx.TimeoutException as e:
+            print(f"Apollo API => Request timed out: {e}")
+            if raise_transient:
+                raise TransientProviderError(f"apollo {endpoint} timed out") from e
+            return {}
+        except httpx.RequestError as e:
+            print(f"Apollo API => Error during request: {e}")
+            if raise_transient:
+                raise TransientProviderError(f"apollo {endpoint} request error: {e}") from e
+            return {}
+
+        if raise_transient and response.status_code == 429:
+            raise RateLimitedError(f"apollo {endpoint} answered 429", parse_retry_after(response.headers.get("retry-after")))
+        if raise_transient and response.status_code >= 500:
+            raise TransientProviderError(f"apollo {endpoint} answered {response.status_code}")
 
         try:
             response.raise_for_status()
-        except requests.exceptions.Timeout as e:
-            print(f"Apollo API => Request timed out: {response.text}. Status code: {response.status_code}")
-        except requests.exceptions.HTTPError as e:
+        except httpx.HTTPStatusError as e:
             print(f"Apollo API => HTTP error occurred: {response.text}. Status code: {response.status_code}")
-        except requests.exceptions.RequestException as e:
-            print(f"Apollo API => Error during request: {response.text}. Status code: {response.status_code}")
-        
+
         try:
             response_json = response.json()
         except json.JSONDecodeError as e:
@@ -63,17 +104,60 @@ class ApolloClient():
 
         return response_json
 
+    async def request_people_enrichment(self, name: str, title: str, company: str) -> Dict:
+        """Request Apollo to get a person's data https://docs.apollo.io/reference/people-enrichment"""
+        params = {
+            "name": name, 
+            "organization_name": company,
+            "reveal_personal_emails": "true",
+            "reveal_personal_number": "false"
+            # TODO: add webhook_url, you need this for the phone number, apollo will send it in JSON there
+        }
+        response, shared = await self.single_flight.do(
+            request_key("apollo", PEOPLE_MATCH_ENDPOINT, params), lambda: self.fetch_people_enrichment(params)
+        )
+        if shared:
+            # the caller that started the call paid for it
+            record_usage("apollo", PEOPLE_MATCH_ENDPOINT, requests=0, cost=0.0, cached_requests=1)
+        return response
+
+    async def fetch_people_enrichment(self, params: Dict) -> Dict:
+        """One people/match lookup from the cassette or the API."""
+        if self.cassette is not None:
+            # post() times live calls itself, replayed ones are timed here
+            span = provider_span("apollo", PEOPLE_MATCH_ENDPOINT) if self.cassette.mode == REPLAY else nullcontext()
+            try:
+                with span:
+                    return await self.cassette.call(
+                        "apollo", PEOPLE_MATCH_ENDPOINT, params, lambda: self.post(PEOPLE_MATCH_ENDPOINT, params=params)
+                    )
+            except CassetteMissError as e:
+                print(f"Apollo API => {e}")
+                return {}
+        return await self.post(PEOPLE_MATCH_ENDPOINT, params=params)
+
+    async def request_bulk_people_enrichment(self, details: List[Dict]) -> Dict:
+        """
+        Request Apollo to match up to 10 people in one call https://docs.apollo.io/reference/bulk-people-enrichment
+
+        A 429, 5xx or timeout is retried as a whole batch (after Retry-After when Apollo sends one), {} once retries run out.
+        """
+        params = {
+            "reveal_personal_emails": "true",
+            "reveal_personal_number": "false"
+        }
+        try:
+            return await call_with_retries(
+                "apollo", PEOPLE_BULK_MATCH_ENDPOINT,
+                lambda: self.post(PEOPLE_BULK_MATCH_ENDPOINT, params=params, json_body={"details": details}, raise_transient=True),
+            )
+        except (RateLimitedError, TransientProviderError) as e:
+            print(f"Apollo API => bulk_match gave up after retries: {e}")
+            return {}
 
-    # ───────────────────────── main entrypoint ───────────────────────── #
-    def enrich_contact_info(self, company: str, person: Any) -> List[Dict]:
-        print("-------------------------------- enriching contact for ... --------------------------------")
-        print(company)
-        print(person)
+    def apply_apollo_person(self, person: Any, apolloPerson: Dict) -> Dict:
+        """Copy the business-relevant fields of an Apollo person onto our person record."""
         enrichedPerson = person.copy()
-
-        apolloPerson = self.request_people_enrichment(person["name"], person["title"], company).get("person")
-        print("-------------------------------- apolloPerson --------------------------------")
-        print(apolloPerson)
         if apolloPerson:
             enrichedPerson["email"] = apolloPerson.get("contact", {}).get("email")
             enrichedPerson["twitter_url"] = apolloPerson.get("twitter_url")
@@ -83,9 +167,55 @@ class ApolloClient():
             enrichedPerson["phone"] = apolloPerson.get("phone_numbers") # TODO: this is a list of phone numbers? Doc says they should be sent to the webhook?
             enrichedPerson["is_likely_to_engage"] = apolloPerson.get("is_likely_to_engage")
             enrichedPerson["email_status"] = apolloPerson.get("email_status")
+        return enrichedPerson
 
-        print("-------------------------------- enrichedPerson --------------------------------")
+
+    # ───────────────────────── main entrypoint ───────────────────────── #
+    async def enrich_contact_info(self, company: str, person: Any) -> List[Dict]:
+        print("-------------------------------- enriching contact for ... --------------------------------")
+        print(company)
+        print(person)
+
+        apolloPerson = (await self.request_people_enrichment(person["name"], person["title"], company)).get("person")
+        print("-------------------------------- apolloPerson --------------------------------")
         print(apolloPerson)
+        enrichedPerson = self.apply_apollo_person(person, apolloPerson)
+
+        print("-------------------------------- enrichedPerson --------------------------------")
+        print(enrichedPerson)
 
         return enrichedPerson
 
+    async def enrich_contact_info_bulk(self, company_people: List[tuple]) -> List[Dict]:
+        """
+        Enrich a list of (company name, person) pairs with bulk_match requests of up to 10 people each.
+
+        Results are returned in the same order as the input. When the bulk call answered, people whose slot
+        came back empty are retried with a single /people/match. When the whole batch failed its people are
+        returned unenriched: one lookup per person would send 10x the requests exactly while Apollo is throttling us.
+        """
+        batches = [company_people[i:i + BULK_MATCH_BATCH_SIZE] for i in range(0, len(company_people), BULK_MATCH_BATCH_SIZE)]
+
+        async def enrich_batch(batch):
+            details = [
+                {"name": person.get("name", ""), "title": person.get("title", ""), "organization_name": company}
+                for company, person in batch
+            ]
+            matches = (await self.request_bulk_people_enrichment(details)).get("matches")
+            if not isinstance(matches, list):
+                print(f"-------------------------------- apollo bulk_match failed, {len(batch)} people left unenriched --------------------------------")
+                return [self.apply_apollo_person(person, None) for _, person in batch]
+            print(f"-------------------------------- apollo bulk_match: {len([m for m in matches if m])}/{len(batch)} matched --------------------------------")
+
+            enriched = []
+            for i, (company, person) in enumerate(batch):
+                apolloPerson = matches[i] if i < len(matches) else None
+                if apolloPerson:
+                    enriched.append(self.apply_apollo_person(person, apolloPerson))
+                else:
+                    # partial failure, fall back to a single match for this person
+                    enriched.append(await self.enrich_contact_info(company, person))
+            return enriched
+
+        results = await asyncio.gather(*(enrich_batch(batch) for batch in batches))
+        return [person for batch in results for person in batch]
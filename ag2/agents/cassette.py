@@ -0,0 +1,154 @@
+# agents/cassette.py
+"""
+Record/replay of provider responses, so benchmarks and regression runs are repeatable and free.
+
+  live    every call goes to the provider (default)
+  record  every call goes to the provider and its response + latency are appended to the cassette
+  replay  calls are answered from the cassette and never reach the provider, a request that was
+          never recorded raises CassetteMissError
+
+Requests are matched by a normalized key (provider, operation and the request fields with case and
+whitespace folded), so cosmetic prompt differences still replay. The cassette is a JSON-lines file,
+one recorded call per line, easy to diff and to check in next to a regression test.
+
+ENV
+----
+  PROVIDER_MODE           live | record | replay (default live)
+  CASSETTE_PATH           JSON-lines file to record to / replay from (default .cache/cassette.jsonl)
+  CASSETTE_REPLAY_LATENCY "true" to sleep for each call's recorded latency on replay (default "false")
+"""
+import asyncio, json, os, re, threading, time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from agents.response_cache import make_cache_key
+
+
+# ─────────── CONFIG ─────────── #
+LIVE = "live"
+RECORD = "record"
+REPLAY = "replay"
+PROVIDER_MODE = os.getenv("PROVIDER_MODE", LIVE).lower()
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", os.path.join(".cache", "cassette.jsonl"))
+CASSETTE_REPLAY_LATENCY = os.getenv("CASSETTE_REPLAY_LATENCY", "false").lower() == "true"
+
+
+class CassetteMissError(RuntimeError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+def normalize_request_value(value: Any) -> Any:
+    """Fold case and whitespace in strings, recursively, so equivalent requests share a key."""
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value).strip().lower()
+    if isinstance(value, dict):
+        return {key: normalize_request_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_request_value(item) for item in value]
+    return value
+
+
+def cassette_key(provider: str, operation: str, request: Dict) -> str:
+    return make_cache_key(provider=provider, operation=operation, request=normalize_request_value(request))
+
+
+class Cassette():
+    """
+    Recorded provider calls keyed by cassette_key, backed by a JSON-lines file.
+    """
+
+    def __init__(self, path: str = CASSETTE_PATH, mode: str = PROVIDER_MODE, replay_latency: bool = CASSETTE_REPLAY_LATENCY):
+        if mode not in (LIVE, RECORD, REPLAY):
+            raise ValueError(f"PROVIDER_MODE must be one of live, record, replay (got {mode!r})")
+        self.path = path
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self.lock = threading.Lock()
+        # key is the cassette key, value is the recorded call (later recordings win)
+        self.entries: Dict[str, Dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+        if mode == REPLAY:
+            self.load()
+        elif mode == RECORD:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            print(f"-------------cassette {self.path} not found, every replayed call will miss-------------------")
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                self.entries[entry["key"]] = entry
+        print(f"-------------loaded {len(self.entries)} recorded calls from {self.path}-------------------")
+
+    async def call(self, provider: str, operation: str, request: Dict, live: Callable[[], Awaitable[Any]]) -> Any:
+        """Answer the request according to the mode, `live` makes the real provider call."""
+        if self.mode == LIVE:
+            return await live()
+
+        key = cassette_key(provider, operation, request)
+        if self.mode == REPLAY:
+            return await self.replay(key, provider, operation)
+
+        start = time.perf_counter()
+        response = await live()
+        # failed calls come back empty (apollo) or raise (perplexity), neither is worth replaying
+        if response not in (None, "", {}):
+            self.record(key, provider, operation, request, response, time.perf_counter() - start)
+        return response
+
+    async def replay(self, key: str, provider: str, operation: str) -> Any:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            raise CassetteMissError(f"Cassette => no recorded {provider} {operation} call matches this request")
+        self.hits += 1
+        if self.replay_latency:
+            await asyncio.sleep(entry.get("latency", 0.0))
+        return entry["response"]
+
+    def record(self, key: str, provider: str, operation: str, request: Dict, response: Any, latency: float):
+        entry = {
+            "key": key,
+            "provider": provider,
+            "operation": operation,
+            "request": request,
+            "response": response,
+            "latency": round(latency, 4),
+            "recorded_at": time.time(),
+        }
+        with self.lock:
+            self.entries[key] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.recorded += 1
+
+    def stats(self) -> Dict:
+        return {
+            "mode": self.mode,
+            "path": self.path,
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "recorded": self.recorded,
+        }
+
+
+_shared_cassette: Optional[Cassette] = None
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Return the process-wide cassette, or None when PROVIDER_MODE is live."""
+    global _shared_cassette
+    if PROVIDER_MODE == LIVE:
+        return None
+    if _shared_cassette is None:
+        _shared_cassette = Cassette()
+    return _shared_cassette
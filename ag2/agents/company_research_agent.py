@@ -1,74 +1,15 @@
 # agents/company_research_agent.py
 from autogen import Agent, config_list_from_json, ConversableAgent
 from agents.perplexity_client import PerplexityClient
-from agents.prompts import PERPLEXITY_COMPANY_RESEARCH_SYSTEM_MESSAGE, COMPANY_LIST_FORMATTER_SYSTEM_MESSAGE
+from agents.metrics import provider_span
+from agents.schemas import CompanyList
+from agents.structured_output import dump_json, generate_validated, structured_llm_config
+from agents.usage_ledger import track_agent_usage
+from agents.prompts import PERPLEXITY_COMPANY_RESEARCH_SYSTEM_MESSAGE, COMPANY_LIST_FORMATTER_SYSTEM_MESSAGE, COMPANY_RESEARCH_SYSTEM_MESSAGE
 from dotenv import load_dotenv
 
 load_dotenv()
 
-COMPANY_RESEARCH_SYSTEM_MESSAGE = """
-Role:
-You are a helpful AI assistant. Your job is to take structured JSON input describing a company (company_info), their product (product_info), and their ideal customer profile (ICP), and craft a clear, specific user prompt to pass to the PerplexitySearchTool. The goal is to search for companies that closely match the ICP for a sales agent at company_info to sell product_info to.
-
-Rules:
-- Only output the user prompt to be sent to the PerplexitySearchTool. Do not include any explanations, intermediate steps, or markdown formatting.
-- The prompt should be concise, search-friendly, and focused on finding companies that match the ICP.
-- Do not include the company described in company_info in the search results.
-- Avoid few-shot examples or multi-part instructions. Focus on a single, well-scoped search query.
-- Use relevant context from company_info, product_info, and ICP to make the search as specific as possible.
-- If any field is missing, only use the available information to make the best possible search prompt.
-
-
-Output:
--A single, well-formed user prompt string suitable for web search,
--THIS IS JUST AN EXAMPLE, DO NOT USE ANY OF THE DATA FROM THIS EXAMPLE
-"Find companies in the United States or Canada in the automotive manufacturing or parts supply industry, with 20-200 employees and $5M-$50M annual revenue, that are undergoing digital transformation or operate multiple production sites. Exclude SupplyStream Technologies. The ideal companies should be a good fit for selling StreamERP, a cloud-based ERP solution for automotive suppliers."
-
-The input JSON is in the following format:
-{
-    "company_info": {
-      "name": "SupplyStream Technologies",
-      "website": "https://www.supplystreamtech.com",
-      "description": "SupplyStream Technologies provides AI-driven ERP solutions for mid-sized automotive manufacturers, streamlining operations from procurement to distribution.",
-      "industry": "B2B SaaS",
-      "location": "Detroit, MI",
-      "employee_count": 45,
-      "annual_revenue": "12M"
-    },
-    "product_info": {
-      "name": "StreamERP",
-      "description": "StreamERP is a cloud-based ERP solution designed for automotive suppliers. It includes modules for inventory optimization, supplier integration, predictive maintenance, and production scheduling.",
-      "key_features": [
-        "Automated inventory forecasting",
-        "Supplier API integrations",
-        "Predictive equipment maintenance",
-        "Real-time production dashboards",
-        "Compliance reporting for ISO/TS standards"
-      ],
-      "competitive_advantages": [
-        "Tailored specifically for automotive supply chain",
-        "Easy integration with legacy systems",
-        "Rapid 6-week deployment model"
-      ]
-    },
-    "ICP": {
-      "target_titles": ["COO", "CFO", "VP of Operations", "VP of IT", "VP of Supply Chain", "VP of Manufacturing", "VP of Engineering", "VP of Quality", "VP of Sales", "VP of Marketing"],
-      "company_industry": "Automotive manufacturing or parts supply",
-      "employee_range": {
-        "min": 20,
-        "max": 200
-      },
-      "revenue_range_million_usd": {
-        "min": 5,
-        "max": 50
-      },
-      "target_regions": ["United States", "Canada"],
-      "additional_notes": "Prioritize companies currently undergoing digital transformation or operating multiple production sites."
-    }
-}
-""".strip()
-
-
 
 # ---------------------------------------------------------------------------
 # Agent definition
@@ -91,10 +32,11 @@ class CompanyResearchAgent(ConversableAgent):
         
         self.formatter_agent = ConversableAgent(
             name="FormatterAgent",
-            llm_config={"config_list": config_list},
+            llm_config=structured_llm_config(config_list, CompanyList),
             system_message=COMPANY_LIST_FORMATTER_SYSTEM_MESSAGE,
             human_input_mode="NEVER"  # Don't ask for human input since we're in API mode
         )
+        track_agent_usage(self.formatter_agent)
 
         # init agent
         super().__init__(
@@ -103,6 +45,7 @@ class CompanyResearchAgent(ConversableAgent):
             system_message=COMPANY_RESEARCH_SYSTEM_MESSAGE,
             human_input_mode="NEVER"  # Don't ask for human input since we're in API mode
         )
+        track_agent_usage(self)
 
     async def process_message(self, sender: Agent, message: str) -> str:
         """Process a single message and return the agent's response."""
@@ -121,12 +64,13 @@ class CompanyResearchAgent(ConversableAgent):
         
         # Get the prompt from the main agent
         self.receive(user_message, sender)
-        reply = self.generate_reply([user_message], sender=sender)
+        with provider_span("openai", self.name):
+            reply = self.generate_reply([user_message], sender=sender)
         print("-------------CompanyResearchAgent prompt-------------------")
         print(reply)
 
         # Search for companies using the PerplexityClient
-        searchResponse = self.perplexity_client.search(PERPLEXITY_COMPANY_RESEARCH_SYSTEM_MESSAGE, reply)
+        searchResponse = await self.perplexity_client.search(PERPLEXITY_COMPANY_RESEARCH_SYSTEM_MESSAGE, reply)
         print("-------------perplexity_client company response-------------------")
         print(searchResponse)
 
@@ -136,7 +80,12 @@ class CompanyResearchAgent(ConversableAgent):
             "content": searchResponse
         }
         self.formatter_agent.receive(user_message, self)
-        formattedResponse = self.formatter_agent.generate_reply([user_message], sender=sender)
-
-        return formattedResponse
+        companyList, formattedResponse = generate_validated(self.formatter_agent, [user_message], sender, CompanyList)
+        if companyList is None:
+            # an empty list stops the pipeline here instead of researching people at garbage companies
+            print("-------------company list could not be formatted-------------------")
+            print(formattedResponse)
+            return dump_json(CompanyList(company_list=[]))
+
+        return dump_json(companyList)
     
\ No newline at end of file
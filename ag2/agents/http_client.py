@@ -0,0 +1,74 @@
+# agents/http_client.py
+"""
+Shared keep-alive HTTP client used by the provider clients (Perplexity, Apollo).
+
+One `httpx.AsyncClient` is kept per event loop so every outbound call reuses the
+same connection pool instead of paying for a new TCP/TLS handshake each time.
+
+ENV
+----
+  HTTP_MAX_CONNECTIONS            max open connections in the pool (default 50)
+  HTTP_MAX_KEEPALIVE_CONNECTIONS  max idle keep-alive connections (default 20)
+  HTTP_KEEPALIVE_EXPIRY           seconds an idle connection is kept (default 30)
+"""
+import asyncio, os
+import httpx
+import nest_asyncio
+
+
+# ─────────── CONFIG ─────────── #
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# key is the event loop the client was created on, value is the client
+# (an AsyncClient's connections are bound to the loop that opened them)
+_clients: dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the shared AsyncClient for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+
+    # drop clients that belong to loops that have since been closed
+    for stale_loop in [l for l in _clients if l.is_closed()]:
+        del _clients[stale_loop]
+
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        client = httpx.AsyncClient(limits=limits, http2=False)
+        _clients[loop] = client
+    return client
+
+
+async def close_async_clients():
+    """Close the shared client for the running loop (call on app shutdown)."""
+    loop = asyncio.get_running_loop()
+    client = _clients.pop(loop, None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+async def _run_and_close(coro):
+    try:
+        return await coro
+    finally:
+        await close_async_clients()
+
+
+def run_sync(coro):
+    """Run a coroutine from sync code, reusing the current loop when one is already running."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_run_and_close(coro))
+
+    # a loop is already running (e.g. inside FastAPI), patch it so it can be re-entered
+    # (a no-op when main.py already applied nest_asyncio), run_until_complete would raise otherwise
+    nest_asyncio.apply(loop)
+    return loop.run_until_complete(coro)
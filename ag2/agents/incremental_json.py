@@ -0,0 +1,125 @@
+# agents/incremental_json.py
+"""
+Incremental parser for a JSON reply that arrives in chunks (a streamed LLM response).
+
+Feed it text as it arrives and it hands back every element of the target array (e.g. "leads_list")
+the moment that element's closing brace arrives, long before the reply is complete. Elements are
+parsed one by one, so a reply that is cut off or malformed at the end still yields every element
+that closed before the damage.
+
+    parser = IncrementalJSONArrayParser("leads_list")
+    for chunk in stream:
+        for lead in parser.feed(chunk):
+            ...
+    result = parser.result()
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+
+class IncrementalJSONArrayParser():
+    """
+    Emits the object elements of the first array stored under `key`, as each one closes.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.buffer = ""
+        self.position = 0
+        self.elements: List[Any] = []
+
+        # scanner state
+        self.stack: List[str] = []          # open containers, "{" or "["
+        self.in_string = False
+        self.escaped = False
+        self.string_start = -1
+        self.last_string: Optional[str] = None  # most recent complete string, a key if ":" follows
+        self.keys: List[Optional[str]] = []     # key currently being read, per open container
+        self.array_depth: Optional[int] = None  # stack depth inside the target array, once found
+        self.array_closed = False
+        self.element_start = -1
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Add text to the buffer and return the target array elements that closed in it."""
+        self.buffer += chunk
+        emitted = []
+        buffer = self.buffer
+        for index in range(self.position, len(buffer)):
+            char = buffer[index]
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    try:
+                        self.last_string = json.loads(buffer[self.string_start:index + 1])
+                    except ValueError:
+                        self.last_string = None
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.string_start = index
+            elif char == ":" and self.stack and self.stack[-1] == "{":
+                self.keys[-1] = self.last_string
+            elif char in "{[":
+                opens_target = (
+                    char == "[" and self.array_depth is None and not self.array_closed
+                    and self.stack and self.stack[-1] == "{" and self.keys[-1] == self.key
+                )
+                self.stack.append(char)
+                self.keys.append(None)
+                if opens_target:
+                    self.array_depth = len(self.stack)
+                elif char == "{" and self.array_depth is not None and len(self.stack) == self.array_depth + 1:
+                    self.element_start = index
+            elif char in "}]":
+                if not self.stack:
+                    continue
+                self.stack.pop()
+                self.keys.pop()
+                if self.array_depth is None:
+                    continue
+                if char == "}" and len(self.stack) == self.array_depth and self.element_start != -1:
+                    element = self.parse_element(buffer[self.element_start:index + 1])
+                    self.element_start = -1
+                    if element is not None:
+                        self.elements.append(element)
+                        emitted.append(element)
+                elif char == "]" and len(self.stack) == self.array_depth - 1:
+                    self.array_depth = None
+                    self.array_closed = True
+            elif char == "," and self.stack and self.stack[-1] == "{":
+                self.keys[-1] = None
+
+        self.position = len(buffer)
+        return emitted
+
+    @staticmethod
+    def parse_element(text: str) -> Optional[Any]:
+        try:
+            return json.loads(text)
+        except ValueError as e:
+            print(f"-------------skipping malformed streamed element: {e}-------------------")
+            return None
+
+    @property
+    def complete(self) -> bool:
+        return self.array_closed
+
+    def result(self) -> Dict:
+        """
+        The whole reply as JSON if it parses, otherwise {key: every element that closed} with complete False.
+        """
+        start_index = self.buffer.find("{")
+        if start_index != -1:
+            try:
+                parsed = json.loads(self.buffer[start_index:].strip().removesuffix("```").strip())
+                if isinstance(parsed, dict) and isinstance(parsed.get(self.key), list):
+                    return parsed
+            except ValueError:
+                pass
+        return {"complete": False, self.key: list(self.elements)}
@@ -1,76 +1,14 @@
 # agents/intake_agent.py
-import json
+import asyncio, json
 from autogen import UserProxyAgent, config_list_from_json, ConversableAgent
+from agents.intake_history import IntakeHistoryManager, summary_request
+from agents.prompts import INTAKE_JSON_EXAMPLE, INTAKE_STRUCTURED_SYSTEM_MESSAGE, INTAKE_SUMMARY_SYSTEM_MESSAGE, INTAKE_SYSTEM_MESSAGE as SYSTEM_MESSAGE
+from agents.metrics import provider_span
+from agents.schemas import IntakeInfo, IntakeTurn
+from agents.structured_output import STRUCTURED_OUTPUT, a_generate_validated, dump_json, structured_llm_config, validate_reply
+from agents.usage_ledger import track_agent_usage, usage_stage
+from agents.state_store import StateMapping, StateStore, get_state_store
 
-# TODO: ADD in logic to force the AI to confirm any assumptions before proceeding
-SYSTEM_MESSAGE = """
-Role:
-- You are Steve, head of intaking information from users
-
-Data you are trying to intake:
-- Company information (website, description, industry, location, employee count, annual revenue)
-- Product information (name, description, key features, competitive advantages)
-- ICP information (target title, company industry, employee range, revenue range, target regions, additional notes)
-
-Context:
-- The user is trying to find leads for a product.
-- The user will try to provide you with information about their company, the product they are selling, and information about their ideal customer profile.
-- if the information provided is not enough, you can ask the user specifically for what information you need.
-- if you have a gap in the information you need and the user doesn't have any more information to provide, you can come up with reasonable guesses for the missing information and verify with the user if that is correct.
-- if the user tells you that they don't have any more information to provide, check for gaps in information, and then return the final JSON object with the information you have so far.
-
-General profile of the user:
-- a sales rep looking to accelerate their sales funnel
-- using the app to find good leads and their contact info
-
-When you have complied all the data you can return ONLY a JSON object in exactly this format, even if you have to make assumptions, using empty strings for any data that you didn't get from the user and can't figure out on your own:
-{
-    "company_info": {
-      "name": "SupplyStream Technologies",
-      "website": "https://www.supplystreamtech.com",
-      "description": "SupplyStream Technologies provides AI-driven ERP solutions for mid-sized automotive manufacturers, streamlining operations from procurement to distribution.",
-      "industry": "B2B SaaS",
-      "location": "Detroit, MI",
-      "employee_count": 45,
-      "annual_revenue": "12M"
-    },
-    "product_info": {
-      "name": "StreamERP",
-      "description": "StreamERP is a cloud-based ERP solution designed for automotive suppliers. It includes modules for inventory optimization, supplier integration, predictive maintenance, and production scheduling.",
-      "key_features": [
-        "Automated inventory forecasting",
-        "Supplier API integrations",
-        "Predictive equipment maintenance",
-        "Real-time production dashboards",
-        "Compliance reporting for ISO/TS standards"
-      ],
-      "competitive_advantages": [
-        "Tailored specifically for automotive supply chain",
-        "Easy integration with legacy systems",
-        "Rapid 6-week deployment model"
-      ]
-    },
-    "ICP": {
-      "target_titles": ["COO", "CFO", "VP of Operations", "VP of IT", "VP of Supply Chain", "VP of Manufacturing", "VP of Engineering", "VP of Quality", "VP of Sales", "VP of Marketing"],
-      "company_industry": "Automotive manufacturing or parts supply",
-      "employee_range": {
-        "min": 20,
-        "max": 200
-      },
-      "revenue_range_million_usd": {
-        "min": 5,
-        "max": 50
-      },
-      "target_regions": ["United States", "Canada"],
-      "additional_notes": "Prioritize companies currently undergoing digital transformation or operating multiple production sites."
-    }
-}
-
-Rules:
-- No markdown fences.
-- at most four sentences if you must ask a clarifying question.
-- JSON only for the final response.
-""".strip()
 
 # ---------------------------------------------------------------------------
 # Agent definition
@@ -85,27 +23,43 @@ class IntakeAgent(ConversableAgent):
 
     def __init__(
         self,
+        state_store: StateStore = None,
     ):
         # Load config once at startup
         config_list = config_list_from_json(env_or_file="OAI_CONFIG_LIST")
+        state_store = state_store or get_state_store()
 
         # Setup message history - key is a user id, value is a list of messages
         # all messages formatted as {
         #     "role": msg["role"],
         #     "content": msg["content"]
         # }
-        self.message_history = {}
+        self.message_history = StateMapping(state_store, "message_history")
 
         # results of the intake agent
-        self.intake_data = {}
+        self.intake_data = StateMapping(state_store, "intake_data")
+
+        # facts summarized out of the oldest turns, key is a user id, value is the partially filled intake JSON
+        self.intake_summary = StateMapping(state_store, "intake_summary")
+
+        # folds older turns into intake_summary once the history is over its token budget
+        self.summary_agent = ConversableAgent(
+            name="IntakeSummaryAgent",
+            llm_config=structured_llm_config(config_list, IntakeInfo),
+            system_message=INTAKE_SUMMARY_SYSTEM_MESSAGE,
+            human_input_mode="NEVER"  # Don't ask for human input since we're in API mode
+        )
+        track_agent_usage(self.summary_agent)
+        self.history_manager = IntakeHistoryManager(summarizer=self.summarize_facts)
 
         # init agent
         super().__init__(
             name="IntakeAgent",
-            llm_config={"config_list": config_list},
-            system_message=SYSTEM_MESSAGE,
+            llm_config=structured_llm_config(config_list, IntakeTurn),
+            system_message=INTAKE_STRUCTURED_SYSTEM_MESSAGE if STRUCTURED_OUTPUT else SYSTEM_MESSAGE,
             human_input_mode="NEVER"  # Don't ask for human input since we're in API mode
         )
+        track_agent_usage(self)
 
         # init proxy for user
         self.userProxy = UserProxyAgent(name="userProxy", code_execution_config=False)
@@ -121,43 +75,84 @@ class IntakeAgent(ConversableAgent):
         # Send the message to the agent
         self.receive(user_message, self.userProxy)
 
-        # Get the message history
-        if userId not in self.message_history:
-            self.message_history[userId] = []
-        self.message_history[userId].append(user_message)
+        # Get the message history (a copy, written back to the state store below)
+        history = self.message_history.get(userId, [])
+        history.append(user_message)
+
+        # keep the history under its token budget by folding older turns into the facts summary
+        facts = self.intake_summary.get(userId, "")
+        history, facts = await self.history_manager.compact(history, facts)
+        self.message_history[userId] = history
+        self.intake_summary[userId] = facts
+
+        # receive() above also logs every message in the agent's own store, keep that to the same window
+        received = self.chat_messages.get(self.userProxy)
+        if received is not None and len(received) > len(history):
+            del received[:-len(history)]
 
         # Get the agent's reply
-        reply = self.generate_reply(messages=self.message_history[userId], sender=self.userProxy)
+        messages = self.history_manager.build_messages(history, facts)
+        with usage_stage("intake"):
+            if STRUCTURED_OUTPUT:
+                turn, reply = await a_generate_validated(self, messages, self.userProxy, IntakeTurn)
+            else:
+                turn = None
+                with provider_span("openai", self.name):
+                    # off the event loop, other sessions' /chat requests keep being served during the round trip
+                    reply = await asyncio.to_thread(self.generate_reply, messages, self.userProxy)
         print("-------------intake_agent reply-------------------")
         print(reply)
 
+        if turn is not None:
+            response = turn.message
+            intake = turn.intake if turn.complete else None
+        else:
+            # free text: a clarifying question, or the final intake JSON on its own
+            response = reply.get("content") if isinstance(reply, dict) else reply
+            intake = self.parse_intake(response) if response else None
+
         ai_message = {
             "role": "assistant",
-            "content": reply
+            "content": response
         }
-        self.message_history[userId].append(ai_message)
-
-        # parse the AI response to JSON to confirm it is valid
-        try:
-            parsedReply = reply
-            if parsedReply[0] != "{":
-                start_index = parsedReply.find('{')
-                if start_index != -1:  # If no '{' is found
-                    parsedReply = parsedReply[start_index:]
-
-            replyJson = json.loads(parsedReply)
-
-            if "company_info" in replyJson and "product_info" in replyJson and "ICP" in replyJson:
-                self.intake_data[userId] = parsedReply
-                print("-------------intake data accuired successfully----------")
-                print(replyJson)
-                return { "response": "Intake data accuired successfully, please wait while I find leads for you", "complete": True }
-        except Exception as e:
-            print("-------------replyJson error-------------------")
-            print(e)
-            print(type(e))
-
-        if reply is None:
+        history.append(ai_message)
+        self.message_history[userId] = history
+
+        if intake is not None:
+            self.intake_data[userId] = dump_json(intake)
+            print("-------------intake data accuired successfully----------")
+            print(intake)
+            return { "response": "Intake data accuired successfully, please wait while I find leads for you", "complete": True }
+
+        if not response:
             return { "response": "I apologize, but I couldn't generate a response.", "complete": False }
         
-        return { "response": reply, "complete": False }
\ No newline at end of file
+        return { "response": response, "complete": False }
+
+    def parse_intake(self, reply: str):
+        """The IntakeInfo in a free-text reply, None if the reply is a question rather than the intake JSON."""
+        if "{" not in reply:
+            return None
+        intake, errors = validate_reply(reply, IntakeInfo)
+        if intake is None:
+            print("-------------intake JSON error-------------------")
+            print(errors)
+            return None
+        # a stray {} in a question validates too, the intake JSON has all three sections
+        if not {"company_info", "product_info", "ICP"} <= intake.model_fields_set:
+            return None
+        return intake
+
+    async def summarize_facts(self, facts: str, messages: list) -> str:
+        """Ask the summary agent to fold messages into the facts JSON, returns the updated facts JSON string."""
+        user_message = {
+            "role": "user",
+            "content": summary_request(json.loads(INTAKE_JSON_EXAMPLE), facts, messages)
+        }
+        with usage_stage("intake_summary"):
+            facts_info, reply = await a_generate_validated(self.summary_agent, [user_message], self.userProxy, IntakeInfo)
+
+        # make sure it is valid before it replaces the old facts
+        if facts_info is None:
+            raise ValueError(f"summary reply is not intake JSON: {reply}")
+        return dump_json(facts_info)
@@ -0,0 +1,112 @@
+# agents/intake_history.py
+"""
+Keeps the intake conversation sent to the model under a token budget.
+
+Once a conversation is over INTAKE_HISTORY_TOKEN_BUDGET, every turn except the last
+INTAKE_HISTORY_KEEP_TURNS is folded into a "facts gathered so far" block: the intake JSON
+schema filled in with what the user has told us. The model then sees that block plus the
+last few raw turns, so each turn costs about the same no matter how long the intake runs.
+
+ENV
+----
+  INTAKE_HISTORY_TOKEN_BUDGET  max estimated tokens of raw history before summarizing (default 2000)
+  INTAKE_HISTORY_KEEP_TURNS    user/assistant turn pairs always kept verbatim (default 3)
+"""
+import json, os
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional, fall back to ~4 characters per token
+    _encoding = None
+TOKENIZER = "cl100k_base" if _encoding is not None else "chars/4"
+
+
+# ─────────── CONFIG ─────────── #
+INTAKE_HISTORY_TOKEN_BUDGET = int(os.getenv("INTAKE_HISTORY_TOKEN_BUDGET", "2000"))
+INTAKE_HISTORY_KEEP_TURNS = int(os.getenv("INTAKE_HISTORY_KEEP_TURNS", "3"))
+# tokens every message costs on top of its content (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages: List[Dict]) -> int:
+    return sum(count_tokens(str(message.get("content") or "")) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def empty_like(template):
+    """Same shape as the template with every leaf emptied: {"a": "x", "b": [1], "c": 2} -> {"a": "", "b": [], "c": null}"""
+    if isinstance(template, dict):
+        return {key: empty_like(value) for key, value in template.items()}
+    if isinstance(template, list):
+        return []
+    # unknown numbers are null, the intake schema doesn't accept "" for them
+    if isinstance(template, (int, float)) and not isinstance(template, bool):
+        return None
+    return ""
+
+
+class IntakeHistoryManager():
+    """
+    Compacts a message history into (facts summary, recent turns) and builds the messages for the model.
+
+    `await summarizer(previous_facts, messages)` must return the updated facts as a JSON string.
+    """
+
+    def __init__(
+        self,
+        summarizer: Callable[[str, List[Dict]], Awaitable[str]],
+        token_budget: int = INTAKE_HISTORY_TOKEN_BUDGET,
+        keep_turns: int = INTAKE_HISTORY_KEEP_TURNS,
+    ):
+        self.summarizer = summarizer
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+
+    async def compact(self, history: List[Dict], facts: str) -> Tuple[List[Dict], str]:
+        """Return (history, facts), with older turns folded into facts when history is over budget."""
+        keep_messages = self.keep_turns * 2
+        if count_message_tokens(history) <= self.token_budget or len(history) <= keep_messages:
+            return history, facts
+
+        older, recent = history[:-keep_messages], history[-keep_messages:]
+        try:
+            facts = await self.summarizer(facts, older)
+        except Exception as e:
+            # keep the full history rather than losing what the user said
+            print(f"-------------intake summary error: {e}-------------------")
+            return history, facts
+
+        print(f"-------------summarized {len(older)} intake messages into facts-------------------")
+        return recent, facts
+
+    def build_messages(self, history: List[Dict], facts: str) -> List[Dict]:
+        """Messages to send to the model: the facts block (if any) followed by the recent raw turns."""
+        if not facts:
+            return history
+        facts_message = {
+            "role": "user",
+            "content": "Facts gathered so far in this conversation (earlier messages were summarized into this JSON):\n" + facts
+        }
+        return [facts_message] + history
+
+
+def format_transcript(messages: List[Dict]) -> str:
+    return "\n".join(f"{message.get('role', 'user')}: {message.get('content') or ''}" for message in messages)
+
+
+def summary_request(template: Dict, facts: str, messages: List[Dict]) -> str:
+    """User message asking the summarizer to fold the messages into the facts JSON."""
+    return (
+        "Intake JSON schema:\n" + json.dumps(empty_like(template)) + "\n\n"
+        "Facts gathered so far:\n" + (facts or "{}") + "\n\n"
+        "New conversation messages:\n" + format_transcript(messages)
+    )
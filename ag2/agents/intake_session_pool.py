@@ -0,0 +1,130 @@
+# agents/intake_session_pool.py
+"""
+Pool of per-session IntakeAgent instances, so one user's intake turns never touch another user's agent.
+
+Sessions are evicted least-recently-used first when the pool has more than INTAKE_POOL_MAX_SESSIONS
+agents or their estimated memory passes INTAKE_POOL_MAX_BYTES, and any session idle for longer than
+INTAKE_POOL_IDLE_TTL_SECONDS is dropped. The conversation itself lives in the state store, so an
+evicted user just gets a fresh agent that picks up their message_history on the next turn.
+
+ENV
+----
+  INTAKE_POOL_MAX_SESSIONS      max live IntakeAgent instances (default 200)
+  INTAKE_POOL_MAX_BYTES         max estimated bytes held by live agents (default 64MB)
+  INTAKE_POOL_IDLE_TTL_SECONDS  evict sessions idle for longer than this (default 30 minutes)
+"""
+import asyncio, json, os, time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+from agents.intake_agent import IntakeAgent
+from agents.state_store import StateMapping, StateStore, get_state_store
+
+
+# ─────────── CONFIG ─────────── #
+INTAKE_POOL_MAX_SESSIONS = int(os.getenv("INTAKE_POOL_MAX_SESSIONS", "200"))
+INTAKE_POOL_MAX_BYTES = int(os.getenv("INTAKE_POOL_MAX_BYTES", str(64 * 1024 * 1024)))
+INTAKE_POOL_IDLE_TTL_SECONDS = float(os.getenv("INTAKE_POOL_IDLE_TTL_SECONDS", str(30 * 60)))
+
+
+class IntakeSession():
+    """
+    One user's IntakeAgent plus the bookkeeping the pool needs to evict it.
+    """
+
+    def __init__(self, agent: IntakeAgent):
+        self.agent = agent
+        # serializes turns from the same user so their history can't interleave
+        self.lock = asyncio.Lock()
+        self.last_used = time.time()
+        self.estimated_bytes = 0
+
+    def measure(self) -> int:
+        """Estimate the memory held by the agent's internal message store."""
+        messages = getattr(self.agent, "chat_messages", {}) or {}
+        self.estimated_bytes = sum(len(json.dumps(history, default=str)) for history in messages.values())
+        return self.estimated_bytes
+
+
+class IntakeSessionPool():
+    """
+    LRU/TTL bounded map of session id -> IntakeSession.
+    """
+
+    def __init__(
+        self,
+        state_store: StateStore = None,
+        max_sessions: int = INTAKE_POOL_MAX_SESSIONS,
+        max_bytes: int = INTAKE_POOL_MAX_BYTES,
+        idle_ttl_seconds: float = INTAKE_POOL_IDLE_TTL_SECONDS,
+        agent_factory: Callable[[StateStore], IntakeAgent] = IntakeAgent,
+    ):
+        self.state_store = state_store or get_state_store()
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.agent_factory = agent_factory
+
+        # least recently used first
+        self.sessions: "OrderedDict[str, IntakeSession]" = OrderedDict()
+        self.evictions = 0
+
+        # shared views of the conversation state, every session's agent reads/writes the same store
+        self.message_history = StateMapping(self.state_store, "message_history")
+        self.intake_data = StateMapping(self.state_store, "intake_data")
+        self.intake_summary = StateMapping(self.state_store, "intake_summary")
+
+    def get(self, session_id: str) -> IntakeSession:
+        """Return the session for this user, creating an agent for it if needed."""
+        self.evict_idle()
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = IntakeSession(self.agent_factory(self.state_store))
+            self.sessions[session_id] = session
+        self.sessions.move_to_end(session_id)
+        session.last_used = time.time()
+        return session
+
+    async def process_message(self, message: str, session_id: str) -> Dict:
+        """Run one intake turn on this user's own agent."""
+        session = self.get(session_id)
+        async with session.lock:
+            results = await session.agent.process_message(message, session_id)
+            session.last_used = time.time()
+            session.measure()
+        self.evict_over_budget(keep=session_id)
+        return results
+
+    def reset(self, session_id: str):
+        """Drop the user's agent and conversation so their next message starts a new intake."""
+        self.sessions.pop(session_id, None)
+        self.message_history[session_id] = []
+        self.intake_summary[session_id] = ""
+
+    def total_bytes(self) -> int:
+        return sum(session.estimated_bytes for session in self.sessions.values())
+
+    def evict_idle(self):
+        cutoff = time.time() - self.idle_ttl_seconds
+        for session_id in [sid for sid, session in self.sessions.items() if session.last_used < cutoff and not session.lock.locked()]:
+            del self.sessions[session_id]
+            self.evictions += 1
+
+    def evict_over_budget(self, keep: Optional[str] = None):
+        """Evict least recently used sessions until the pool is within its session and memory limits."""
+        for session_id in list(self.sessions):
+            if len(self.sessions) <= self.max_sessions and self.total_bytes() <= self.max_bytes:
+                return
+            session = self.sessions[session_id]
+            if session_id == keep or session.lock.locked():
+                continue
+            del self.sessions[session_id]
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        return {
+            "sessions": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "estimated_bytes": self.total_bytes(),
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
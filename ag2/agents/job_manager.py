@@ -0,0 +1,270 @@
+# agents/job_manager.py
+"""
+Managed scheduler for lead generation runs.
+
+Every run is a Job with an id and a state (queued -> running -> done / failed / cancelled).
+A fixed number of workers run jobs from a bounded queue, so only MAX_CONCURRENT_JOBS pipelines
+hit the providers at once and submitting past MAX_QUEUED_JOBS is rejected instead of piling up.
+
+With a shared state store every job record is also written to it, so when the API runs as several
+uvicorn worker processes a job claimed by one of them is visible from all of them. A cancel that
+lands on another worker is left as a flag in the store, and the worker running the job picks it up
+within CANCEL_POLL_SECONDS.
+
+ENV
+----
+  MAX_CONCURRENT_JOBS  pipelines allowed to run at once, per worker process (default 2)
+  MAX_QUEUED_JOBS      jobs allowed to wait for a worker before new ones are rejected (default 20)
+"""
+import asyncio, os, socket, time, traceback, uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+from agents.provider_retry import HedgeBudget, current_hedge_budget
+from agents.state_store import StateStore
+from agents.usage_ledger import UsageLedger, current_ledger
+
+
+# ─────────── CONFIG ─────────── #
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "2"))
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", "20"))
+# finished jobs kept around for status lookups before the oldest are forgotten
+MAX_FINISHED_JOBS = 1000
+# seconds between checks for cancels requested on other workers (shared store only)
+CANCEL_POLL_SECONDS = 1.0
+# how long job records and cancel flags are kept in the shared store
+JOB_RECORD_TTL_SECONDS = 24 * 60 * 60
+# identifies this process in job records
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = {DONE, FAILED, CANCELLED}
+
+
+class JobQueueFullError(Exception):
+    """Raised when a job is submitted while the queue is already full."""
+
+
+class Job():
+    """
+    A single lead generation run.
+    """
+
+    def __init__(self, session_id: str, run: Callable[[], Awaitable]):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.run = run
+        self.state = QUEUED
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        # tokens, requests and estimated cost of every provider call this job makes
+        self.ledger = UsageLedger()
+        # duplicate requests this job may send to cut slow provider calls short
+        self.hedge_budget = HedgeBudget()
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "session_id": self.session_id,
+            "state": self.state,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "hedges_used": self.hedge_budget.used,
+        }
+
+
+class JobManager():
+    """
+    Runs submitted jobs on a fixed pool of worker tasks fed by a bounded queue.
+    """
+
+    def __init__(self, max_concurrent_jobs: int = MAX_CONCURRENT_JOBS, max_queued_jobs: int = MAX_QUEUED_JOBS,
+                 state_store: StateStore = None):
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.max_queued_jobs = max_queued_jobs
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+        # job records are only published when other processes can see them
+        self.state_store = state_store if state_store is not None and state_store.shared else None
+        self.cancel_watcher: Optional[asyncio.Task] = None
+
+        # key is the job id, value is the job (insertion ordered, oldest first)
+        self.jobs: Dict[str, Job] = {}
+
+    async def start(self):
+        """Start the worker tasks, call once the event loop is running (app startup)."""
+        if self.workers:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_queued_jobs)
+        self.workers = [asyncio.create_task(self.worker()) for _ in range(self.max_concurrent_jobs)]
+        if self.state_store is not None:
+            self.cancel_watcher = asyncio.create_task(self.watch_cancel_requests())
+
+    async def stop(self):
+        """Cancel every queued and running job and stop the workers."""
+        for job in self.jobs.values():
+            if job.state not in FINISHED_STATES:
+                self.cancel(job.id)
+        tasks = self.workers + ([self.cancel_watcher] if self.cancel_watcher else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.workers = []
+        self.cancel_watcher = None
+
+    def submit(self, session_id: str, run: Callable[[], Awaitable]) -> Job:
+        """Queue a job, raises JobQueueFullError if there is no room (callers should ask the user to retry)."""
+        if self.queue is None:
+            raise RuntimeError("JobManager.start() must be called before submitting jobs")
+
+        job = Job(session_id, run)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFullError(f"{self.queue.qsize()} jobs are already waiting") from None
+
+        self.jobs[job.id] = job
+        self.publish(job)
+        if self.state_store is not None:
+            self.state_store.set("session_jobs", session_id, job.id, JOB_RECORD_TTL_SECONDS)
+        self.forget_finished_jobs()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def get_record(self, job_id: str) -> Optional[Dict]:
+        """Job state as a dict, for jobs run by this worker or (with a shared store) by any other."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return {**job.to_dict(), "worker_id": WORKER_ID}
+        if self.state_store is not None:
+            return self.state_store.get("jobs", job_id)
+        return None
+
+    def latest_for_session(self, session_id: str) -> Optional[Job]:
+        for job in reversed(list(self.jobs.values())):
+            if job.session_id == session_id:
+                return job
+        return None
+
+    def latest_job_id_for_session(self, session_id: str) -> Optional[str]:
+        """Id of the session's most recent job, wherever it runs."""
+        if self.state_store is not None:
+            job_id = self.state_store.get("session_jobs", session_id)
+            if job_id:
+                return job_id
+        job = self.latest_for_session(session_id)
+        return job.id if job else None
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job, returns False if it doesn't exist or already finished."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return self.request_remote_cancel(job_id)
+        if job.state in FINISHED_STATES:
+            return False
+        if job.state == QUEUED:
+            # the worker skips it when it comes off the queue
+            job.state = CANCELLED
+            job.finished_at = time.time()
+            self.publish(job)
+        elif job.task is not None:
+            job.task.cancel()
+        return True
+
+    def request_remote_cancel(self, job_id: str) -> bool:
+        """Flag a job running on another worker for cancellation, that worker's watcher cancels it."""
+        record = self.state_store.get("jobs", job_id) if self.state_store is not None else None
+        if record is None or record.get("state") in FINISHED_STATES:
+            return False
+        self.state_store.set("job_cancel", job_id, True, JOB_RECORD_TTL_SECONDS)
+        return True
+
+    async def watch_cancel_requests(self):
+        while True:
+            await asyncio.sleep(CANCEL_POLL_SECONDS)
+            for job in [job for job in self.jobs.values() if job.state not in FINISHED_STATES]:
+                if self.state_store.get("job_cancel", job.id):
+                    print(f"-------------job {job.id} cancelled from another worker-------------------")
+                    self.state_store.delete("job_cancel", job.id)
+                    self.cancel(job.id)
+
+    def publish(self, job: Job, usage: bool = False):
+        """Write the job's record to the shared store so every worker can report on it."""
+        if self.state_store is None:
+            return
+        record = {**job.to_dict(), "worker_id": WORKER_ID}
+        if usage:
+            record["usage"] = job.ledger.summary()
+        try:
+            self.state_store.set("jobs", job.id, record, JOB_RECORD_TTL_SECONDS)
+        except Exception as e:
+            # a store hiccup must not take the job down with it
+            print(f"-------------could not publish job {job.id}: {e}-------------------")
+
+    def stats(self) -> Dict:
+        counts = {state: 0 for state in [QUEUED, RUNNING, DONE, FAILED, CANCELLED]}
+        for job in self.jobs.values():
+            counts[job.state] += 1
+        return {
+            "worker_id": WORKER_ID,
+            "max_concurrent_jobs": self.max_concurrent_jobs,
+            "max_queued_jobs": self.max_queued_jobs,
+            "queue_size": self.queue.qsize() if self.queue else 0,
+            "jobs": counts,
+        }
+
+    async def worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                if job.state == CANCELLED:
+                    continue
+                await self.run_job(job)
+            finally:
+                self.queue.task_done()
+
+    async def run_job(self, job: Job):
+        job.state = RUNNING
+        job.started_at = time.time()
+        self.publish(job)
+        # the task copies the current context, so everything it runs is charged to this job's ledger and hedge budget
+        token = current_ledger.set(job.ledger)
+        hedge_token = current_hedge_budget.set(job.hedge_budget)
+        try:
+            job.task = asyncio.create_task(job.run())
+        finally:
+            current_hedge_budget.reset(hedge_token)
+            current_ledger.reset(token)
+        try:
+            await job.task
+            job.state = DONE
+        except asyncio.CancelledError:
+            job.state = CANCELLED
+            # the worker itself is being stopped (stop() cancels it and the job), not just this job by cancel()
+            if asyncio.current_task().cancelling():
+                job.task.cancel()
+                raise
+        except Exception as e:
+            job.state = FAILED
+            job.error = str(e)
+            print(f"-------------job {job.id} failed-------------------")
+            traceback.print_exc()
+        finally:
+            job.finished_at = time.time()
+            job.task = None
+            self.publish(job, usage=True)
+            job.ledger.log(f"job {job.id} ({job.state})")
+
+    def forget_finished_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.state in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
@@ -0,0 +1,101 @@
+# agents/lead_events.py
+"""
+Per-session event log for a lead generation run, streamed to the frontend as server-sent events.
+
+The pipeline publishes progress and scored leads as each company finishes, and any number of
+subscribers (including ones that connect late) replay the events so far and then follow along
+until the run's "complete" event.
+
+With a shared state store (sqlite / redis) the events live in the store, so a subscriber on one
+worker follows a run executing on another: local subscribers are woken right away, the others
+pick new events up every EVENT_POLL_SECONDS. Either way a run's events expire EVENTS_TTL_SECONDS
+after its last event, so finished runs (and their leads payloads) don't pile up.
+"""
+import asyncio, json, time
+from typing import AsyncIterator, Dict
+from agents.state_store import InMemoryStateStore, StateMapping, StateStore
+
+
+# events that end a run, a subscriber stops after receiving one
+TERMINAL_EVENTS = {"complete", "failed", "cancelled"}
+# seconds between keep-alive comments so proxies don't close an idle stream
+KEEPALIVE_SECONDS = 15
+# seconds between checks for events published by other workers (shared store only)
+EVENT_POLL_SECONDS = 1.0
+# how long a run's events are kept after its last event, for late subscribers and reconnects
+EVENTS_TTL_SECONDS = 60 * 60
+
+
+class LeadEventBroker():
+    """
+    Keeps the events of the current run for each session and wakes subscribers when new ones arrive.
+    """
+
+    def __init__(self, state_store: StateStore = None):
+        # key is the session id, value is the list of events of its current run
+        if state_store is not None and state_store.shared:
+            self.events = StateMapping(state_store, "lead_events", EVENTS_TTL_SECONDS)
+            self.poll_seconds = EVENT_POLL_SECONDS
+        else:
+            self.events = StateMapping(InMemoryStateStore(EVENTS_TTL_SECONDS), "lead_events")
+            self.poll_seconds = KEEPALIVE_SECONDS
+        # key is the session id, only sessions with a run in progress or a subscriber waiting have one
+        self.conditions: Dict[str, asyncio.Condition] = {}
+
+    def condition(self, session_id: str) -> asyncio.Condition:
+        if session_id not in self.conditions:
+            self.conditions[session_id] = asyncio.Condition()
+        return self.conditions[session_id]
+
+    def reset(self, session_id: str):
+        """Start a new run for this session, dropping the events of the previous one."""
+        self.events[session_id] = []
+
+    async def publish(self, session_id: str, event_type: str, data: Dict):
+        # only the worker running the session's job publishes, so read-append-write can't race
+        events = self.events.get(session_id, [])
+        events.append({"id": len(events) + 1, "event": event_type, "data": data})
+        self.events[session_id] = events
+        condition = self.condition(session_id)
+        async with condition:
+            condition.notify_all()
+        if event_type in TERMINAL_EVENTS:
+            # woken subscribers hold on to it, later ones find the terminal event without waiting
+            self.conditions.pop(session_id, None)
+
+    async def subscribe(self, session_id: str, last_event_id: int = 0) -> AsyncIterator[Dict]:
+        """Yield every event after last_event_id, waiting for new ones until the run ends. Yields None as a keep-alive."""
+        condition = self.condition(session_id)
+        next_index = last_event_id
+        last_sent = time.monotonic()
+        while True:
+            events = self.events.get(session_id, [])
+            while next_index < len(events):
+                event = events[next_index]
+                next_index += 1
+                last_sent = time.monotonic()
+                yield event
+                if event["event"] in TERMINAL_EVENTS:
+                    return
+
+            async with condition:
+                # re-check under the lock so an event published since the loop above isn't missed
+                if next_index >= len(self.events.get(session_id, [])):
+                    try:
+                        await asyncio.wait_for(condition.wait(), timeout=self.poll_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+            if next_index >= len(self.events.get(session_id, [])) and time.monotonic() - last_sent >= KEEPALIVE_SECONDS:
+                last_sent = time.monotonic()
+                yield None
+
+    def clear(self, session_id: str):
+        self.events.pop(session_id, None)
+        self.conditions.pop(session_id, None)
+
+
+def format_sse(event: Dict) -> str:
+    """Format an event (or None for a keep-alive) as a server-sent-events frame."""
+    if event is None:
+        return ": keep-alive\n\n"
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
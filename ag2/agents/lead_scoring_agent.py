@@ -1,148 +1,33 @@
 # agents/lead_scoring_agent.py
-import json
+import asyncio, json, os
+import numpy as np
 from autogen import Agent, config_list_from_json, ConversableAgent
+from openai import AsyncOpenAI
+from typing import Awaitable, Callable, Optional
+from agents.http_client import get_async_client
+from agents.incremental_json import IncrementalJSONArrayParser
+from agents.metrics import provider_span
+from agents.schemas import ApproachReccomendations, Lead, LeadsList
+from agents.structured_output import (
+    STRUCTURED_OUTPUT, a_generate_validated, dump_json, response_format_param,
+    structured_llm_config, validate_value,
+)
+from agents.usage_ledger import record_usage, track_agent_usage
+from agents.lead_scoring_engine import calibrate_shard_scores, flatten_leads, rank_leads, score_leads
+from agents.prompt_registry import prompt_user_message
+from agents.prompts import APPROACH_SYSTEM_MESSAGE, LEAD_SCORING_SYSTEM_MESSAGE as SYSTEM_MESSAGE
 
-SYSTEM_MESSAGE = """
-Role:
-- you are an agent that scores and ranks leads for a sales agent
-- the company_info for the sales agent is provided in a structured JSON object
-- the product_info the sales agent sells is provided in a structured JSON object
-- the companies and people that have been found as potential leads are provided in a structured JSON object
-- These should be the best leads / the people should be the ones that are most likely to be the person a sales rep for company_info would contact to sell product_info to.
-- use the deep research agent to determine what would make the best lead for the sales agent based on all of the information provided
-- using this criteria, score the leads on a normal distribution from 0-100 and replace the previous relevance_score field with the new score
-- a relevance_score of 0 means the lead is not relevant to the sales agent
-- a relevance_score of 25 means the lead is not a good match for the sales agent but not completely irrelevant
-- a relevance_score of 50 means the lead is a fair match for the sales agent and should be considered for contact
-- a relevance_score of 75 means the lead is a good match for the sales agent and should be considered for contact
-- a relevance_score above 90 means the lead is an amazing match for the sales agent and should definitely be contacted
-- a relevance_score of 100 means the lead is a perfect match for the sales agent and should be the first person the sales agent contacts
-
-CRITICAL RULES:
-- Every person in each people_list for each company should be included in the leads_list output no matter how low the relevance_score is or how incomplete the contact info is
-- do not remove any of the people in the people_lists from the final output
-
-Evaluation Criteria:
-- Functional role match
-- Seniority
-- Department (e.g., ops, supply chain, logistics)
-- Region
-- Title/keywords similarity
-- how well the company the lead works for matches the ICP
-- how many contact info fields are filled out
-- number of source_urls
-
-
-- refine the relevant_info with the new information gained from the research
-- refine the approach_reccomendation field that details how you would approach the lead to sell product to them.
-- The output of this agent will be returned to the user
-- do not remove any of the people in the people_lists from the final output, every person should be included in the leads_list no matter how low the relevance_score is or how incomplete the contact info is
-- The input JSON is in the following format:
-{
-    "company_info": {
-      "name": "SupplyStream Technologies",
-      "website": "https://www.supplystreamtech.com",
-      "description": "SupplyStream Technologies provides AI-driven ERP solutions for mid-sized automotive manufacturers, streamlining operations from procurement to distribution.",
-      "industry": "B2B SaaS",
-      "location": "Detroit, MI",
-      "employee_count": 45,
-      "annual_revenue": "12M"
-    },
-    "product_info": {
-      "name": "StreamERP",
-      "description": "StreamERP is a cloud-based ERP solution designed for automotive suppliers. It includes modules for inventory optimization, supplier integration, predictive maintenance, and production scheduling.",
-      "key_features": [
-        "Automated inventory forecasting",
-        "Supplier API integrations",
-        "Predictive equipment maintenance",
-        "Real-time production dashboards",
-        "Compliance reporting for ISO/TS standards"
-      ],
-      "competitive_advantages": [
-        "Tailored specifically for automotive supply chain",
-        "Easy integration with legacy systems",
-        "Rapid 6-week deployment model"
-      ]
-    },
-    "ICP": {
-      "target_titles": ["COO", "CFO", "VP of Operations", "VP of IT", "VP of Supply Chain", "VP of Manufacturing", "VP of Engineering", "VP of Quality", "VP of Sales", "VP of Marketing"],
-      "company_industry": "Automotive manufacturing or parts supply",
-      "employee_range": {
-        "min": 20,
-        "max": 200
-      },
-      "revenue_range_million_usd": {
-        "min": 5,
-        "max": 50
-      },
-      "target_regions": ["United States", "Canada"],
-      "additional_notes": "Prioritize companies currently undergoing digital transformation or operating multiple production sites."
-    }
-}
-{
-    "company_list": [
-        "company_info": {
-          "name": "SupplyStream Technologies",
-          "website": "https://www.supplystreamtech.com",
-          "description": "SupplyStream Technologies provides AI-driven ERP solutions for mid-sized automotive manufacturers, streamlining operations from procurement to distribution.",
-          "industry": "B2B SaaS",
-          "location": "Detroit, MI",
-          "employee_count": 45,
-          "annual_revenue": "12M"
-          "relevant_info": "This company is a good fit for the ICP because they are a mid-sized automotive manufacturer that is undergoing digital transformation and operating multiple production sites.",
-          "relevance_score": 56,
-          "people_list": [
-              {
-                  "name": "John Doe",
-                  "title": "COO",
-                  "email": "john.doe@supplystreamtech.com",
-                  "phone": "123-456-7890",
-                  "linkedin": "https://www.linkedin.com/in/john-doe-1234567890",
-                  "relevant_info": "John Doe is the COO of SupplyStream Technologies and is responsible for the overall operations of the company.",
-                  "relevance_score": 95,
-                  "approach_reccomendation": "I would approach John Doe by saying 'Hello, I'm from SupplyStream Technologies and we provide AI-driven ERP solutions for mid-sized automotive manufacturers. We're looking for a COO like you who is interested in digital transformation and streamlining operations. Would you be interested in a demo?'",
-                  "notes": "I found this information on the company website. The phone number I'm not sure if it's still valid. the email might be John's or steve hammond's",
-                  "source_urls": ["https://www.supplystreamtech.com/people/john-doe"]
-              }
-          ]
-        },
-    ]
-}
-
-output:
--When you have complied all the data you can return ONLY a JSON object in this format. Taking all of the people_list objects and combining them into a single leads_list object including the data you've compiled. If you are confident that all of the leads have been scored and ranked, set the complete field to true.
-- this is an example of the JSON object you should return:
--DO NOT INCLUE JOHN DOE FROM THE EXAMPLE BELOW, HE IS NOT A LEAD
-{
-    "complete": true,
-    "leads_list": [
-        {
-            "name": "John Doe",
-            "title": "COO",
-            "email": "john.doe@supplystreamtech.com",
-            "phone": "123-456-7890",
-            "linkedin": "https://www.linkedin.com/in/john-doe-1234567890",
-            "relevant_info": "John Doe is the COO of SupplyStream Technologies and is responsible for the overall operations of the company.",
-            "relevance_score": 95,
-            "approach_reccomendation": "I would approach John Doe by saying 'Hello, I'm from SupplyStream Technologies and we provide AI-driven ERP solutions for mid-sized automotive manufacturers. We're looking for a COO like you who is interested in digital transformation and streamlining operations. Would you be interested in a demo?'",
-            "notes": "I found this information on the company website. The phone number I'm not sure if it's still valid. the email might be John's or steve hammond's",
-            "source_urls": ["https://www.supplystreamtech.com/people/john-doe"],
-            "company_info": {
-                "name": "SupplyStream Technologies",
-                "website": "https://www.supplystreamtech.com",
-                "description": "SupplyStream Technologies provides AI-driven ERP solutions for mid-sized automotive manufacturers, streamlining operations from procurement to distribution.",
-                "industry": "B2B SaaS",
-                "relevant_info": "This company is a good fit for the ICP because they are a mid-sized automotive manufacturer that is undergoing digital transformation and operating multiple production sites."
-            }
-        }
-    ]
-}
-
+# "local" scores every lead with the deterministic engine and only asks the LLM for the top K approach_reccomendations,
+# "sharded" scores each company's people in its own parallel LLM call and calibrates the shards against each other,
+# "llm" sends everything to one LLM call that scores and writes the recommendations
+LEAD_SCORING_MODE = os.getenv("LEAD_SCORING_MODE", "local")
+# max number of company shards being scored by the LLM at once in "sharded" mode
+LEAD_SCORING_SHARD_CONCURRENCY = int(os.getenv("LEAD_SCORING_SHARD_CONCURRENCY", "8"))
+# number of best leads that get an LLM-written approach_reccomendation in "local" mode
+LEAD_SCORING_TOP_K = int(os.getenv("LEAD_SCORING_TOP_K", "10"))
+# "true" streams the "llm" mode reply and hands over each lead as soon as the model finishes writing it
+LEAD_SCORING_STREAM = os.getenv("LEAD_SCORING_STREAM", "false").lower() == "true"
 
-Rules:
-- No markdown fences.
-- Nothing outside of the JSON object.
-""".strip()
 
 # ---------------------------------------------------------------------------
 # Agent definition
@@ -160,17 +45,33 @@ class LeadScoringAgent(ConversableAgent):
     ):
         # Load config once at startup
         config_list = config_list_from_json(env_or_file="OAI_CONFIG_LIST")
+        self.config_list = config_list
+
+        # writes approach_reccomendations for the top leads when scoring locally
+        self.approach_agent = ConversableAgent(
+            name="ApproachAgent",
+            llm_config=structured_llm_config(config_list, ApproachReccomendations),
+            system_message=APPROACH_SYSTEM_MESSAGE,
+            human_input_mode="NEVER"  # Don't ask for human input since we're in API mode
+        )
+        track_agent_usage(self.approach_agent)
 
         # init agent
         super().__init__(
             name="LeadScoringAgent",
-            llm_config={"config_list": config_list},
+            llm_config=structured_llm_config(config_list, LeadsList),
             system_message=SYSTEM_MESSAGE,
             human_input_mode="NEVER"  # Don't ask for human input since we're in API mode
         )
+        track_agent_usage(self)
 
-    async def process_message(self, sender: Agent, intakeInfoString: str, companyListString: str) -> str:
-        """Process the intakeInfoString and companyListString and return the people list"""
+    async def process_message(self, sender: Agent, intakeInfoString: str, companyListString: str,
+                              on_lead: Optional[Callable[[dict], Awaitable]] = None) -> str:
+        """
+        Process the intakeInfoString and companyListString and return the people list.
+
+        When streaming, `on_lead` is awaited with each lead as soon as the model has written it.
+        """
 
         # TODO - do the work of the agent here
 
@@ -179,39 +80,199 @@ class LeadScoringAgent(ConversableAgent):
         if not companyListString:
             return "no companyListString available"
 
-        # Create a message in the format expected by the agent
-        user_message = {
-            "role": "user",
-            "content": intakeInfoString + "\n" + companyListString
-        }
+        if LEAD_SCORING_MODE == "local":
+            return await self.score_locally(sender, intakeInfoString, companyListString)
+        if LEAD_SCORING_MODE == "sharded":
+            return await self.score_sharded(sender, intakeInfoString, companyListString)
+        if LEAD_SCORING_STREAM:
+            return await self.score_streaming(intakeInfoString, companyListString, on_lead)
+
+        # Create a message in the format expected by the agent, the job's intake JSON before the per-call company list
+        user_message = prompt_user_message(intakeInfoString, companyListString)
         
         # Send the message to the agent
         self.receive(user_message, sender)
 
         # Get the agent's reply
-        reply = self.generate_reply([user_message], sender=sender)
+        leadsList, reply = await a_generate_validated(self, [user_message], sender, LeadsList)
 
         print("-------------lead_scoring_agent reply-------------------")
         print(reply)
 
-        # parse the AI response to JSON to confirm it is valid
+        if leadsList is not None:
+            return dump_json(leadsList)
+
+        # no valid leads_list even after repairs, rank with the engine (no extra LLM call) rather than pass the reply on
+        print("-------------lead scoring reply invalid, falling back to the deterministic engine-------------------")
+        return await self.score_locally(sender, intakeInfoString, companyListString, top_k=0)
+
+    async def score_streaming(self, intakeInfoString: str, companyListString: str,
+                              on_lead: Optional[Callable[[dict], Awaitable]] = None) -> str:
+        """
+        Stream the scoring reply and parse it as it arrives, each leads_list element is passed to on_lead
+        the moment it closes. If the reply breaks off or ends malformed, every lead that closed is kept.
+        Leads that don't validate against the Lead schema are dropped, both from on_lead and the result.
+        """
+        config = self.config_list[0]
+        model = config.get("model")
+        client = AsyncOpenAI(api_key=config.get("api_key"), base_url=config.get("base_url"), http_client=get_async_client())
+        messages = [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            prompt_user_message(intakeInfoString, companyListString),
+        ]
+
+        # the agents get the schema through autogen, this call goes to the openai client directly
+        extra = {"response_format": response_format_param(LeadsList)} if STRUCTURED_OUTPUT else {}
+
+        parser = IncrementalJSONArrayParser("leads_list")
         try:
-            parsedReply = reply
-            if parsedReply[0] != "{":
-                start_index = parsedReply.find('{')
-                if start_index != -1:  # If no '{' is found
-                    parsedReply = parsedReply[start_index:]
+            with provider_span("openai", f"{self.name} (stream)"):
+                stream = await client.chat.completions.create(
+                    model=model, messages=messages, stream=True, stream_options={"include_usage": True}, **extra
+                )
+                async for chunk in stream:
+                    if chunk.usage is not None:
+                        record_usage("openai", chunk.model or model, chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    for lead in parser.feed(chunk.choices[0].delta.content):
+                        lead = self.validate_lead(lead)
+                        if lead is not None and on_lead is not None:
+                            await on_lead(lead)
+        except Exception as e:
+            # keep what already streamed rather than failing the company
+            if not parser.elements:
+                raise
+            print(f"-------------lead scoring stream broke off after {len(parser.elements)} leads: {e}-------------------")
+
+        result = parser.result()
+        leads_list = [lead for lead in map(self.validate_lead, result.get("leads_list", [])) if lead is not None]
+        print(f"-------------lead_scoring_agent streamed {len(leads_list)} leads (complete: {parser.complete})-------------------")
+        return json.dumps({"complete": result.get("complete") is True, "leads_list": leads_list})
 
-            replyJson = json.loads(parsedReply)
+    @staticmethod
+    def validate_lead(lead) -> Optional[dict]:
+        """A streamed lead as a dict with every Lead field, None if it doesn't match the schema."""
+        validated, errors = validate_value(lead, Lead)
+        if validated is None:
+            print("-------------dropping streamed lead that failed validation-------------------")
+            print(errors)
+            return None
+        return validated.model_dump()
 
-            if "leads_list" in replyJson:
-                return parsedReply
+    def rank_provisional(self, intakeInfoString: str, company_list_obj: dict) -> list:
+        """Rank a few companies' leads with the deterministic engine only, shown while the rest of the job runs."""
+        try:
+            intake_info = json.loads(intakeInfoString)
         except Exception as e:
-            print("-------------replyJson error-------------------")
-            print(e)
-            print(type(e))
+            print(f"Input JSON parsing error: {e}")
+            return []
+        return rank_leads(company_list_obj, intake_info)
 
-        if reply is None:
-            return "I apologize, but I couldn't generate a response."
-        
-        return reply
\ No newline at end of file
+    async def score_locally(self, sender: Agent, intakeInfoString: str, companyListString: str, top_k: int = LEAD_SCORING_TOP_K) -> str:
+        """Score every lead with the deterministic engine, then have the LLM write approach_reccomendations for the top_k only."""
+        try:
+            intake_info = json.loads(intakeInfoString)
+            company_list_obj = json.loads(companyListString)
+        except Exception as e:
+            print(f"Input JSON parsing error: {e}")
+            return companyListString
+
+        leads_list = rank_leads(company_list_obj, intake_info)
+        print(f"-------------lead_scoring_engine scored {len(leads_list)} leads-------------------")
+
+        top_leads = leads_list[:top_k]
+        if top_leads:
+            recommendations = await self.write_approach_reccomendations(sender, intakeInfoString, top_leads)
+            for index, lead in enumerate(top_leads):
+                if index in recommendations:
+                    lead["approach_reccomendation"] = recommendations[index]
+
+        return json.dumps({"complete": True, "leads_list": leads_list})
+
+    async def write_approach_reccomendations(self, sender: Agent, intakeInfoString: str, leads: list) -> dict:
+        """Ask the approach agent for one approach_reccomendation per lead, returns {lead index: recommendation}."""
+        indexed_leads = [{"index": index, **lead} for index, lead in enumerate(leads)]
+        user_message = prompt_user_message(intakeInfoString, json.dumps({"leads_list": indexed_leads}))
+
+        self.approach_agent.receive(user_message, sender)
+        recommendations, reply = await a_generate_validated(self.approach_agent, [user_message], sender, ApproachReccomendations)
+
+        print("-------------approach_agent reply-------------------")
+        print(reply)
+
+        if recommendations is None:
+            return {}
+        return {item.index: item.approach_reccomendation for item in recommendations.approach_reccomendations}
+
+    async def score_sharded(self, sender: Agent, intakeInfoString: str, companyListString: str, concurrency: int = LEAD_SCORING_SHARD_CONCURRENCY) -> str:
+        """
+        Map: score each company's people in its own LLM call, all in parallel.
+        Reduce: merge every shard into one leads_list with calibrated scores so shards are comparable.
+
+        Any person a shard drops (or a whole shard that fails) keeps the deterministic engine's score,
+        so every person still ends up in the leads_list.
+        """
+        try:
+            intake_info = json.loads(intakeInfoString)
+            company_list_obj = json.loads(companyListString)
+        except Exception as e:
+            print(f"Input JSON parsing error: {e}")
+            return companyListString
+
+        shards = [{"company_list": [company]} for company in company_list_obj.get("company_list", [])]
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def score_shard(shard):
+            # every shard of a job shares the system message and intake JSON as a cacheable prefix
+            user_message = prompt_user_message(intakeInfoString, json.dumps(shard))
+            async with semaphore:
+                try:
+                    shardLeads, _ = await a_generate_validated(self, [user_message], sender, LeadsList)
+                except Exception as e:
+                    print(f"-------------lead scoring shard error: {e}-------------------")
+                    return []
+
+            # an invalid shard keeps the engine's scores for all of its people
+            return [lead.model_dump() for lead in shardLeads.leads_list] if shardLeads else []
+
+        shard_replies = await asyncio.gather(*(score_shard(shard) for shard in shards))
+
+        # line each shard's LLM leads up with the engine's leads for the same company, matched by name
+        shard_leads, shard_scores, shard_anchors = [], [], []
+        for shard, llm_leads in zip(shards, shard_replies):
+            leads = flatten_leads(shard)
+            anchors = score_leads(leads, intake_info)
+            llm_by_name = {
+                (lead.get("name") or "").strip().lower(): lead
+                for lead in llm_leads if isinstance(lead, dict)
+            }
+
+            merged, scores = [], []
+            for lead, anchor in zip(leads, anchors):
+                llm_lead = llm_by_name.get((lead.get("name") or "").strip().lower())
+                if llm_lead:
+                    merged.append({**lead, **{key: value for key, value in llm_lead.items() if value not in ("", None, [])}, "company_info": lead["company_info"]})
+                    try:
+                        scores.append(float(llm_lead.get("relevance_score")))
+                    except (TypeError, ValueError):
+                        scores.append(float(anchor))
+                else:
+                    merged.append(lead)
+                    scores.append(float(anchor))
+
+            shard_leads.append(merged)
+            shard_scores.append(np.array(scores, dtype=np.float64))
+            shard_anchors.append(anchors)
+
+        calibrated = calibrate_shard_scores(shard_scores, shard_anchors)
+
+        leads_list = []
+        for leads, scores in zip(shard_leads, calibrated):
+            for lead, score in zip(leads, scores):
+                lead["relevance_score"] = int(score)
+                leads_list.append(lead)
+        leads_list.sort(key=lambda lead: lead["relevance_score"], reverse=True)
+
+        print(f"-------------lead_scoring_agent merged {len(shards)} shards into {len(leads_list)} leads-------------------")
+        return json.dumps({"complete": True, "leads_list": leads_list})
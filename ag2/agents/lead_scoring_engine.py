@@ -0,0 +1,322 @@
+# agents/lead_scoring_engine.py
+"""
+Deterministic lead scoring, so the 0-100 relevance_score doesn't need an LLM round trip.
+
+Every lead gets one column per evaluation criterion from the LeadScoringAgent SYSTEM_MESSAGE
+(role match, seniority, department, region, title similarity, ICP fit, contact completeness, source count),
+each scaled to [0, 1]. Each column is computed for all leads at once with NumPy string and matrix
+operations, then the weighted sum of all columns is one matrix product. Python only loops over the
+targets (ICP titles, regions, keywords), never over the leads.
+"""
+import re
+import numpy as np
+from typing import Dict, List
+
+
+# weight of each feature column in the final score, they don't need to add up to 1
+DEFAULT_WEIGHTS = {
+    "role_match": 0.25,
+    "seniority": 0.15,
+    "department": 0.10,
+    "region": 0.10,
+    "title_similarity": 0.10,
+    "icp_fit": 0.15,
+    "contact_completeness": 0.10,
+    "source_count": 0.05,
+}
+FEATURES = list(DEFAULT_WEIGHTS)
+
+CONTACT_FIELDS = ["email", "phone", "linkedin"]
+MAX_COUNTED_SOURCES = 5
+STOP_WORDS = {"of", "and", "the", "for", "at", "or"}
+
+# title abbreviations expanded before any matching
+TITLE_ABBREVIATIONS = {
+    "ceo": "chief executive officer",
+    "coo": "chief operating officer",
+    "cfo": "chief financial officer",
+    "cto": "chief technology officer",
+    "cio": "chief information officer",
+    "cmo": "chief marketing officer",
+    "cro": "chief revenue officer",
+    "cso": "chief supply officer",
+    "cpo": "chief procurement officer",
+    "svp": "senior vice president",
+    "evp": "executive vice president",
+    "vp": "vice president",
+    "gm": "general manager",
+    "it": "information technology",
+    "ops": "operations",
+}
+
+# (whole words in the normalized title, seniority level), first match wins
+SENIORITY_LEVELS = [
+    (["chief", "president", "founder", "owner", "partner"], 1.0),
+    (["executive vice president", "senior vice president"], 0.9),
+    (["vice president"], 0.8),
+    (["head of", "director", "general manager"], 0.65),
+    (["manager", "principal"], 0.45),
+    (["senior", "lead"], 0.35),
+]
+DEFAULT_SENIORITY = 0.2
+
+# department -> keywords that put a title in it
+DEPARTMENTS = {
+    "operations": ["operations", "operating", "plant", "production"],
+    "supply_chain": ["supply", "procurement", "purchasing", "sourcing", "logistics"],
+    "technology": ["information technology", "technology", "information", "digital", "systems", "data"],
+    "finance": ["finance", "financial", "controller", "accounting"],
+    "manufacturing": ["manufacturing", "production", "plant"],
+    "engineering": ["engineering", "engineer", "r&d"],
+    "quality": ["quality"],
+    "sales": ["sales", "revenue", "business development", "commercial"],
+    "marketing": ["marketing", "brand", "growth"],
+    "executive": ["chief executive", "president", "founder", "owner", "general manager"],
+}
+
+# region -> names that mean a location is in it, matched as whole words anywhere in the location
+REGION_NAMES = {
+    "united states": [
+        "united states", "united states of america",
+        "alabama", "alaska", "arizona", "arkansas", "california", "colorado", "connecticut", "delaware", "florida",
+        "georgia", "hawaii", "idaho", "illinois", "indiana", "iowa", "kansas", "kentucky", "louisiana", "maine",
+        "maryland", "massachusetts", "michigan", "minnesota", "mississippi", "missouri", "montana", "nebraska",
+        "nevada", "new hampshire", "new jersey", "new mexico", "new york", "north carolina", "north dakota", "ohio",
+        "oklahoma", "oregon", "pennsylvania", "rhode island", "south carolina", "south dakota", "tennessee", "texas",
+        "utah", "vermont", "virginia", "washington", "west virginia", "wisconsin", "wyoming", "district of columbia",
+    ],
+    "canada": [
+        "canada", "ontario", "quebec", "british columbia", "alberta", "manitoba", "saskatchewan", "nova scotia",
+        "new brunswick", "newfoundland", "labrador", "prince edward island", "yukon", "northwest territories", "nunavut",
+    ],
+    "united kingdom": ["united kingdom", "great britain", "britain", "england", "scotland", "wales", "northern ireland"],
+}
+# region -> codes that mean a location is in it, only matched as a whole comma separated part ("Detroit, MI, USA")
+# since two letter codes like "in", "or" and "on" are also ordinary words
+REGION_CODES = {
+    "united states": [
+        "us", "usa", "al", "ak", "az", "ar", "ca", "co", "ct", "de", "fl", "ga", "hi", "id", "il", "in", "ia", "ks",
+        "ky", "la", "me", "md", "ma", "mi", "mn", "ms", "mo", "mt", "ne", "nv", "nh", "nj", "nm", "ny", "nc", "nd",
+        "oh", "ok", "or", "pa", "ri", "sc", "sd", "tn", "tx", "ut", "vt", "va", "wa", "wv", "wi", "wy", "dc",
+    ],
+    "canada": ["on", "bc", "qc", "ab", "mb", "sk", "ns", "nb", "nl", "pe", "yt", "nt", "nu"],
+    "united kingdom": ["uk", "gb"],
+}
+# what a target region may be called in the ICP -> the region it means
+REGION_SYNONYMS = {"us": "united states", "usa": "united states", "america": "united states", "uk": "united kingdom"}
+UNKNOWN_REGION_SCORE = 0.5
+
+
+def normalize_title(title: str) -> str:
+    """'VP, IT & Ops' -> 'vice president information technology operations'"""
+    words = re.sub(r"[^a-z0-9& ]+", " ", (title or "").lower()).replace("&", " ").split()
+    return " ".join(TITLE_ABBREVIATIONS.get(word, word) for word in words)
+
+
+def trigrams(text: str) -> set:
+    text = f"  {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def words(text: str, pattern: str = r"[^a-z ]+") -> List[str]:
+    return re.sub(pattern, " ", (text or "").lower()).split()
+
+
+def padded(texts: List[str]) -> np.ndarray:
+    """Texts as a NumPy string array with a space on each side, so " word " only matches whole words."""
+    return np.array([f" {text} " for text in texts], dtype=str)
+
+
+def contains_any(texts: np.ndarray, needles) -> np.ndarray:
+    """True for every text that contains at least one of the needles."""
+    found = np.zeros(len(texts), dtype=bool)
+    for needle in needles:
+        found |= np.char.find(texts, needle) >= 0
+    return found
+
+
+def best_share(texts: np.ndarray, targets: List[set], text_sizes: np.ndarray = None) -> np.ndarray:
+    """
+    For every text, the best score over the targets, each target being a set of tokens the text can contain.
+    Without text_sizes the score is the share of the target's tokens found (role match), with text_sizes it is
+    the Jaccard similarity, |found| / (text size + target size - |found|) (title similarity).
+    """
+    targets = [target for target in targets if target]
+    if not targets or not len(texts):
+        return np.zeros(len(texts))
+    vocabulary = sorted(set().union(*targets))
+    # found[lead, token] is 1 when the lead's text contains the token, target_matrix[target, token] when the target has it
+    found = np.stack([np.char.find(texts, token) >= 0 for token in vocabulary], axis=1).astype(np.float64)
+    target_matrix = np.array([[token in target for token in vocabulary] for target in targets], dtype=np.float64)
+    target_sizes = target_matrix.sum(axis=1)
+
+    intersection = found @ target_matrix.T
+    if text_sizes is None:
+        scores = intersection / target_sizes
+    else:
+        scores = intersection / (text_sizes[:, None] + target_sizes[None, :] - intersection)
+    return scores.max(axis=1)
+
+
+def seniority(titles: np.ndarray) -> np.ndarray:
+    column = np.full(len(titles), DEFAULT_SENIORITY)
+    # lowest level first, so the first matching level in SENIORITY_LEVELS is the one left standing
+    for keywords, level in reversed(SENIORITY_LEVELS):
+        column = np.where(contains_any(titles, [f" {keyword} " for keyword in keywords]), level, column)
+    return column
+
+
+def departments(text: str) -> set:
+    return {department for department, keywords in DEPARTMENTS.items() if any(keyword in text for keyword in keywords)}
+
+
+def place_words(text: str) -> str:
+    """'U.S.A.' -> 'usa', 'Guelph,  ON' -> 'guelph on'"""
+    return " ".join(words((text or "").replace(".", "")))
+
+
+def region_match(locations: List[str], target_regions: List[str]) -> np.ndarray:
+    """
+    1 when the location is in a target region, 0 when it isn't, UNKNOWN_REGION_SCORE without either.
+    A region matches by its name, a state / province / country name (REGION_NAMES) or code (REGION_CODES), all as whole words.
+    """
+    known = np.array([bool(location) for location in locations], dtype=bool)
+    if not target_regions:
+        return np.full(len(locations), UNKNOWN_REGION_SCORE)
+    location_words = padded([place_words(location) for location in locations])
+    # every comma separated part on its own between "|", so "|mi|" only matches a part that is just the code
+    location_parts = np.array(["|" + "|".join(place_words(part) for part in location.split(",")) + "|" for location in locations], dtype=str)
+
+    matched = np.zeros(len(locations), dtype=bool)
+    for region in target_regions:
+        region = place_words(region)
+        region = REGION_SYNONYMS.get(region, region)
+        if not region:
+            continue
+        matched |= contains_any(location_words, [f" {name} " for name in [region] + REGION_NAMES.get(region, [])])
+        matched |= contains_any(location_parts, [f"|{code}|" for code in REGION_CODES.get(region, [])])
+    return np.where(known, matched.astype(np.float64), UNKNOWN_REGION_SCORE)
+
+
+def company_score(value) -> float:
+    try:
+        return float(value) / 100
+    except (TypeError, ValueError):
+        return 0.5
+
+
+def icp_fit(company_infos: List[Dict], icp: Dict) -> np.ndarray:
+    """Company relevance_score from company research, nudged by industry keyword overlap with the ICP."""
+    company_scores = np.array([company_score(company_info.get("relevance_score")) for company_info in company_infos], dtype=np.float64)
+
+    icp_words = sorted(set(words(icp.get("company_industry"))) - STOP_WORDS)
+    if icp_words:
+        industries = padded([" ".join(words(company_info.get("industry"))) for company_info in company_infos])
+        industry_overlap = sum(contains_any(industries, [f" {word} "]).astype(np.float64) for word in icp_words) / len(icp_words)
+    else:
+        industry_overlap = np.full(len(company_infos), 0.5)
+
+    return np.clip(0.7 * company_scores + 0.3 * industry_overlap, 0, 1)
+
+
+def flatten_leads(company_list_obj: Dict) -> List[Dict]:
+    """Turn company_list[].company_info.people_list[] into the leads_list shape (person + slim company_info)."""
+    leads = []
+    for company in company_list_obj.get("company_list", []):
+        company_info = company.get("company_info", company)
+        slim_company_info = {
+            key: company_info.get(key, "")
+            for key in ["name", "website", "description", "industry", "location", "relevant_info", "relevance_score"]
+        }
+        for person in company_info.get("people_list", []) or []:
+            if not isinstance(person, dict):
+                continue
+            person = person.get("person_info", person)
+            lead = {key: value for key, value in person.items() if key != "company_info"}
+            lead["company_info"] = slim_company_info
+            leads.append(lead)
+    return leads
+
+
+def build_feature_matrix(leads: List[Dict], intake_info: Dict) -> np.ndarray:
+    """One row per lead, one column per entry in FEATURES, every value in [0, 1]."""
+    if not leads:
+        return np.zeros((0, len(FEATURES)))
+    icp = intake_info.get("ICP", {})
+    target_titles = [normalize_title(title) for title in icp.get("target_titles", [])]
+    target_regions = icp.get("target_regions", [])
+    icp_departments = departments(" ".join(target_titles) + " " + (icp.get("additional_notes") or "").lower())
+    department_keywords = [keyword for department in sorted(icp_departments) for keyword in DEPARTMENTS[department]]
+
+    # the only per-lead Python is pulling the fields out, every feature below works on whole columns
+    company_infos = [lead.get("company_info") or {} for lead in leads]
+    titles = [normalize_title(lead.get("title", "")) for lead in leads]
+    word_titles = padded(titles)
+    trigram_titles = np.array([f"  {title} " for title in titles], dtype=str)
+    trigram_counts = np.array([len(trigrams(title)) for title in titles], dtype=np.float64)
+    contacts = np.array([[bool(lead.get(field)) for field in CONTACT_FIELDS] for lead in leads], dtype=np.float64)
+    source_counts = np.array([len(lead.get("source_urls") or []) for lead in leads], dtype=np.float64)
+
+    columns = [
+        best_share(word_titles, [{f" {word} " for word in target.split()} - {f" {word} " for word in STOP_WORDS} for target in target_titles]),
+        seniority(word_titles),
+        contains_any(np.array(titles, dtype=str), department_keywords).astype(np.float64),
+        region_match([company_info.get("location") or "" for company_info in company_infos], target_regions),
+        best_share(trigram_titles, [trigrams(target) for target in target_titles], trigram_counts),
+        icp_fit(company_infos, icp),
+        contacts.mean(axis=1),
+        np.minimum(source_counts, MAX_COUNTED_SOURCES) / MAX_COUNTED_SOURCES,
+    ]
+    return np.column_stack(columns)
+
+
+def score_leads(leads: List[Dict], intake_info: Dict, weights: Dict[str, float] = None) -> np.ndarray:
+    """Return a 0-100 relevance score for each lead, in input order."""
+    if not leads:
+        return np.zeros(0)
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    weight_vector = np.array([weights[feature] for feature in FEATURES], dtype=np.float64)
+    total_weight = weight_vector.sum() or 1.0
+
+    matrix = build_feature_matrix(leads, intake_info)
+    return np.rint(np.clip(matrix @ weight_vector / total_weight * 100, 0, 100))
+
+
+def rank_leads(company_list_obj: Dict, intake_info: Dict, weights: Dict[str, float] = None) -> List[Dict]:
+    """Flatten every company's people into leads, set relevance_score, and sort best first."""
+    leads = flatten_leads(company_list_obj)
+    scores = score_leads(leads, intake_info, weights)
+    for lead, score in zip(leads, scores):
+        lead["relevance_score"] = int(score)
+
+    # stable sort so ties keep their company order
+    order = np.argsort(-scores, kind="stable")
+    return [leads[i] for i in order]
+
+
+def calibrate_shard_scores(shard_scores: List[np.ndarray], shard_anchors: List[np.ndarray]) -> List[np.ndarray]:
+    """
+    Make scores that were produced independently per shard (one LLM call per company) comparable.
+
+    Each shard's scores are centered on the shard mean, so an LLM that grades one company harshly and another
+    generously doesn't skew the ranking, while the spread it gave between people at the same company is kept.
+    The centered scores are then re-based on the pooled mean of all shards, shifted by how much better or worse
+    that shard's leads look to the deterministic engine (the anchor) than the average lead.
+    """
+    non_empty = [scores for scores in shard_scores if len(scores)]
+    if not non_empty:
+        return [np.zeros(0) for _ in shard_scores]
+
+    pooled_scores = np.concatenate(non_empty)
+    pooled_anchors = np.concatenate([anchors for anchors in shard_anchors if len(anchors)])
+    global_mean = pooled_scores.mean()
+    anchor_mean = pooled_anchors.mean()
+
+    calibrated = []
+    for scores, anchors in zip(shard_scores, shard_anchors):
+        if not len(scores):
+            calibrated.append(np.zeros(0))
+            continue
+        shard_shift = anchors.mean() - anchor_mean
+        calibrated.append(np.rint(np.clip(scores - scores.mean() + global_mean + shard_shift, 0, 100)))
+    return calibrated
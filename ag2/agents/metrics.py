@@ -0,0 +1,181 @@
+# agents/metrics.py
+"""
+Process-local latency metrics for the lead pipeline, rendered in the Prometheus text format on /metrics.
+
+  • stage_span("people_research")          times a pipeline stage
+  • provider_span("perplexity", "search")  times an outbound provider call
+Each span feeds a duration histogram, an in-flight gauge and an error counter.
+"""
+import threading, time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+
+# histogram buckets in seconds, covering fast cache hits up to the 90s provider timeout and full runs
+DURATION_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120, 300, 600]
+# raw observations kept per label set, for exact percentiles in benchmarks
+MAX_RECENT_SAMPLES = 10_000
+
+
+def format_labels(labels: Tuple[Tuple[str, str], ...], extra: Dict[str, str] = None) -> str:
+    pairs = list(labels) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = [(key, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for key, value in pairs]
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class Metric():
+    """
+    Base class, keeps one value per label set.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.lock = threading.Lock()
+        self.values: Dict[Tuple[Tuple[str, str], ...], object] = {}
+
+    @staticmethod
+    def key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for labels, value in self.values.items():
+                lines.extend(self.render_value(labels, value))
+        return lines
+
+    def render_value(self, labels, value) -> List[str]:
+        return [f"{self.name}{format_labels(labels)} {value}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: List[float] = DURATION_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = sorted(buckets)
+        self.recent: Dict[Tuple[Tuple[str, str], ...], deque] = {}
+
+    def observe(self, value: float, **labels):
+        key = self.key(labels)
+        with self.lock:
+            counts, total, count = self.values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            counts = [bucket_count + (1 if value <= bound else 0) for bucket_count, bound in zip(counts, self.buckets)]
+            self.values[key] = (counts, total + value, count + 1)
+            self.recent.setdefault(key, deque(maxlen=MAX_RECENT_SAMPLES)).append(value)
+
+    def samples(self) -> Dict[Tuple[Tuple[str, str], ...], List[float]]:
+        """Most recent raw observations per label set."""
+        with self.lock:
+            return {key: list(values) for key, values in self.recent.items()}
+
+    def render_value(self, labels, value) -> List[str]:
+        counts, total, count = value
+        lines = [
+            f"{self.name}_bucket{format_labels(labels, {'le': bound})} {bucket_count}"
+            for bound, bucket_count in zip(self.buckets, counts)
+        ]
+        lines.append(f"{self.name}_bucket{format_labels(labels, {'le': '+Inf'})} {count}")
+        lines.append(f"{self.name}_sum{format_labels(labels)} {total}")
+        lines.append(f"{self.name}_count{format_labels(labels)} {count}")
+        return lines
+
+
+class MetricsRegistry():
+    """
+    Every metric the process exposes, in registration order.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self.metrics.get(name) or self.register(Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self.metrics.get(name) or self.register(Gauge(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: List[float] = DURATION_BUCKETS) -> Histogram:
+        return self.metrics.get(name) or self.register(Histogram(name, help_text, buckets))
+
+    def reset(self):
+        """Forget every recorded value (used between benchmark runs)."""
+        for metric in self.metrics.values():
+            with metric.lock:
+                metric.values.clear()
+                if isinstance(metric, Histogram):
+                    metric.recent.clear()
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+stage_duration = registry.histogram("leads_stage_duration_seconds", "Duration of lead pipeline stages")
+stage_in_flight = registry.gauge("leads_stage_in_flight", "Lead pipeline stages currently running")
+stage_errors = registry.counter("leads_stage_errors_total", "Lead pipeline stages that raised an error")
+
+provider_duration = registry.histogram("provider_request_duration_seconds", "Duration of outbound provider calls")
+provider_in_flight = registry.gauge("provider_requests_in_flight", "Outbound provider calls currently running")
+provider_errors = registry.counter("provider_request_errors_total", "Outbound provider calls that raised an error")
+
+
+@contextmanager
+def timed_span(histogram: Histogram, in_flight: Gauge, errors: Counter, **labels):
+    """Time the block into histogram, count it in_flight while it runs and count errors it raises."""
+    in_flight.inc(**labels)
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        errors.inc(**labels, error=type(e).__name__)
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+        in_flight.dec(**labels)
+
+
+def stage_span(stage: str):
+    return timed_span(stage_duration, stage_in_flight, stage_errors, stage=stage)
+
+
+def provider_span(provider: str, operation: str):
+    return timed_span(provider_duration, provider_in_flight, provider_errors, provider=provider, operation=operation)
@@ -0,0 +1,167 @@
+# agents/people_normalizer.py
+"""
+Deterministic replacement for the LLM people formatter.
+
+Takes the people-finder / enrichment output for every company and returns the same
+company_list -> company_info -> people_list shape the formatter prompt asked for:
+  • enrichment results (email_info, phone_info, linkedin_info, ...) are merged into each person
+  • people without a name, or whose name is just their title, are dropped
+  • people with the same name at the same company are merged, preferring non-empty fields
+"""
+import json
+from typing import Any, Dict, List, Optional
+from agents.people_store import company_key
+
+
+PERSON_FIELDS = [
+    "name", "title", "email", "phone", "linkedin", "relevant_info", "relevance_score",
+    "approach_reccomendation", "notes", "source_urls",
+]
+
+# value a missing field gets, "" for every field not listed
+MISSING_FIELD_VALUES = {"source_urls": [], "relevance_score": None}
+
+# alternative spellings the models use -> the field name used everywhere else
+FIELD_ALIASES = {
+    "approach_recommendation": "approach_reccomendation",
+    "linkedin_url": "linkedin",
+    "source_url": "source_urls",
+    "sources": "source_urls",
+    "phone_number": "phone",
+    "emails": "email",
+    "phone_numbers": "phone",
+}
+
+
+def parse_json_text(text: Any) -> Optional[Any]:
+    """Parse a model reply that should be JSON, tolerating markdown fences and leading prose."""
+    if not isinstance(text, str):
+        return text
+    starts = [index for index in (text.find("{"), text.find("[")) if index != -1]
+    if not starts:
+        return None
+    text = text[min(starts):]
+    end = max(text.rfind("}"), text.rfind("]"))
+    try:
+        return json.loads(text[:end + 1])
+    except json.JSONDecodeError:
+        return None
+
+
+def is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def as_list(value: Any) -> List:
+    if is_empty(value):
+        return []
+    if isinstance(value, list):
+        return [item for item in value if not is_empty(item)]
+    return [value]
+
+
+def clean_person(person: Dict) -> Dict:
+    """Rename aliased fields and make sure every PERSON_FIELDS key exists, relevance_score is a number or None."""
+    cleaned = {}
+    for key, value in person.items():
+        key = FIELD_ALIASES.get(key, key)
+        if key in cleaned and not is_empty(cleaned[key]) and is_empty(value):
+            continue
+        cleaned[key] = value
+    for field in PERSON_FIELDS:
+        cleaned.setdefault(field, MISSING_FIELD_VALUES.get(field, ""))
+    cleaned["source_urls"] = as_list(cleaned["source_urls"])
+    if is_empty(cleaned["relevance_score"]):
+        cleaned["relevance_score"] = None
+    return cleaned
+
+
+def merge_people(existing: Dict, new: Dict, new_wins: tuple = ()) -> Dict:
+    """
+    Merge two records of the same person. Non-empty values are kept over empty ones,
+    source_urls are unioned and notes are appended. Fields in new_wins take the new value when it is non-empty.
+    """
+    merged = dict(existing)
+    for key, value in new.items():
+        if key == "source_urls":
+            merged[key] = list(dict.fromkeys(as_list(merged.get(key)) + as_list(value)))
+        elif key == "notes":
+            existing_notes = str(merged.get(key) or "")
+            new_notes = str(value or "")
+            if new_notes and new_notes not in existing_notes:
+                merged[key] = f"{existing_notes} {new_notes}".strip()
+        elif key == "relevance_score":
+            scores = [score for score in (merged.get(key), value) if isinstance(score, (int, float))]
+            merged[key] = max(scores) if scores else merged.get(key, value)
+        elif is_empty(merged.get(key)) or (key in new_wins and not is_empty(value)):
+            merged[key] = value
+    return merged
+
+
+def enrich_person(entry: Dict) -> Dict:
+    """Fold {"person_info": ..., "<channel>_info": <raw reply>} into one flat person record."""
+    person = clean_person(entry.get("person_info", entry))
+    for key, raw in entry.items():
+        if key == "person_info" or not key.endswith("_info") or key == "company_info":
+            continue
+        channel_result = parse_json_text(raw)
+        if not isinstance(channel_result, dict):
+            continue
+        channel_result = channel_result.get("person_info", channel_result)
+        channel_field = FIELD_ALIASES.get(key[:-len("_info")], key[:-len("_info")])
+        found = {
+            field: value for field, value in clean_person(channel_result).items()
+            if field in (channel_field, "source_urls", "notes") and not is_empty(value)
+        }
+        # the dedicated lookup is the better source for its own field
+        person = merge_people(person, found, new_wins=(channel_field,))
+    return person
+
+
+def extract_people(raw_people: Any) -> List[Dict]:
+    """people_list can be a list of people, or the raw people-finder reply ({"people_list": [...]} as text)."""
+    parsed = parse_json_text(raw_people)
+    if isinstance(parsed, dict):
+        parsed = parsed.get("people_list", [])
+    if not isinstance(parsed, list):
+        return []
+    return [person for person in parsed if isinstance(person, dict)]
+
+
+def normalize_people_results(company_list_obj: Any) -> Dict:
+    """Merge, filter and dedupe every company's people, returning {"company_list": [{"company_info": {..., "people_list": [...]}}]}."""
+    if isinstance(company_list_obj, str):
+        company_list_obj = parse_json_text(company_list_obj) or {}
+
+    # key is the company identity, value is (company_info, {person key: person})
+    companies: Dict[str, tuple] = {}
+    for index, company in enumerate(company_list_obj.get("company_list", [])):
+        if not isinstance(company, dict):
+            continue
+        company_info = company.get("company_info", company)
+        # search_for_people puts people_list next to company_info, the enrichment step puts it inside
+        raw_people = extract_people(company_info.get("people_list"))
+        if company is not company_info:
+            raw_people = extract_people(company.get("people_list")) + raw_people
+
+        key = company_key(company_info) or f"index:{index}"
+        if key not in companies:
+            companies[key] = ({k: v for k, v in company_info.items() if k != "people_list"}, {})
+        people = companies[key][1]
+
+        for entry in raw_people:
+            person = enrich_person(entry)
+            name = str(person.get("name") or "").strip()
+            title = str(person.get("title") or "").strip()
+            if not name or name.lower() == title.lower():
+                continue
+
+            person_key = " ".join(name.lower().split())
+            people[person_key] = merge_people(people[person_key], person) if person_key in people else person
+
+    return {
+        "company_list": [
+            {"company_info": {**company_info, "people_list": list(people.values())}}
+            for company_info, people in companies.values()
+        ]
+    }
@@ -1,57 +1,29 @@
 # agents/people_research_agent.py
-import json
-from autogen import Agent, config_list_from_json, ConversableAgent
+import asyncio, json, os
+from autogen import Agent, ConversableAgent
 from agents.apollo_client import ApolloClient
+from agents.people_normalizer import extract_people, normalize_people_results
+from agents.people_store import get_people_store
 from agents.perplexity_client import PerplexityClient
+from agents.metrics import stage_span
 from agents.prompts import PERPLEXITY_PEOPLE_FINDER_SYSTEM_MESSAGE, PERPLEXITY_PEOPLE_ENRICHMENT_EMAIL_SYSTEM_MESSAGE, PERPLEXITY_PEOPLE_ENRICHMENT_PHONE_SYSTEM_MESSAGE, PERPLEXITY_PEOPLE_ENRICHMENT_LINKEDIN_SYSTEM_MESSAGE
 from dotenv import load_dotenv
 
 
 load_dotenv()
 
-SYSTEM_MESSAGE = """
-You are a helpful AI assistant. Your task is to take structured JSON input containing companies and people. Your job is to combine them into a single JSON object.
-
-Rules:
-- Only output the final answer as a JSON object. Do not include any explanations, intermediate steps, or markdown formatting.
-- Do not include anything outside the JSON object.
-- Do not modify any of the data in the input JSON objects, except to remove any people without a name value or if the name value == title value remove them as well.
-
-- You can merge people objects together if they are the same person (same name and at the same company), there should be no duplicates (two people at the same company with the same name and title). Prefer to keep data over empty strings.
-
-
-Return a JSON object in the following format:
-output example =
-{
-    "company_list": [
-        "company_info": {
-          "name": "SupplyStream Technologies",
-          "website": "https://www.supplystreamtech.com",
-          "description": "SupplyStream Technologies provides AI-driven ERP solutions for mid-sized automotive manufacturers, streamlining operations from procurement to distribution.",
-          "industry": "B2B SaaS",
-          "location": "Detroit, MI",
-          "employee_count": 45,
-          "annual_revenue": "12M",
-          "relevant_info": "This company is a good fit for the ICP because they are a mid-sized automotive manufacturer that is undergoing digital transformation and operating multiple production sites.",
-          "relevance_score": 83,
-          "people_list": [
-              {
-                  "name": "John Doe",
-                  "title": "COO",
-                  "email": "john.doe@supplystreamtech.com",
-                  "phone": "123-456-7890",
-                  "linkedin": "https://www.linkedin.com/in/john-doe-1234567890",
-                  "relevant_info": "John Doe is the COO of SupplyStream Technologies and is responsible for the overall operations of the company.",
-                  "relevance_score": 95,
-                  "approach_reccomendation": "I would approach John Doe by saying 'Hello, I'm from SupplyStream Technologies and we provide AI-driven ERP solutions for mid-sized automotive manufacturers. We're looking for a COO like you who is interested in digital transformation and streamlining operations. Would you be interested in a demo?'",
-                  "notes": "I found this information on the company website. The phone number I'm not sure if it's still valid. the email might be John's or steve hammond's",
-                  "source_urls": ["https://www.supplystreamtech.com/people/john-doe"]
-              }
-          ]
-        }
-    ]
+# max number of people-finder searches that can be in flight at once
+PEOPLE_SEARCH_CONCURRENCY = int(os.getenv("PEOPLE_SEARCH_CONCURRENCY", "8"))
+
+# which Perplexity contact enrichment lookups to run for each person
+ENRICHMENT_CHANNELS = {
+    "email": os.getenv("ENRICH_EMAIL", "true").lower() == "true",
+    "phone": os.getenv("ENRICH_PHONE", "true").lower() == "true",
+    "linkedin": os.getenv("ENRICH_LINKEDIN", "true").lower() == "true",
 }
-""".strip()
+# max number of enrichment lookups in flight at once, across all people and channels
+ENRICHMENT_MAX_IN_FLIGHT = int(os.getenv("ENRICHMENT_MAX_IN_FLIGHT", "16"))
+
 
 # ---------------------------------------------------------------------------
 # Agent definition
@@ -67,18 +39,18 @@ class PeopleResearchAgent(ConversableAgent):
     def __init__(
         self,
     ):
-        # Load config once at startup
-        config_list = config_list_from_json(env_or_file="OAI_CONFIG_LIST")
-
         # init PerplexityClient
         self.perplexity_client = PerplexityClient()
         self.apollo_client = ApolloClient()
+        self.people_store = get_people_store()
+        # one cap for every people search and enrichment lookup of every job, companies are researched concurrently
+        self.search_semaphore = asyncio.Semaphore(PEOPLE_SEARCH_CONCURRENCY)
+        self.enrichment_semaphore = asyncio.Semaphore(ENRICHMENT_MAX_IN_FLIGHT)
 
-        # init self agent that will act as the formatting agent
+        # no LLM of its own, the people results are formatted in plain Python (see format_people_results)
         super().__init__(
             name="PeopleResearchAgent",
-            llm_config={"config_list": config_list},
-            system_message=SYSTEM_MESSAGE,
+            llm_config=False,
             human_input_mode="NEVER"  # Don't ask for human input since we're in API mode
         )
 
@@ -98,7 +70,7 @@ class PeopleResearchAgent(ConversableAgent):
             return f"Input JSON parsing error: {e}"
 
         # 1. search for people
-        # findPeopleOutput = self.search_for_people(company_list_obj, intake_info)
+        # findPeopleOutput = await self.search_for_people(company_list_obj, intake_info)
 
         # 2. format the found people results
         # companyListWithPeopleResults = self.format_people_results(sender, json.dumps(findPeopleOutput))
@@ -107,13 +79,15 @@ class PeopleResearchAgent(ConversableAgent):
         print(companyListWithPeopleResults)
 
         # 3. enrich the contact info
-        enrichedContactInfoOutput = self.enrich_contact_info_perplexity(companyListWithPeopleResults)
-        # enrichedContactInfoOutput = self.enrich_contact_info_apollo(companyListWithPeopleResults)
+        with stage_span("contact_enrichment"):
+            enrichedContactInfoOutput = await self.enrich_contact_info_perplexity(companyListWithPeopleResults)
+        # enrichedContactInfoOutput = await self.enrich_contact_info_apollo(companyListWithPeopleResults)
         print("-------------------------------- enrichedContactInfoOutput --------------------------------")
         print(enrichedContactInfoOutput)
 
         # 4.format the enriched people results
-        companyListWithEnrichedPeopleResults = self.format_people_results(sender, json.dumps(enrichedContactInfoOutput))
+        with stage_span("people_formatting"):
+            companyListWithEnrichedPeopleResults = self.format_people_results(sender, json.dumps(enrichedContactInfoOutput))
         # TODO: do we need another formatter? companyListWithEnrichedPeopleResults = self.format_enriched_people_results(sender, json.dumps(enrichedContactInfoOutput))
         print("-------------------------------- companyListWithEnrichedPeopleResults --------------------------------")
         print(companyListWithEnrichedPeopleResults)
@@ -121,32 +95,66 @@ class PeopleResearchAgent(ConversableAgent):
         # return companyListWithPeopleResults
         return companyListWithEnrichedPeopleResults
     
-    def search_for_people(self, company_list_obj, intake_info):
-        # loop over the companies and get people
+    async def search_for_people(self, company_list_obj, intake_info, concurrency: int = None):
+        """
+        Run one people-finder search per company, all at once, with at most PEOPLE_SEARCH_CONCURRENCY in flight
+        across every call (or `concurrency` for this call alone).
+
+        Results keep the order of the input company_list, and a failed search for one company only
+        leaves that company's people_list empty instead of cancelling the others. Companies with fresh
+        people in the shared people store are served from it and skip the search entirely.
+        """
         company_list = company_list_obj.get("company_list", [])
-        output = {"company_list": []}
+        semaphore = asyncio.Semaphore(concurrency) if concurrency else self.search_semaphore
 
-        for company in company_list:
+        async def search_company(company):
             company_info = company.get("company_info", company) if isinstance(company, dict) else company
+
+            stored_people = self.people_store.get(company_info) if self.people_store else None
+            if stored_people and self.found_people(stored_people):
+                print(f"People for {company_info.get('name', '')} found in people store, skipping search")
+                return {
+                    "company_info": company_info,
+                    "people_list": stored_people
+                }
+
             prompt = self.build_people_search_prompt(intake_info, company_info)
             print("-------------------------------- People Finder Prompt--------------------------------")
             print(f"Prompt: {prompt}")
 
-            try:
-                # Use PerplexityClient to search for people at this company
-                people_results = self.perplexity_client.search(PERPLEXITY_PEOPLE_FINDER_SYSTEM_MESSAGE, prompt)
-                print(f"People results: {people_results}")
-            except Exception as e:
-                print(f"Error searching for people at {company_info.get('name', '')}: {e}")
-                people_results = ""
-            output["company_list"].append({
+            async with semaphore:
+                try:
+                    # Use PerplexityClient to search for people at this company
+                    people_results = await self.perplexity_client.search(PERPLEXITY_PEOPLE_FINDER_SYSTEM_MESSAGE, prompt)
+                    print(f"People results: {people_results}")
+                    # only a reply with people in it is reused, prose or broken JSON would be served for the whole freshness window
+                    found_people = self.found_people(people_results)
+                    if self.people_store and found_people:
+                        self.people_store.put(company_info, json.dumps({"people_list": found_people}))
+                    elif not found_people:
+                        print(f"No people parsed from the search for {company_info.get('name', '')}, not storing it")
+                except Exception as e:
+                    print(f"Error searching for people at {company_info.get('name', '')}: {e}")
+                    people_results = ""
+
+            return {
                 "company_info": company_info,
                 "people_list": people_results
-            })
+            }
 
-        return output
+        # gather keeps the input order, each task handles its own errors so none cancels the rest
+        with stage_span("people_search"):
+            results = await asyncio.gather(*(search_company(company) for company in company_list))
+
+        return {"company_list": list(results)}
+
+    @staticmethod
+    def found_people(people_results) -> list:
+        """The named people in a people-finder reply, [] if it isn't a JSON people_list."""
+        return [person for person in extract_people(people_results) if str(person.get("name") or "").strip()]
 
-    def enrich_contact_info_apollo(self, companyListWithPeople):
+    async def enrich_contact_info_apollo(self, companyListWithPeople):
+        """Enrich every person at every company through Apollo, batching people into bulk_match requests."""
         try:
             companyListWithPeople_obj = json.loads(companyListWithPeople)
         except Exception as e:
@@ -154,26 +162,30 @@ class PeopleResearchAgent(ConversableAgent):
             return companyListWithPeople  # fallback to un-enriched results
 
         company_list = companyListWithPeople_obj.get("company_list", [])
-        output = {"company_list": []}
 
-        # TODO: remove this to stop limiting the number of companies and people to reduce apollo usage
-        for company in company_list:
+        # flatten every (company, person) pair so they can be sent in as few bulk requests as possible
+        company_people = []
+        owners = []
+        for company_index, company in enumerate(company_list):
             company_info = company.get("company_info", company)
-            people_list = company_info.get("people_list", [])
-            enriched_people_list = []
-            for person in people_list:
+            for person in company_info.get("people_list", []):
                 person = person.get("person_info", person)
                 if not person.get("name"):
                     print(f"No name found for person {person} ??")
                     continue
-                
-                print("-------------------------------- checking person --------------------------------")
-                print(person.get("name"))
+                company_people.append((company_info.get("name", ""), person))
+                owners.append(company_index)
+
+        enriched_people = await self.apollo_client.enrich_contact_info_bulk(company_people)
 
-                companyName = company_info.get("name", "")
-                enriched_person = self.apollo_client.enrich_contact_info(companyName, person)
-                enriched_people_list.append(enriched_person)
+        # spread the enriched people back onto their companies
+        enriched_people_lists = [[] for _ in company_list]
+        for company_index, enriched_person in zip(owners, enriched_people):
+            enriched_people_lists[company_index].append(enriched_person)
 
+        output = {"company_list": []}
+        for company, enriched_people_list in zip(company_list, enriched_people_lists):
+            company_info = company.get("company_info", company)
             # update the company with the new people_list, and append to the new company_list
             company_info["people_list"] = enriched_people_list
             company["company_info"] = company_info
@@ -181,70 +193,79 @@ class PeopleResearchAgent(ConversableAgent):
         
         return output
 
-    def enrich_contact_info_perplexity(self, companyListWithPeople):
+    async def enrich_contact_info_perplexity(self, companyListWithPeople, channels: dict = None, max_in_flight: int = None):
+        """
+        Enrich every person at every company with email, phone and linkedin lookups, all running concurrently.
+
+        `channels` switches individual lookups on/off (defaults to ENRICHMENT_CHANNELS) and
+        `max_in_flight` gives this call its own cap on Perplexity calls in flight, by default every call shares
+        the agent's ENRICHMENT_MAX_IN_FLIGHT cap.
+        """
         try:
             companyListWithPeople_obj = json.loads(companyListWithPeople)
         except Exception as e:
             print(f"Error parsing formatted company/people results: {e}")
             return companyListWithPeople  # fallback to un-enriched results
 
-        company_list = companyListWithPeople_obj.get("company_list", [])
-        output = {"company_list": []}
+        enabled_channels = [channel for channel, enabled in (channels or ENRICHMENT_CHANNELS).items() if enabled]
+        semaphore = asyncio.Semaphore(max_in_flight) if max_in_flight else self.enrichment_semaphore
 
-        for company in company_list:
+        async def enrich_channel(company_info, person, channel):
+            system_prompt, build_prompt = self.enrichment_channel_prompts()[channel]
+            prompt = build_prompt(company_info, person)
+            print("-------------------------------- Contact Enrichment Prompt--------------------------------")
+            print(f"{channel}EnrichmentPrompt: {prompt}")
+
+            async with semaphore:
+                try:
+                    result = await self.perplexity_client.search(system_prompt, prompt)
+                    print(f"{channel}EnrichmentResult result: {result}")
+                except Exception as e:
+                    print(f"Error enriching {channel} info for {person.get('name', '')}: {e}")
+                    result = ""
+            return result
+
+        async def enrich_person(company_info, person):
+            results = await asyncio.gather(*(enrich_channel(company_info, person, channel) for channel in enabled_channels))
+
+            # create an object with the old person info and the new contact info
+            enriched_person = {"person_info": person}
+            for channel, result in zip(enabled_channels, results):
+                enriched_person[f"{channel}_info"] = result
+            return enriched_person
+
+        async def enrich_company(company):
             company_info = company["company_info"]
-            people_list = company_info.get("people_list", [])
-            enriched_people_list = []
-            for person in people_list:
+            people = []
+            for person in company_info.get("people_list", []):
                 person = person.get("person_info", person)
                 if not person.get("name"):
                     print(f"No name found for person {person} ??")
                     continue
-
-                emailEnrichmentPrompt = self.build_email_enrichment_prompt(company_info, person)
-                phoneEnrichmentPrompt = self.build_phone_enrichment_prompt(company_info, person)
-                linkedinEnrichmentPrompt = self.build_linkedin_enrichment_prompt(company_info, person)
-                print("-------------------------------- Contact Enrichment Prompt--------------------------------")
-                print(f"linkedinEnrichmentPrompt: {linkedinEnrichmentPrompt}")
-
-                try:
-                    # emailEnrichmentResult = self.perplexity_client.search(PERPLEXITY_PEOPLE_ENRICHMENT_EMAIL_SYSTEM_MESSAGE, emailEnrichmentPrompt)
-                    # phoneEnrichmentResult = self.perplexity_client.search(PERPLEXITY_PEOPLE_ENRICHMENT_PHONE_SYSTEM_MESSAGE, phoneEnrichmentPrompt)
-                    linkedinEnrichmentResult = self.perplexity_client.search(PERPLEXITY_PEOPLE_ENRICHMENT_LINKEDIN_SYSTEM_MESSAGE, linkedinEnrichmentPrompt)
-                    # print(f"emailEnrichmentResult result: {emailEnrichmentResult}")
-                    # print(f"phoneEnrichmentResult result: {phoneEnrichmentResult}")
-                    print(f"linkedinEnrichmentResult result: {linkedinEnrichmentResult}")
-                except Exception as e:
-                    print(f"Error enriching contact info for {person.get('name', '')}: {e}")
-                
-                # create an object with the old person info and the new contact info and append to new people_list
-                enriched_people_list.append({
-                    "person_info": person,
-                    # "email_info": emailEnrichmentResult,
-                    # "phone_info": phoneEnrichmentResult,
-                    "linkedin_info": linkedinEnrichmentResult
-                })
+                people.append(person)
 
             # update the company with the new people_list
-            company_info["people_list"] = enriched_people_list
+            company_info["people_list"] = list(await asyncio.gather(*(enrich_person(company_info, person) for person in people)))
             company["company_info"] = company_info
-            output["company_list"].append(company)
-        
-        return output
+            return company
 
+        company_list = companyListWithPeople_obj.get("company_list", [])
+        output = {"company_list": list(await asyncio.gather(*(enrich_company(company) for company in company_list)))}
 
-    def format_people_results(self, sender, rawCompanyInfoAndPeopleResults):
-        # Create a message in the format expected by the formatter agent
-        user_message = {
-            "role": "user",
-            "content": rawCompanyInfoAndPeopleResults
+        return output
+
+    def enrichment_channel_prompts(self):
+        """Map each enrichment channel to its (system prompt, user prompt builder)."""
+        return {
+            "email": (PERPLEXITY_PEOPLE_ENRICHMENT_EMAIL_SYSTEM_MESSAGE, self.build_email_enrichment_prompt),
+            "phone": (PERPLEXITY_PEOPLE_ENRICHMENT_PHONE_SYSTEM_MESSAGE, self.build_phone_enrichment_prompt),
+            "linkedin": (PERPLEXITY_PEOPLE_ENRICHMENT_LINKEDIN_SYSTEM_MESSAGE, self.build_linkedin_enrichment_prompt),
         }
 
-        # Send the message to the formatter agent
-        self.receive(user_message, sender)
-        reply = self.generate_reply([user_message], sender=sender)
 
-        return reply
+    def format_people_results(self, sender, rawCompanyInfoAndPeopleResults):
+        """Merge, filter and dedupe the people at each company in plain Python (see agents/people_normalizer.py)."""
+        return json.dumps(normalize_people_results(rawCompanyInfoAndPeopleResults))
 
     def build_people_search_prompt(self, intake_info, company_info):
         icp = intake_info.get("ICP", {})
@@ -259,10 +280,9 @@ class PeopleResearchAgent(ConversableAgent):
         # f"Find current employees at {company_name} ({industry}) "
         # f"with titles such as {target_titles} who would be good leads for selling {product_name}, {product_desc}. "
         # f"Provide for each person: name, title, email, phone, LinkedIn, and a source URL for each field. "
+        # what to return for each person is in PERPLEXITY_PEOPLE_FINDER_SYSTEM_MESSAGE, only the per-company request goes here
         prompt = (
-            f"Find current employees at {company_name} ({industry}) with job titles such as {target_titles} who are likely decision makers or good leads for selling {product_name}, {product_desc}. "
-            f"For each person, provide their name and job title. If available, also include their email, phone, and LinkedIn profile as a bonus. Always include a source URL for each field you provide. "
-            f"Prioritize accuracy and recency. If a field is not available, leave it blank."
+            f"Find current employees at {company_name} ({industry}) with job titles such as {target_titles} who are likely decision makers or good leads for selling {product_name}, {product_desc}."
         )
         return prompt
 
@@ -271,8 +291,7 @@ class PeopleResearchAgent(ConversableAgent):
         person_name = person_info.get("name", "")
         person_title = person_info.get("title", "")
         prompt = (
-            f"Find the most accurate and up-to-date email information for {person_name}, {person_title} at {company_name}. "
-            f"Return any and all known email address. Provide source URLs for each email. If no emails are found, leave it as an empty string."
+            f"Find the most accurate and up-to-date email address(es) for {person_name}, {person_title} at {company_name}."
         )
         return prompt
     
@@ -295,7 +314,6 @@ class PeopleResearchAgent(ConversableAgent):
         person_name = person_info.get("name", "")
         person_title = person_info.get("title", "")
         prompt = (
-            f"Find the most accurate and up-to-date phone number(s) for {person_name}, {person_title} at {company_name}. "
-            f"Return any and all known phone numbers. Provide source URLs for each number. If no phone numbers are found, leave it as an empty string."
+            f"Find the most accurate and up-to-date phone number(s) for {person_name}, {person_title} at {company_name}."
         )
         return prompt
\ No newline at end of file
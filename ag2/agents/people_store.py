@@ -0,0 +1,125 @@
+# agents/people_store.py
+"""
+Shared company -> people store, so companies other reps already researched skip the people-finder search.
+
+Companies are keyed by their website domain when one is known, otherwise by their normalized name,
+and an entry is only reused while it is younger than the freshness window.
+
+ENV
+----
+  PEOPLE_STORE_ENABLED         "false" to turn the store off (default "true")
+  PEOPLE_STORE_PATH            sqlite file to store people in (default .cache/people_store.sqlite3)
+  PEOPLE_STORE_FRESHNESS_DAYS  how long found people are reused (default 30)
+"""
+import os, re, sqlite3, threading, time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+
+# ─────────── CONFIG ─────────── #
+PEOPLE_STORE_ENABLED = os.getenv("PEOPLE_STORE_ENABLED", "true").lower() == "true"
+PEOPLE_STORE_PATH = os.getenv("PEOPLE_STORE_PATH", os.path.join(".cache", "people_store.sqlite3"))
+PEOPLE_STORE_FRESHNESS_DAYS = float(os.getenv("PEOPLE_STORE_FRESHNESS_DAYS", "30"))
+
+# legal suffixes that don't change which company a name refers to
+COMPANY_NAME_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "llc", "ltd", "limited",
+    "plc", "gmbh", "ag", "sa", "lp", "llp", "group", "holdings",
+}
+
+
+def normalize_domain(website: str) -> str:
+    """https://www.Example.com/about -> example.com"""
+    if not website:
+        return ""
+    website = website.strip().lower()
+    if "://" not in website:
+        website = "http://" + website
+    host = urlparse(website).hostname or ""
+    if host.startswith("www."):
+        host = host[len("www."):]
+    return host
+
+
+def normalize_company_name(name: str) -> str:
+    """'Martinrea International Inc.' -> 'martinrea international'"""
+    words = re.sub(r"[^a-z0-9 ]+", " ", (name or "").lower()).split()
+    while words and words[-1] in COMPANY_NAME_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def company_key(company_info: Dict) -> str:
+    """Identity of a company: domain:<website domain> if known, otherwise name:<normalized name>."""
+    domain = normalize_domain(company_info.get("website", ""))
+    if domain:
+        return f"domain:{domain}"
+    name = normalize_company_name(company_info.get("name", ""))
+    if name:
+        return f"name:{name}"
+    return ""
+
+
+class PeopleStore():
+    """
+    SQLite store of the people found at each company and when they were found.
+    """
+
+    def __init__(self, path: str = PEOPLE_STORE_PATH, freshness_days: float = PEOPLE_STORE_FRESHNESS_DAYS):
+        self.path = path
+        self.freshness_seconds = freshness_days * 24 * 60 * 60
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS company_people (
+                company_key TEXT PRIMARY KEY,
+                company_name TEXT NOT NULL,
+                people TEXT NOT NULL,
+                found_at REAL NOT NULL
+            )
+        """)
+        self.connection.commit()
+
+    def get(self, company_info: Dict) -> Optional[str]:
+        """Return the people found at this company if they are still fresh, otherwise None."""
+        key = company_key(company_info)
+        if not key:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT people, found_at FROM company_people WHERE company_key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.freshness_seconds:
+            return None
+        return row[0]
+
+    def put(self, company_info: Dict, people: str):
+        """Record the people found at this company (replaces any older entry)."""
+        key = company_key(company_info)
+        if not key or not people:
+            return
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO company_people (company_key, company_name, people, found_at) VALUES (?, ?, ?, ?)",
+                (key, company_info.get("name", ""), people, time.time()),
+            )
+            self.connection.commit()
+
+
+_shared_store: Optional[PeopleStore] = None
+
+
+def get_people_store() -> Optional[PeopleStore]:
+    """Return the process-wide store, or None when PEOPLE_STORE_ENABLED is false."""
+    global _shared_store
+    if not PEOPLE_STORE_ENABLED:
+        return None
+    if _shared_store is None:
+        _shared_store = PeopleStore()
+    return _shared_store
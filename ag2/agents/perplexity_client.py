@@ -1,36 +1,128 @@
 # agents/perplexity_client.py
-import json, os, requests
+import json, os
+import httpx
+from agents.http_client import get_async_client, run_sync
+from agents.prompts import PERPLEXITY_COMPANY_RESEARCH_SYSTEM_MESSAGE, PERPLEXITY_PEOPLE_FINDER_SYSTEM_MESSAGE, PERPLEXITY_PEOPLE_ENRICHMENT_EMAIL_SYSTEM_MESSAGE, PERPLEXITY_PEOPLE_ENRICHMENT_PHONE_SYSTEM_MESSAGE, PERPLEXITY_PEOPLE_ENRICHMENT_LINKEDIN_SYSTEM_MESSAGE
+from agents.cassette import REPLAY, get_cassette
+from agents.provider_retry import TransientProviderError, resilient_call
+from agents.rate_limiter import RateLimitedError, get_rate_limiter, parse_retry_after
+from agents.response_cache import get_response_cache, make_cache_key
+from agents.single_flight import get_single_flight, request_key
+from agents.metrics import provider_span
+from agents.usage_ledger import record_usage
+from contextlib import nullcontext
 from dotenv import load_dotenv
 from jsonschema import ValidationError
 from pydantic import BaseModel
 
 load_dotenv()
 
+# ─────────── CONFIG ─────────── #
+PERPLEXITY_API_URL = os.getenv("PERPLEXITY_API_URL", "https://api.perplexity.ai/chat/completions")
+PERPLEXITY_TIMEOUT = float(os.getenv("PERPLEXITY_TIMEOUT", "90"))
+
+# prompt type for each known system prompt, used to pick the response cache TTL
+PROMPT_TYPES = {
+    PERPLEXITY_COMPANY_RESEARCH_SYSTEM_MESSAGE: "company_research",
+    PERPLEXITY_PEOPLE_FINDER_SYSTEM_MESSAGE: "people_finder",
+    PERPLEXITY_PEOPLE_ENRICHMENT_EMAIL_SYSTEM_MESSAGE: "email_enrichment",
+    PERPLEXITY_PEOPLE_ENRICHMENT_PHONE_SYSTEM_MESSAGE: "phone_enrichment",
+    PERPLEXITY_PEOPLE_ENRICHMENT_LINKEDIN_SYSTEM_MESSAGE: "linkedin_enrichment",
+}
+
 class PerplexityClient():
     """
     Specialist agent for interacting with the Perplexity API and gathering information from the web.
+
+    All requests go through the shared keep-alive client in agents/http_client.py, so any number of
+    searches can run concurrently on one event loop without a new TLS handshake per call.
     """
 
     def __init__(self,):
-        self.API_URL = "https://api.perplexity.ai/chat/completions"
+        self.API_URL = PERPLEXITY_API_URL
+        api_key = os.getenv("PERPLEXITY_API_KEY")
         self.headers = {
             "accept": "application/json",
             "content-type": "application/json",
-            "Authorization": f"Bearer {os.getenv("PERPLEXITY_API_KEY")}"
+            "Authorization": f"Bearer {api_key}"
         }
         self.model = "sonar"
         self.max_tokens = 1000
         self.web_search_options = {"search_context_size": "high"}
+        self.timeout = PERPLEXITY_TIMEOUT
+        self.cache = get_response_cache()
+        self.cassette = get_cassette()
+        # shared by every PerplexityClient in the process, so all jobs draw from one budget
+        self.rate_limiter = get_rate_limiter("perplexity")
+        # identical searches already in flight (from any job) are joined instead of sent again
+        self.single_flight = get_single_flight("perplexity")
+
 
+    async def search(self, system_prompt: str, user_prompt: str, prompt_type: str = None) -> str:
+        """
+        Processes a search request to the Perplexity API without blocking the event loop.
 
-    def search(self, system_prompt: str, user_prompt: str) -> str:
-        """Processes a search request to the Perplexity API."""
+        Responses are served from / stored in the response cache, with a TTL picked by prompt_type
+        (inferred from the system prompt when not given). In record/replay mode (PROVIDER_MODE) the
+        cache is skipped and the call is recorded to / answered from the cassette instead.
+        Concurrent identical searches share one call.
+        """
 
         if not system_prompt:
             return "no system_prompt available"
         if not user_prompt:
             return "no user_prompt available"
 
+        prompt_type = prompt_type or PROMPT_TYPES.get(system_prompt, "default")
+        request = {"model": self.model, "system_prompt": system_prompt, "user_prompt": user_prompt}
+        content, shared = await self.single_flight.do(
+            request_key("perplexity", prompt_type, request), lambda: self.fetch(system_prompt, user_prompt, prompt_type)
+        )
+        if shared:
+            # the caller that started the call paid for it
+            record_usage("perplexity", self.model, requests=0, cached_requests=1)
+        return content
+
+    async def fetch(self, system_prompt: str, user_prompt: str, prompt_type: str) -> str:
+        """One search from the cassette, the response cache or the API, in that order."""
+        if self.cassette is not None:
+            request = {"model": self.model, "system_prompt": system_prompt, "user_prompt": user_prompt}
+            content = await self.cassette.call(
+                "perplexity", prompt_type, request, lambda: self.request_live(system_prompt, user_prompt, prompt_type)
+            )
+            if self.cassette.mode == REPLAY:
+                record_usage("perplexity", self.model, requests=0, cached_requests=1)
+            return content
+
+        cache_key = make_cache_key(
+            model=self.model,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            max_tokens=self.max_tokens,
+            web_search_options=self.web_search_options,
+        )
+        if self.cache is not None:
+            cached = self.cache.get(cache_key, prompt_type)
+            if cached is not None:
+                record_usage("perplexity", self.model, requests=0, cached_requests=1)
+                return cached
+
+        content = await self.request_live(system_prompt, user_prompt, prompt_type)
+
+        if self.cache is not None:
+            self.cache.set(cache_key, content, prompt_type)
+        return content
+
+    async def request_live(self, system_prompt: str, user_prompt: str, prompt_type: str) -> str:
+        """request_search with retries on transient errors and, if enabled, a hedge when it runs past the p90."""
+        return await resilient_call("perplexity", prompt_type, lambda: self.request_search(system_prompt, user_prompt, prompt_type))
+
+    async def request_search(self, system_prompt: str, user_prompt: str, prompt_type: str = "default") -> str:
+        """
+        Send the search request to the Perplexity API, bypassing the cache, once the rate limiter allows it.
+        Only the HTTP request is timed as the provider's latency, not the limiter wait, retries or hedges around it.
+        """
+
         # Create a payload object for the API request
         data = {
             "model": self.model,
@@ -42,21 +134,35 @@ class PerplexityClient():
             "web_search_options": self.web_search_options,
         }
 
-        response = requests.post(self.API_URL, headers=self.headers, json=data, timeout=90)
-        try:
-            response.raise_for_status()
-        except requests.exceptions.Timeout as e:
-            raise RuntimeError(
-                f"Perplexity API => Request timed out: {response.text}. Status code: {response.status_code}"
-            ) from e
-        except requests.exceptions.HTTPError as e:
-            raise RuntimeError(
-                f"Perplexity API => HTTP error occurred: {response.text}. Status code: {response.status_code}"
-            ) from e
-        except requests.exceptions.RequestException as e:
-            raise RuntimeError(
-                f"Perplexity API => Error during request: {response.text}. Status code: {response.status_code}"
-            ) from e
+        client = get_async_client()
+        async with (self.rate_limiter.slot() if self.rate_limiter else nullcontext(None)) as permit:
+            try:
+                with provider_span("perplexity", prompt_type):
+                    response = await client.post(self.API_URL, headers=self.headers, json=data, timeout=self.timeout)
+            except httpx.TimeoutException as e:
+                raise TransientProviderError(f"Perplexity API => Request timed out after {self.timeout}s: {e}") from e
+            except httpx.RequestError as e:
+                raise TransientProviderError(f"Perplexity API => Error during request: {e}") from e
+
+            if response.status_code == 429:
+                retry_after = parse_retry_after(response.headers.get("retry-after"))
+                if permit is not None:
+                    permit.rate_limited(retry_after)
+                raise RateLimitedError(
+                    f"Perplexity API => Rate limited: {response.text}. Retry after: {retry_after}s", retry_after
+                )
+
+            # checked inside the slot, so the limiter backs off a failing provider instead of counting a success
+            try:
+                response.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                # 5xx are the provider's problem and usually pass, 4xx won't change on a retry
+                if response.status_code >= 500 and permit is not None:
+                    permit.failed()
+                error_type = TransientProviderError if response.status_code >= 500 else RuntimeError
+                raise error_type(
+                    f"Perplexity API => HTTP error occurred: {response.text}. Status code: {response.status_code}"
+                ) from e
 
         try:
             response_json = response.json()
@@ -73,7 +179,13 @@ class PerplexityClient():
                 "Perplexity API => Failed to parse API response into PerplexityChatCompletionResponse: " + str(e)
             ) from e
 
+        record_usage("perplexity", perp_resp.model, perp_resp.usage.prompt_tokens, perp_resp.usage.completion_tokens)
+
         return perp_resp.choices[0].message.content
+
+    def search_sync(self, system_prompt: str, user_prompt: str, prompt_type: str = None) -> str:
+        """Blocking wrapper around search() for callers that are not async."""
+        return run_sync(self.search(system_prompt, user_prompt, prompt_type))
       
     
 
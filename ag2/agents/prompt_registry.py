@@ -0,0 +1,165 @@
+# agents/prompt_registry.py
+"""
+Registry of every system prompt the pipeline sends, laid out for provider-side prompt caching.
+
+Providers reuse the work done on a request's prefix when its leading tokens are byte-identical to a
+recent request (OpenAI: prompts of 1024+ tokens, matched in 128 token steps, billed at the cached input
+price). To keep prefixes identical:
+  • every prompt is a constant registered here once, at import, and never formatted per call. Registering
+    a different text under a name that is already taken raises, so a per-call value can't sneak in
+  • per-call data goes last, prompt_user_message() orders it from most to least shared: data that is
+    the same for every call of a job (the intake JSON) before data that changes per call (one company)
+  • each prompt has a prefix_hash, /prompts shows it so a changed prefix is visible between deploys
+
+prompt_report() counts the tokens every call spends on its prompt, before (benchmarks/prompt_baseline.json,
+a snapshot taken before the prompts were compacted) and now, see benchmarks/prompt_report.py.
+"""
+import hashlib, json, os, threading
+from typing import Any, Dict, List, Optional
+from agents.intake_history import TOKENIZER, count_tokens
+from agents.usage_ledger import price_for
+
+
+# ─────────── CONFIG ─────────── #
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "prompt_baseline.json")
+# shortest prefix OpenAI caches
+MIN_CACHEABLE_TOKENS = 1024
+# default model per provider for the cost columns of the report
+REPORT_MODELS = {"openai": "gpt-4o", "perplexity": "sonar"}
+
+
+def compact_json(value: Any) -> str:
+    """One-line JSON for examples embedded in prompts, a pretty-printed string is re-serialized the same way."""
+    if isinstance(value, str):
+        value = json.loads(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+class RegisteredPrompt():
+    """
+    One system prompt: its frozen text, the provider it is sent to and who sends it.
+    """
+
+    def __init__(self, name: str, text: str, provider: str, used_by: str):
+        self.name = name
+        self.text = text
+        self.provider = provider
+        self.used_by = used_by
+        self.prefix_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        self.tokens = count_tokens(text)
+
+    def to_dict(self) -> Dict:
+        return {
+            "provider": self.provider,
+            "used_by": self.used_by,
+            "prefix_hash": self.prefix_hash,
+            "chars": len(self.text),
+            "tokens": self.tokens,
+        }
+
+
+class PromptRegistry():
+    """
+    System prompts by name.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.prompts: Dict[str, RegisteredPrompt] = {}
+
+    def register(self, name: str, text: str, provider: str, used_by: str) -> str:
+        """Register a prompt and return its text, stripped, so modules can assign the constant in one line."""
+        text = text.strip()
+        with self.lock:
+            existing = self.prompts.get(name)
+            if existing is not None and existing.text != text:
+                raise ValueError(f"Prompt {name!r} is already registered with a different text, prompts must be constant")
+            if existing is None:
+                self.prompts[name] = RegisteredPrompt(name, text, provider, used_by)
+        return text
+
+    def get(self, name: str) -> RegisteredPrompt:
+        return self.prompts[name]
+
+    def stats(self) -> Dict[str, Dict]:
+        with self.lock:
+            return {name: prompt.to_dict() for name, prompt in sorted(self.prompts.items())}
+
+
+prompt_registry = PromptRegistry()
+
+
+def prompt_user_message(*parts: Optional[str]) -> Dict:
+    """
+    User message for a call, parts ordered from the most shared to the most call specific, so calls that
+    share the leading parts (every company of one job shares the intake JSON) share the cacheable prefix.
+    """
+    return {
+        "role": "user",
+        "content": "\n".join(part for part in parts if part)
+    }
+
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def cost_per_1k_calls(provider: str, tokens: int, models: Dict[str, str] = REPORT_MODELS, cached: bool = False) -> Optional[float]:
+    price = price_for(models.get(provider, ""))
+    if price is None:
+        return None
+    per_million = price.get("cached_input", price["input"]) if cached else price["input"]
+    return round(tokens * per_million / 1_000_000 * 1000, 4)
+
+
+def prompt_report(registry: PromptRegistry = prompt_registry, baseline: Dict = None, models: Dict[str, str] = REPORT_MODELS) -> List[Dict]:
+    """
+    Tokens every call spends on each prompt before compaction (the baseline) and now, with the input cost
+    of 1000 calls at the model's input price, and at its cached input price when the prompt is long enough
+    for the provider to cache it.
+    """
+    baseline = load_baseline() if baseline is None else baseline
+    baseline_prompts = baseline.get("prompts", {})
+    # counts from another tokenizer aren't comparable, estimate both sides from characters instead
+    estimated = bool(baseline_prompts) and baseline.get("tokenizer") != TOKENIZER
+
+    rows = []
+    for name, prompt in sorted(registry.prompts.items()):
+        before = baseline_prompts.get(name)
+        after_tokens = (len(prompt.text) + 3) // 4 if estimated else prompt.tokens
+        before_tokens = None
+        if before:
+            before_tokens = (before["chars"] + 3) // 4 if estimated else before["tokens"]
+        cacheable = prompt.provider == "openai" and after_tokens >= MIN_CACHEABLE_TOKENS
+        rows.append({
+            "prompt": name,
+            "provider": prompt.provider,
+            "used_by": prompt.used_by,
+            "prefix_hash": prompt.prefix_hash,
+            "tokens_before": before_tokens,
+            "tokens_after": after_tokens,
+            "saved_pct": round(100 * (1 - after_tokens / before_tokens), 1) if before_tokens else None,
+            "cost_per_1k_calls_before": cost_per_1k_calls(prompt.provider, before_tokens, models) if before_tokens else None,
+            "cost_per_1k_calls_after": cost_per_1k_calls(prompt.provider, after_tokens, models),
+            "cacheable": cacheable,
+            "cached_cost_per_1k_calls": cost_per_1k_calls(prompt.provider, after_tokens, models, cached=True) if cacheable else None,
+            "estimated": estimated,
+        })
+    return rows
+
+
+def save_baseline(registry: PromptRegistry = prompt_registry, path: str = BASELINE_PATH):
+    """Snapshot the registered prompts' sizes, the "before" side of the report."""
+    snapshot = {
+        "tokenizer": TOKENIZER,
+        "prompts": {
+            name: {"chars": len(prompt.text), "tokens": prompt.tokens, "prefix_hash": prompt.prefix_hash}
+            for name, prompt in sorted(registry.prompts.items())
+        },
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, indent=2)
+        f.write("\n")
@@ -0,0 +1,167 @@
+# agents/provider_retry.py
+"""
+Retries and hedged requests for provider calls, aimed at tail latency.
+
+  • Retries: transient failures (429, 5xx, timeouts, connection errors) are retried up to
+    PROVIDER_MAX_RETRIES times with full-jitter exponential backoff, never sooner than a Retry-After.
+  • Hedging (opt-in): when a call hasn't answered by the observed p90 latency for its operation, a
+    duplicate is sent and whichever answers first wins, the other is cancelled. Every hedge is charged
+    to the running job's HedgeBudget, so a slow provider can at most add HEDGE_BUDGET_PER_JOB extra
+    calls to a job. Calls made outside a job are never hedged.
+
+ENV
+----
+  PROVIDER_MAX_RETRIES    retries after the first attempt (default 2)
+  RETRY_BASE_DELAY        seconds, backoff for the first retry before jitter (default 1)
+  RETRY_MAX_DELAY         seconds, cap on a single backoff (default 20)
+  HEDGING_ENABLED         "true" to hedge slow calls (default "false")
+  HEDGE_PERCENTILE        latency percentile after which a hedge is sent (default 90)
+  HEDGE_MIN_SAMPLES       successful calls observed before hedging starts (default 20)
+  HEDGE_BUDGET_PER_JOB    max hedges a single job may send (default 10)
+"""
+import asyncio, contextvars, os, random, threading, time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import numpy as np
+from agents.metrics import registry
+from agents.rate_limiter import RateLimitedError
+
+
+# ─────────── CONFIG ─────────── #
+PROVIDER_MAX_RETRIES = int(os.getenv("PROVIDER_MAX_RETRIES", "2"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "20"))
+HEDGING_ENABLED = os.getenv("HEDGING_ENABLED", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "90"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_BUDGET_PER_JOB = int(os.getenv("HEDGE_BUDGET_PER_JOB", "10"))
+# successful latencies kept per operation to estimate the hedge delay
+LATENCY_WINDOW = 200
+
+retries_total = registry.counter("provider_retries_total", "Provider calls retried after a transient error")
+hedges_total = registry.counter("provider_hedges_total", "Duplicate provider calls sent because the first was slow")
+hedge_wins_total = registry.counter("provider_hedge_wins_total", "Hedged provider calls where the duplicate answered first")
+
+
+class TransientProviderError(RuntimeError):
+    """A provider call failed in a way that is worth retrying (5xx, timeout, connection error)."""
+
+
+def is_transient(error: BaseException) -> bool:
+    return isinstance(error, (TransientProviderError, RateLimitedError))
+
+
+class HedgeBudget():
+    """
+    Number of hedged requests a job may still send.
+    """
+
+    def __init__(self, limit: int = HEDGE_BUDGET_PER_JOB):
+        self.limit = limit
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def try_spend(self) -> bool:
+        with self.lock:
+            if self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+
+current_hedge_budget: contextvars.ContextVar[Optional[HedgeBudget]] = contextvars.ContextVar("current_hedge_budget", default=None)
+
+
+class LatencyTracker():
+    """
+    Recent successful latencies per (provider, operation), for the hedge delay.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self.lock = threading.Lock()
+        self.latencies: Dict[Tuple[str, str], deque] = {}
+
+    def observe(self, provider: str, operation: str, latency: float):
+        with self.lock:
+            self.latencies.setdefault((provider, operation), deque(maxlen=self.window)).append(latency)
+
+    def percentile(self, provider: str, operation: str, percentile: float, min_samples: int = HEDGE_MIN_SAMPLES) -> Optional[float]:
+        with self.lock:
+            latencies = list(self.latencies.get((provider, operation), ()))
+        if len(latencies) < min_samples:
+            return None
+        return float(np.percentile(latencies, percentile))
+
+
+latency_tracker = LatencyTracker()
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None,
+                  base_delay: float = RETRY_BASE_DELAY, max_delay: float = RETRY_MAX_DELAY) -> float:
+    """Full-jitter exponential backoff for retry number `attempt` (0 based), at least retry_after."""
+    delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+    return max(delay, retry_after or 0.0)
+
+
+async def call_with_retries(provider: str, operation: str, call: Callable[[], Awaitable], max_retries: int = PROVIDER_MAX_RETRIES):
+    """Run call(), retrying transient errors with jittered exponential backoff."""
+    for attempt in range(max_retries + 1):
+        try:
+            return await call()
+        except Exception as e:
+            if attempt >= max_retries or not is_transient(e):
+                raise
+            delay = backoff_delay(attempt, getattr(e, "retry_after", None))
+            retries_total.inc(provider=provider, operation=operation)
+            print(f"-------------{provider} {operation} attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s-------------------")
+            await asyncio.sleep(delay)
+
+
+async def timed_call(provider: str, operation: str, call: Callable[[], Awaitable]):
+    """Run call() and feed its latency to the tracker if it succeeds."""
+    start = time.perf_counter()
+    result = await call()
+    latency_tracker.observe(provider, operation, time.perf_counter() - start)
+    return result
+
+
+async def hedged_call(provider: str, operation: str, call: Callable[[], Awaitable], enabled: bool = HEDGING_ENABLED,
+                      percentile: float = HEDGE_PERCENTILE):
+    """
+    Run call(), and if it is still running after the observed latency percentile (and the job's
+    hedge budget allows it) run a duplicate, returning whichever succeeds first.
+    """
+    hedge_after = latency_tracker.percentile(provider, operation, percentile) if enabled else None
+    budget = current_hedge_budget.get()
+    if hedge_after is None or budget is None:
+        return await timed_call(provider, operation, call)
+
+    primary = asyncio.ensure_future(timed_call(provider, operation, call))
+    pending = {primary}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_after)
+        if done or not budget.try_spend():
+            return await primary
+
+        hedges_total.inc(provider=provider, operation=operation)
+        hedge = asyncio.ensure_future(timed_call(provider, operation, call))
+        pending.add(hedge)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        hedge_wins_total.inc(provider=provider, operation=operation)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def resilient_call(provider: str, operation: str, call: Callable[[], Awaitable]):
+    """Retries around hedged attempts: the entry point provider clients use for live calls."""
+    return await call_with_retries(provider, operation, lambda: hedged_call(provider, operation, call))
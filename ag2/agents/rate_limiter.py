@@ -0,0 +1,242 @@
+# agents/rate_limiter.py
+"""
+Process-wide rate limiting for outbound provider calls, one limiter per provider shared by every job.
+
+Each limiter combines
+  • a token bucket (REQUESTS_PER_MINUTE, bursting up to MAX_CONCURRENCY requests), the hard ceiling
+  • an adaptive concurrency window, AIMD style: +1/window for every fast success, x0.5 on a 429
+    and x0.8 on a 5xx or when a call is slower than LATENCY_TARGET, so throughput settles just under what the
+    provider accepts instead of crashing into it
+  • Retry-After: a 429 with a Retry-After header pauses every caller of that provider until it passes
+
+The state is guarded by a thread lock and waiters poll with asyncio.sleep, so one limiter can be
+shared across event loops (the app loop and run_sync callers).
+
+The limiters live in each process, so the requests-per-minute and concurrency limits below are the budget
+for the whole deployment and every worker process takes a 1/WEB_CONCURRENCY share of them
+(`uvicorn --workers 4` should run with WEB_CONCURRENCY=4).
+
+ENV
+----
+  RATE_LIMITING_ENABLED             "false" to turn every limiter off (default "true")
+  WEB_CONCURRENCY                   worker processes sharing the limits below (default 1)
+  PERPLEXITY_REQUESTS_PER_MINUTE    (default 50)
+  PERPLEXITY_MAX_CONCURRENCY        (default 16)
+  PERPLEXITY_LATENCY_TARGET         seconds, slower calls shrink the window (default 30)
+  APOLLO_REQUESTS_PER_MINUTE        (default 100)
+  APOLLO_MAX_CONCURRENCY            (default 8)
+  APOLLO_LATENCY_TARGET             (default 5)
+"""
+import asyncio, os, threading, time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from agents.metrics import registry
+
+
+# ─────────── CONFIG ─────────── #
+RATE_LIMITING_ENABLED = os.getenv("RATE_LIMITING_ENABLED", "true").lower() == "true"
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+
+def worker_share(total: float) -> float:
+    """This process's share of a limit that is split between WEB_CONCURRENCY workers."""
+    return total / WEB_CONCURRENCY
+
+
+PROVIDER_LIMITS = {
+    "perplexity": {
+        "requests_per_minute": worker_share(float(os.getenv("PERPLEXITY_REQUESTS_PER_MINUTE", "50"))),
+        "max_concurrency": max(1, int(worker_share(int(os.getenv("PERPLEXITY_MAX_CONCURRENCY", "16"))))),
+        "latency_target": float(os.getenv("PERPLEXITY_LATENCY_TARGET", "30")),
+    },
+    "apollo": {
+        "requests_per_minute": worker_share(float(os.getenv("APOLLO_REQUESTS_PER_MINUTE", "100"))),
+        "max_concurrency": max(1, int(worker_share(int(os.getenv("APOLLO_MAX_CONCURRENCY", "8"))))),
+        "latency_target": float(os.getenv("APOLLO_LATENCY_TARGET", "5")),
+    },
+}
+RATE_LIMITED_DECREASE = 0.5  # window multiplier after a 429
+SLOW_DECREASE = 0.8          # window multiplier after a call slower than the latency target
+ERROR_DECREASE = 0.8         # window multiplier after a 5xx
+DECREASE_COOLDOWN = 1.0      # seconds, a burst of 429s from calls already in flight only shrinks the window once
+MAX_POLL_INTERVAL = 0.25     # seconds a waiter sleeps before re-checking the limiter
+
+concurrency_limit = registry.gauge("provider_concurrency_limit", "Adaptive concurrency window per provider")
+rate_limited_total = registry.counter("provider_rate_limited_total", "Provider responses with status 429")
+rate_limit_wait = registry.histogram("provider_rate_limit_wait_seconds", "Time calls waited for the provider rate limiter")
+
+
+class RateLimitedError(RuntimeError):
+    """A provider answered 429, retry_after is the delay it asked for (seconds) if it gave one."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After is either delay seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RatePermit():
+    """
+    Handed to the caller for one request, so it can report a 429 or a 5xx back to the limiter.
+    """
+
+    def __init__(self):
+        self.limited = False
+        self.errored = False
+        self.retry_after: Optional[float] = None
+
+    def rate_limited(self, retry_after: Optional[float] = None):
+        self.limited = True
+        self.retry_after = retry_after
+
+    def failed(self):
+        """The provider answered with a server error, the request doesn't count as a success."""
+        self.errored = True
+
+
+class AdaptiveRateLimiter():
+    """
+    Token bucket plus AIMD concurrency window for one provider.
+    """
+
+    def __init__(self, provider: str, requests_per_minute: float, max_concurrency: int, latency_target: float, min_concurrency: int = 1):
+        self.provider = provider
+        self.rate = requests_per_minute / 60
+        self.capacity = float(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.latency_target = latency_target
+
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.reset()
+
+    def reset(self):
+        """Back to a full bucket and window, forgetting 429s, latency and Retry-After pauses (calls in flight still count)."""
+        with self.lock:
+            self.tokens = self.capacity
+            self.limit = float(self.max_concurrency)
+            self.updated_at = time.monotonic()
+            self.blocked_until = 0.0
+            self.last_decrease = 0.0
+            self.latency_ewma: Optional[float] = None
+            self.rate_limited_count = 0
+        concurrency_limit.set(self.limit, provider=self.provider)
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """Wait until the provider has both a free slot in the window and a token in the bucket."""
+        start = time.monotonic()
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.in_flight >= int(self.limit):
+                    wait = MAX_POLL_INTERVAL
+                elif self.tokens < 1:
+                    wait = (1 - self.tokens) / self.rate if self.rate > 0 else MAX_POLL_INTERVAL
+                else:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    break
+            await asyncio.sleep(min(max(wait, 0.005), MAX_POLL_INTERVAL))
+        rate_limit_wait.observe(time.monotonic() - start, provider=self.provider)
+
+    def release(self, latency: float, succeeded: bool, permit: RatePermit):
+        with self.lock:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if permit.limited:
+                self.rate_limited_count += 1
+                rate_limited_total.inc(provider=self.provider)
+                if permit.retry_after:
+                    self.blocked_until = max(self.blocked_until, now + permit.retry_after)
+                self.decrease(now, RATE_LIMITED_DECREASE)
+            elif permit.errored:
+                self.decrease(now, ERROR_DECREASE)
+            elif latency > self.latency_target:
+                self.decrease(now, SLOW_DECREASE)
+            elif succeeded:
+                # additive increase: about +1 per window's worth of fast successes
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            if succeeded:
+                self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+            concurrency_limit.set(round(self.limit, 2), provider=self.provider)
+
+    def decrease(self, now: float, factor: float):
+        if now - self.last_decrease < DECREASE_COOLDOWN:
+            return
+        self.last_decrease = now
+        self.limit = max(float(self.min_concurrency), self.limit * factor)
+
+    @asynccontextmanager
+    async def slot(self):
+        """`async with limiter.slot() as permit:` around one request, call permit.rate_limited() on a 429 and permit.failed() on a 5xx."""
+        await self.acquire()
+        permit = RatePermit()
+        start = time.monotonic()
+        succeeded = False
+        try:
+            yield permit
+            succeeded = not permit.limited and not permit.errored
+        finally:
+            self.release(time.monotonic() - start, succeeded, permit)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "requests_per_minute": round(self.rate * 60, 2),
+                "concurrency_limit": round(self.limit, 2),
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "tokens": round(self.tokens, 2),
+                "blocked_for": round(max(0.0, self.blocked_until - time.monotonic()), 2),
+                "latency_ewma": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+                "rate_limited": self.rate_limited_count,
+            }
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> Optional[AdaptiveRateLimiter]:
+    """Return the process-wide limiter for a provider, or None when rate limiting is off or the provider has no limits."""
+    if not RATE_LIMITING_ENABLED or provider not in PROVIDER_LIMITS:
+        return None
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = AdaptiveRateLimiter(provider, **PROVIDER_LIMITS[provider])
+        return _limiters[provider]
+
+
+def reset_rate_limiters():
+    """Reset every limiter's state, e.g. between benchmark runs so one run's window doesn't carry into the next."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    for limiter in limiters:
+        limiter.reset()
+
+
+def rate_limiter_stats() -> Dict[str, Dict]:
+    with _limiters_lock:
+        return {provider: limiter.stats() for provider, limiter in _limiters.items()}
@@ -0,0 +1,178 @@
+# agents/response_cache.py
+"""
+Disk-backed (SQLite) cache for provider responses, so repeat prompts don't cost another API call.
+
+Entries are keyed by a hash of everything that changes the answer (model, system prompt, user prompt,
+search options), expire after a per-prompt-type TTL, and the least recently used entries are evicted
+once the cache holds more than `max_entries`.
+
+A hit doesn't write: its last_accessed is only bumped when it is older than LRU_TOUCH_INTERVAL, and those
+touches are kept in memory and written in one transaction with the next set() (or every LRU_TOUCH_BATCH hits).
+
+ENV
+----
+  RESPONSE_CACHE_ENABLED      "false" to turn the cache off (default "true")
+  RESPONSE_CACHE_PATH         sqlite file to store the cache in (default .cache/response_cache.sqlite3)
+  RESPONSE_CACHE_MAX_ENTRIES  LRU size limit (default 5000)
+"""
+import hashlib, json, os, sqlite3, threading, time
+from typing import Any, Dict, Optional
+
+
+# ─────────── CONFIG ─────────── #
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join(".cache", "response_cache.sqlite3"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+# seconds, a hit on an entry accessed more recently than this doesn't move it in the LRU order
+LRU_TOUCH_INTERVAL = 60
+# pending LRU touches written at once when no set() comes along to write them
+LRU_TOUCH_BATCH = 100
+
+# how long a cached response stays fresh, in seconds, per prompt type
+HOUR = 60 * 60
+DAY = 24 * HOUR
+RESPONSE_CACHE_TTLS = {
+    "company_research": 1 * DAY,
+    "people_finder": 7 * DAY,
+    "email_enrichment": 14 * DAY,
+    "phone_enrichment": 14 * DAY,
+    "linkedin_enrichment": 30 * DAY,
+    "default": 1 * DAY,
+}
+
+
+def make_cache_key(**parts: Any) -> str:
+    """Stable hash of the request parts (dict ordering and whitespace don't change the key)."""
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache():
+    """
+    SQLite response cache with per-prompt-type TTLs, LRU eviction and hit/miss counters.
+    """
+
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttls: Dict[str, int] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = {**RESPONSE_CACHE_TTLS, **(ttls or {})}
+
+        # counters, key is the prompt type, value is the count
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        # LRU touches not written yet, key is the cache key, value is when it was last hit
+        self.pending_touches: Dict[str, float] = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # WAL only needs an fsync at checkpoints, a crash can lose the last writes but never corrupts the cache
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                prompt_type TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_last_accessed ON responses (last_accessed)")
+        self.connection.commit()
+
+    def ttl_for(self, prompt_type: str) -> int:
+        return self.ttls.get(prompt_type, self.ttls["default"])
+
+    def get(self, key: str, prompt_type: str = "default") -> Optional[str]:
+        """Return the cached response for key, or None if it is missing or expired."""
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT response, expires_at, last_accessed FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self.pending_touches.pop(key, None)
+                    self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.connection.commit()
+                self.misses[prompt_type] = self.misses.get(prompt_type, 0) + 1
+                return None
+
+            last_accessed = self.pending_touches.get(key, row[2])
+            if now - last_accessed >= LRU_TOUCH_INTERVAL:
+                self.pending_touches[key] = now
+                if len(self.pending_touches) >= LRU_TOUCH_BATCH:
+                    self.write_touches()
+                    self.connection.commit()
+            self.hits[prompt_type] = self.hits.get(prompt_type, 0) + 1
+            return row[0]
+
+    def write_touches(self):
+        """Write the pending LRU touches, the caller holds the lock and commits."""
+        if self.pending_touches:
+            self.connection.executemany(
+                "UPDATE responses SET last_accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self.pending_touches.items()],
+            )
+            self.pending_touches.clear()
+
+    def set(self, key: str, response: str, prompt_type: str = "default"):
+        """Store a response and evict the least recently used entries above max_entries."""
+        now = time.time()
+        with self.lock:
+            # the eviction below orders by last_accessed, so it has to see the recent hits
+            self.pending_touches.pop(key, None)
+            self.write_touches()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, prompt_type, response, created_at, expires_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, prompt_type, response, now, now + self.ttl_for(prompt_type), now),
+            )
+            self.connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "  SELECT key FROM responses ORDER BY last_accessed DESC LIMIT -1 OFFSET ?"
+                ")",
+                (self.max_entries,),
+            )
+            self.connection.commit()
+
+    def purge_expired(self) -> int:
+        """Delete every expired entry, returns how many were removed."""
+        with self.lock:
+            cursor = self.connection.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            self.connection.commit()
+            return cursor.rowcount
+
+    def stats(self) -> Dict:
+        """Hit/miss counters per prompt type plus the current number of entries."""
+        with self.lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        total_hits = sum(self.hits.values())
+        total_misses = sum(self.misses.values())
+        lookups = total_hits + total_misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "hit_rate": total_hits / lookups if lookups else 0.0,
+        }
+
+
+_shared_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide cache, or None when RESPONSE_CACHE_ENABLED is false."""
+    global _shared_cache
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    if _shared_cache is None:
+        _shared_cache = ResponseCache()
+    return _shared_cache
@@ -0,0 +1,135 @@
+# agents/schemas.py
+"""
+Pydantic models for the JSON shapes the agents ask the LLM for.
+
+They are sent to the model as its structured-output schema (see agents/structured_output.py) and every
+reply is validated against them before it is handed to the next stage. Field names match the prompt
+examples in agents/prompts.py and the agent system messages, misspellings included
+(approach_reccomendation), since the rest of the pipeline reads them by those names.
+
+Every field is required and no model accepts properties it doesn't declare, which is what OpenAI's strict
+json_schema mode needs, and a reply that leaves fields out fails validation and goes to the repair loop
+instead of passing as empty. Values the model may not know are Optional, it sends null (or "" / [] where
+the prompts ask for that) rather than leaving them out.
+"""
+from typing import List, Optional, Union
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, field_validator
+
+
+Number = Union[int, float]
+
+
+class StrictModel(BaseModel):
+    """Base for every schema, its JSON schema has additionalProperties: false as strict mode requires."""
+    # only the schema sent to the model is closed, extra keys in a reply are ignored rather than failing it
+    model_config = ConfigDict(json_schema_extra={"additionalProperties": False})
+
+
+# ─────────── intake ─────────── #
+class Range(StrictModel):
+    min: Optional[Number]
+    max: Optional[Number]
+
+    @field_validator("min", "max", mode="before")
+    @classmethod
+    def empty_string_is_unknown(cls, value):
+        # the prompts ask for null, a free-text reply may still send "" for a bound it doesn't know
+        return None if value == "" else value
+
+
+class CompanyInfo(StrictModel):
+    """The sales rep's own company."""
+    name: str
+    website: Optional[str]
+    description: str
+    industry: str
+    location: str
+    employee_count: Union[int, str, None]
+    annual_revenue: Union[Number, str, None]
+
+
+class ProductInfo(StrictModel):
+    name: str
+    description: str
+    key_features: List[str]
+    competitive_advantages: List[str]
+
+
+class IdealCustomerProfile(StrictModel):
+    target_titles: List[str]
+    company_industry: str
+    employee_range: Range
+    revenue_range_million_usd: Range
+    target_regions: List[str]
+    additional_notes: str
+
+
+class IntakeInfo(StrictModel):
+    """The intake JSON (INTAKE_JSON_EXAMPLE), the input to every later stage."""
+    company_info: CompanyInfo
+    product_info: ProductInfo
+    ICP: IdealCustomerProfile
+
+
+class IntakeTurn(StrictModel):
+    """One intake agent reply: a message for the user, plus the intake JSON once it is complete."""
+    message: str
+    complete: bool
+    intake: Optional[IntakeInfo]
+
+
+# ─────────── companies ─────────── #
+class Company(StrictModel):
+    """A company found as a potential lead."""
+    name: str
+    website: Optional[str]
+    description: str
+    industry: str
+    location: str
+    employee_count: Union[int, str, None]
+    annual_revenue: Union[Number, str, None]
+    relevant_info: str
+    relevance_score: Optional[Number]
+
+
+class CompanyList(StrictModel):
+    company_list: List[Company]
+
+
+# ─────────── people ─────────── #
+class Person(StrictModel):
+    """A person at a lead company, same fields as people_normalizer.PERSON_FIELDS."""
+    name: str
+    title: str
+    email: Union[str, List[str], None]
+    phone: Union[str, List[str], None]
+    linkedin: Optional[str]
+    relevant_info: str
+    relevance_score: Optional[Number]
+    approach_reccomendation: str = Field(
+        validation_alias=AliasChoices("approach_reccomendation", "approach_recommendation")
+    )
+    notes: str
+    source_urls: List[str]
+
+
+# ─────────── leads ─────────── #
+class Lead(Person):
+    """A scored person with the company they work at."""
+    company_info: Company
+
+
+class LeadsList(StrictModel):
+    complete: bool
+    leads_list: List[Lead]
+
+
+class ApproachReccomendation(StrictModel):
+    index: int
+    approach_reccomendation: str = Field(
+        validation_alias=AliasChoices("approach_reccomendation", "approach_recommendation")
+    )
+
+
+class ApproachReccomendations(StrictModel):
+    approach_reccomendations: List[ApproachReccomendation]
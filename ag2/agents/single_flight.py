@@ -0,0 +1,127 @@
+# agents/single_flight.py
+"""
+Single-flight coalescing of identical provider calls.
+
+When two jobs send the same request at the same time (two reps with similar ICPs hitting the same
+company), only the first caller makes the call, every other caller with the same normalized request
+key awaits that one in-flight call and gets the same answer. Keys are dropped as soon as the call
+finishes, so this never serves stale data (that's the response cache's job).
+
+The shared call keeps running if the caller that started it is cancelled, so the others still get
+their answer. Once every caller waiting on it has been cancelled it is cancelled too, so a cancelled
+job stops spending provider quota.
+
+ENV
+----
+  SINGLE_FLIGHT_ENABLED  "false" to send every call even when an identical one is in flight (default "true")
+"""
+import asyncio, os, threading
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from agents.cassette import normalize_request_value
+from agents.metrics import registry
+from agents.response_cache import make_cache_key
+
+
+# ─────────── CONFIG ─────────── #
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+coalesced_total = registry.counter("provider_coalesced_calls_total", "Provider calls saved by joining an identical in-flight call")
+
+
+def request_key(provider: str, operation: str, request: Dict) -> str:
+    """Key that is equal for requests differing only in case or whitespace."""
+    return make_cache_key(provider=provider, operation=operation, request=normalize_request_value(request))
+
+
+class SingleFlight():
+    """
+    In-flight calls for one provider, keyed by request key.
+    """
+
+    def __init__(self, provider: str, enabled: bool = SINGLE_FLIGHT_ENABLED):
+        self.provider = provider
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        # key is (event loop, request key), futures can only be awaited on the loop that created them
+        self.in_flight: Dict[Tuple[int, str], asyncio.Future] = {}
+        # callers currently awaiting each in-flight call, same keys
+        self.waiters: Dict[Tuple[int, str], int] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return (result, shared), shared is True when the result came from another caller's call."""
+        if not self.enabled:
+            return await call(), False
+
+        flight_key = (id(asyncio.get_running_loop()), key)
+        with self.lock:
+            future = self.in_flight.get(flight_key)
+            if future is None:
+                self.calls += 1
+                future = asyncio.ensure_future(call())
+                self.in_flight[flight_key] = future
+                self.waiters[flight_key] = 0
+                future.add_done_callback(lambda done: self.forget(flight_key, done))
+                shared = False
+            else:
+                self.coalesced += 1
+                shared = True
+            self.waiters[flight_key] += 1
+
+        if shared:
+            coalesced_total.inc(provider=self.provider)
+        try:
+            # shield so one caller being cancelled doesn't cancel the call for everyone else waiting on it
+            return await asyncio.shield(future), shared
+        finally:
+            self.leave(flight_key, future)
+
+    def leave(self, flight_key: Tuple[int, str], future: asyncio.Future):
+        """One caller stopped waiting, cancel the call when it was the last one and the call is still running."""
+        with self.lock:
+            if self.in_flight.get(flight_key) is not future:
+                return
+            self.waiters[flight_key] -= 1
+            abandoned = self.waiters[flight_key] <= 0 and not future.done()
+            if abandoned:
+                # a caller arriving while the cancel lands starts a new call instead of joining this one
+                self.in_flight.pop(flight_key, None)
+                self.waiters.pop(flight_key, None)
+        if abandoned:
+            future.cancel()
+
+    def forget(self, flight_key: Tuple[int, str], future: asyncio.Future):
+        with self.lock:
+            if self.in_flight.get(flight_key) is future:
+                self.in_flight.pop(flight_key, None)
+                self.waiters.pop(flight_key, None)
+        # mark the error as retrieved, every caller may have been cancelled before it arrived
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "enabled": self.enabled,
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self.in_flight),
+            }
+
+
+_single_flights: Dict[str, SingleFlight] = {}
+_single_flights_lock = threading.Lock()
+
+
+def get_single_flight(provider: str) -> SingleFlight:
+    """Return the process-wide single-flight group for a provider."""
+    with _single_flights_lock:
+        if provider not in _single_flights:
+            _single_flights[provider] = SingleFlight(provider)
+        return _single_flights[provider]
+
+
+def single_flight_stats() -> Dict[str, Dict]:
+    with _single_flights_lock:
+        return {provider: group.stats() for provider, group in _single_flights.items()}
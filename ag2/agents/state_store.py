@@ -0,0 +1,282 @@
+# agents/state_store.py
+"""
+Pluggable store for per-session state (intake conversations, intake data, job records, lead events, final results).
+
+Three backends share the same interface:
+  • InMemoryStateStore  - default, process-local dict, single worker only
+  • SQLiteStateStore    - survives restarts and --reload, WAL mode with indexed session lookups,
+                          shared by every worker on the same host
+  • RedisStateStore     - any Redis-protocol server (redis, valkey or a local stand-in), shared across hosts
+Every value expires after a TTL, and expired rows are purged as the store is written to, so
+memory / disk use stays flat over long uptimes.
+
+`uvicorn main:app --workers N` needs a shared backend (sqlite or redis), so a request can land on
+any worker and still see the state another worker wrote.
+
+ENV
+----
+  STATE_BACKEND      "memory", "sqlite" or "redis" (default "memory")
+  STATE_DB_PATH      sqlite file for the sqlite backend (default .cache/state.sqlite3)
+  STATE_REDIS_URL    server for the redis backend (default redis://localhost:6379/0)
+  STATE_TTL_SECONDS  how long session state is kept after its last write (default 7 days)
+"""
+import json, os, sqlite3, threading, time
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+# ─────────── CONFIG ─────────── #
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", os.path.join(".cache", "state.sqlite3"))
+STATE_REDIS_URL = os.getenv("STATE_REDIS_URL", "redis://localhost:6379/0")
+# every key the redis backend writes starts with this, so the server can be shared with other apps
+STATE_REDIS_PREFIX = "leads"
+STATE_TTL_SECONDS = float(os.getenv("STATE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+# seconds between sweeps for expired state
+PURGE_INTERVAL_SECONDS = 10 * 60
+
+
+class StateStore(ABC):
+    """
+    Interface for session state, values are stored per (namespace, session id) and must be JSON serializable.
+    """
+    # True when other processes see the same state (multi-worker safe)
+    shared = False
+
+    def __init__(self, ttl_seconds: float = STATE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.last_purge = time.time()
+
+    @abstractmethod
+    def get(self, namespace: str, session_id: str, default: Any = None) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, namespace: str, session_id: str, value: Any, ttl_seconds: float = None):
+        ...
+
+    @abstractmethod
+    def delete(self, namespace: str, session_id: str):
+        ...
+
+    @abstractmethod
+    def keys(self, namespace: str) -> list:
+        ...
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Delete every expired value, returns how many were removed."""
+        ...
+
+    def expires_at(self, ttl_seconds: float = None) -> float:
+        return time.time() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+
+    def maybe_purge(self):
+        if time.time() - self.last_purge > PURGE_INTERVAL_SECONDS:
+            self.last_purge = time.time()
+            self.purge_expired()
+
+
+class InMemoryStateStore(StateStore):
+    """
+    Process-local state, lost on restart.
+    """
+
+    def __init__(self, ttl_seconds: float = STATE_TTL_SECONDS):
+        super().__init__(ttl_seconds)
+        # key is (namespace, session id), value is (value, expires at)
+        self.values: Dict[Tuple[str, str], Tuple[Any, float]] = {}
+
+    def get(self, namespace: str, session_id: str, default: Any = None) -> Any:
+        entry = self.values.get((namespace, session_id))
+        if entry is None or entry[1] <= time.time():
+            return default
+        return entry[0]
+
+    def set(self, namespace: str, session_id: str, value: Any, ttl_seconds: float = None):
+        self.values[(namespace, session_id)] = (value, self.expires_at(ttl_seconds))
+        self.maybe_purge()
+
+    def delete(self, namespace: str, session_id: str):
+        self.values.pop((namespace, session_id), None)
+
+    def keys(self, namespace: str) -> list:
+        now = time.time()
+        return [key[1] for key, entry in list(self.values.items()) if key[0] == namespace and entry[1] > now]
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        expired = [key for key, entry in self.values.items() if entry[1] <= now]
+        for key in expired:
+            del self.values[key]
+        return len(expired)
+
+
+class SQLiteStateStore(StateStore):
+    """
+    State persisted to SQLite in WAL mode, so it survives restarts and can be read by other processes.
+    """
+    shared = True
+
+    def __init__(self, path: str = STATE_DB_PATH, ttl_seconds: float = STATE_TTL_SECONDS):
+        super().__init__(ttl_seconds)
+        self.path = path
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS session_state (
+                namespace TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (namespace, session_id)
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS session_state_session_id ON session_state (session_id)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS session_state_expires_at ON session_state (expires_at)")
+        self.connection.commit()
+
+    def get(self, namespace: str, session_id: str, default: Any = None) -> Any:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM session_state WHERE namespace = ? AND session_id = ? AND expires_at > ?",
+                (namespace, session_id, time.time()),
+            ).fetchone()
+        if row is None:
+            return default
+        return json.loads(row[0])
+
+    def set(self, namespace: str, session_id: str, value: Any, ttl_seconds: float = None):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO session_state (namespace, session_id, value, updated_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, session_id, json.dumps(value), time.time(), self.expires_at(ttl_seconds)),
+            )
+            self.connection.commit()
+        self.maybe_purge()
+
+    def delete(self, namespace: str, session_id: str):
+        with self.lock:
+            self.connection.execute(
+                "DELETE FROM session_state WHERE namespace = ? AND session_id = ?", (namespace, session_id)
+            )
+            self.connection.commit()
+
+    def keys(self, namespace: str) -> list:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT session_id FROM session_state WHERE namespace = ? AND expires_at > ?", (namespace, time.time())
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def purge_expired(self) -> int:
+        with self.lock:
+            cursor = self.connection.execute("DELETE FROM session_state WHERE expires_at <= ?", (time.time(),))
+            self.connection.commit()
+            return cursor.rowcount
+
+
+class RedisStateStore(StateStore):
+    """
+    State kept on a Redis-protocol server as one JSON string per key, expiry is left to the server.
+    """
+    shared = True
+
+    def __init__(self, url: str = STATE_REDIS_URL, ttl_seconds: float = STATE_TTL_SECONDS, prefix: str = STATE_REDIS_PREFIX):
+        super().__init__(ttl_seconds)
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("STATE_BACKEND=redis needs the redis package: pip install redis") from e
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    def key(self, namespace: str, session_id: str) -> str:
+        return f"{self.prefix}:{namespace}:{session_id}"
+
+    def get(self, namespace: str, session_id: str, default: Any = None) -> Any:
+        raw = self.client.get(self.key(namespace, session_id))
+        if raw is None:
+            return default
+        return json.loads(raw)
+
+    def set(self, namespace: str, session_id: str, value: Any, ttl_seconds: float = None):
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.client.set(self.key(namespace, session_id), json.dumps(value), px=max(1, int(ttl_seconds * 1000)))
+
+    def delete(self, namespace: str, session_id: str):
+        self.client.delete(self.key(namespace, session_id))
+
+    def keys(self, namespace: str) -> list:
+        prefix = self.key(namespace, "")
+        return [key[len(prefix):] for key in self.client.scan_iter(match=prefix + "*", count=500)]
+
+    def purge_expired(self) -> int:
+        # the server drops expired keys by itself
+        return 0
+
+
+class StateMapping(MutableMapping):
+    """
+    Dict-style view of one namespace of a StateStore, e.g. final_results[userId] = leads.
+
+    Values are copies: mutate then assign back (history.append(...); mapping[userId] = history).
+    ttl_seconds overrides the store's TTL for values written through this mapping.
+    """
+
+    def __init__(self, store: StateStore, namespace: str, ttl_seconds: float = None):
+        self.store = store
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+
+    def __getitem__(self, session_id: str) -> Any:
+        missing = object()
+        value = self.store.get(self.namespace, session_id, missing)
+        if value is missing:
+            raise KeyError(session_id)
+        return value
+
+    def __setitem__(self, session_id: str, value: Any):
+        self.store.set(self.namespace, session_id, value, self.ttl_seconds)
+
+    def __delitem__(self, session_id: str):
+        if session_id not in self:
+            raise KeyError(session_id)
+        self.store.delete(self.namespace, session_id)
+
+    def __contains__(self, session_id: object) -> bool:
+        missing = object()
+        return self.store.get(self.namespace, session_id, missing) is not missing
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.store.keys(self.namespace))
+
+    def __len__(self) -> int:
+        return len(self.store.keys(self.namespace))
+
+
+_shared_store: Optional[StateStore] = None
+
+
+def get_state_store() -> StateStore:
+    """Return the process-wide state store for the configured STATE_BACKEND."""
+    global _shared_store
+    if _shared_store is None:
+        if STATE_BACKEND == "sqlite":
+            _shared_store = SQLiteStateStore()
+        elif STATE_BACKEND == "redis":
+            _shared_store = RedisStateStore()
+        elif STATE_BACKEND == "memory":
+            _shared_store = InMemoryStateStore()
+        else:
+            raise ValueError(f"Unknown STATE_BACKEND '{STATE_BACKEND}', expected 'memory', 'sqlite' or 'redis'")
+    return _shared_store
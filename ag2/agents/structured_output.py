@@ -0,0 +1,177 @@
+# agents/structured_output.py
+"""
+Structured output, validation and repair for LLM replies that must be JSON.
+
+  • structured_llm_config() adds a pydantic model from agents/schemas.py to an agent's llm_config as its
+    response_format, so the model is constrained to the schema instead of just being asked for "JSON only"
+  • generate_validated() / a_generate_validated() validate the reply against the same model. A reply that
+    doesn't validate gets at most STRUCTURED_MAX_REPAIRS repair round trips, each one sends back just the
+    broken reply and the validation errors (not the whole original input), so a repair costs a fraction of
+    the first call. When every attempt fails the caller gets None and falls back, garbage is never passed on.
+
+Repair calls are charged to the usage ledger under "<stage>:repair", so /usage shows what unparseable
+replies cost per stage, and the metrics count every failure and repair by schema.
+
+ENV
+----
+  STRUCTURED_OUTPUT       "false" to only validate replies, without sending the schema as response_format (default "true")
+  STRUCTURED_MAX_REPAIRS  repair round trips after a reply fails validation (default 1)
+"""
+import asyncio, json, os
+from typing import Any, Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel, ValidationError
+from agents.metrics import provider_span, registry
+from agents.usage_ledger import current_stage, usage_stage
+
+
+# ─────────── CONFIG ─────────── #
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "true").lower() == "true"
+STRUCTURED_MAX_REPAIRS = int(os.getenv("STRUCTURED_MAX_REPAIRS", "1"))
+# validation errors quoted back to the model in a repair request
+MAX_REPORTED_ERRORS = 8
+
+validation_failures = registry.counter("llm_reply_validation_failures_total", "LLM replies that did not match their schema")
+repairs_total = registry.counter("llm_reply_repairs_total", "Repair round trips sent for LLM replies that did not match their schema")
+repair_outcomes = registry.counter("llm_reply_repair_outcomes_total", "LLM replies that needed repair, by whether a repair fixed them")
+
+REPAIR_PROMPT = """
+Your previous reply did not match the required JSON schema.
+
+Errors:
+{errors}
+
+Previous reply:
+{reply}
+
+Return ONLY the corrected JSON object, keep all of the data from the previous reply. No markdown fences.
+""".strip()
+
+
+def structured_llm_config(config_list: List[Dict], schema: Type[BaseModel], enabled: bool = STRUCTURED_OUTPUT) -> Dict:
+    """llm_config for an agent whose replies must match schema."""
+    llm_config = {"config_list": config_list}
+    if enabled:
+        llm_config["response_format"] = schema
+    return llm_config
+
+
+def response_format_param(schema: Type[BaseModel]) -> Dict:
+    """The schema as an OpenAI response_format, for calls made with the openai client directly, strict so it is enforced rather than a hint."""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": schema.__name__, "schema": schema.model_json_schema(), "strict": True},
+    }
+
+
+def reply_text(reply: Any) -> str:
+    if reply is None:
+        return ""
+    if isinstance(reply, dict):
+        return reply.get("content") or ""
+    return str(reply)
+
+
+def extract_json(text: str) -> Optional[str]:
+    """The outermost {...} in a reply, ignoring markdown fences and prose around it."""
+    start_index = text.find("{")
+    end_index = text.rfind("}")
+    if start_index == -1 or end_index < start_index:
+        return None
+    return text[start_index:end_index + 1]
+
+
+def format_errors(error: ValidationError) -> str:
+    lines = []
+    for item in error.errors()[:MAX_REPORTED_ERRORS]:
+        location = ".".join(str(part) for part in item.get("loc", ())) or "(root)"
+        lines.append(f"- {location}: {item.get('msg')}")
+    return "\n".join(lines)
+
+
+def validate_reply(reply: Any, schema: Type[BaseModel]) -> Tuple[Optional[BaseModel], Optional[str]]:
+    """Return (model, None) when the reply validates, otherwise (None, the errors as text)."""
+    text = extract_json(reply_text(reply))
+    if text is None:
+        return None, "- (root): the reply does not contain a JSON object"
+    try:
+        return schema.model_validate_json(text), None
+    except ValidationError as e:
+        return None, format_errors(e)
+
+
+def validate_value(value: Any, schema: Type[BaseModel]) -> Tuple[Optional[BaseModel], Optional[str]]:
+    """validate_reply() for JSON that is already parsed, e.g. a streamed element."""
+    try:
+        return schema.model_validate(value), None
+    except ValidationError as e:
+        return None, format_errors(e)
+
+
+def repair_messages(messages: List[Dict], reply: Any, errors: str) -> List[Dict]:
+    """A reply with JSON in it only needs its shape fixed, an empty or prose reply has to be generated again."""
+    text = reply_text(reply)
+    if extract_json(text) is None:
+        return messages
+    return [{"role": "user", "content": REPAIR_PROMPT.format(errors=errors, reply=text)}]
+
+
+def attempt_stage(attempt: int, stage: str) -> str:
+    return stage if attempt == 0 else f"{stage}:repair"
+
+
+def record_failure(agent, schema: Type[BaseModel], attempt: int, max_repairs: int, errors: str):
+    validation_failures.inc(schema=schema.__name__, agent=agent.name)
+    print(f"-------------{agent.name} reply failed {schema.__name__} validation (attempt {attempt + 1}/{max_repairs + 1})-------------------")
+    print(errors)
+    if attempt < max_repairs:
+        repairs_total.inc(schema=schema.__name__, agent=agent.name)
+
+
+def record_outcome(schema: Type[BaseModel], attempt: int, repaired: bool):
+    if attempt > 0:
+        repair_outcomes.inc(schema=schema.__name__, outcome="repaired" if repaired else "gave_up")
+
+
+def generate_validated(agent, messages: List[Dict], sender, schema: Type[BaseModel],
+                       max_repairs: int = STRUCTURED_MAX_REPAIRS) -> Tuple[Optional[BaseModel], Any]:
+    """
+    Get a reply from an autogen agent and validate it against schema, repairing it if needed.
+    Returns (model, last reply), model is None when no attempt validated.
+    """
+    stage = current_stage.get()
+    request, reply = messages, None
+    for attempt in range(max_repairs + 1):
+        with usage_stage(attempt_stage(attempt, stage)), provider_span("openai", agent.name):
+            reply = agent.generate_reply(request, sender=sender)
+        parsed, errors = validate_reply(reply, schema)
+        if parsed is not None:
+            record_outcome(schema, attempt, repaired=True)
+            return parsed, reply
+        record_failure(agent, schema, attempt, max_repairs, errors)
+        request = repair_messages(messages, reply, errors)
+    record_outcome(schema, max_repairs, repaired=False)
+    return None, reply
+
+
+async def a_generate_validated(agent, messages: List[Dict], sender, schema: Type[BaseModel],
+                               max_repairs: int = STRUCTURED_MAX_REPAIRS) -> Tuple[Optional[BaseModel], Any]:
+    """generate_validated() for callers on the event loop, the reply is generated in a worker thread."""
+    stage = current_stage.get()
+    request, reply = messages, None
+    for attempt in range(max_repairs + 1):
+        with usage_stage(attempt_stage(attempt, stage)), provider_span("openai", agent.name):
+            # same thread pool as a_generate_reply, but to_thread carries the job's usage ledger and stage into it
+            reply = await asyncio.to_thread(agent.generate_reply, request, sender)
+        parsed, errors = validate_reply(reply, schema)
+        if parsed is not None:
+            record_outcome(schema, attempt, repaired=True)
+            return parsed, reply
+        record_failure(agent, schema, attempt, max_repairs, errors)
+        request = repair_messages(messages, reply, errors)
+    record_outcome(schema, max_repairs, repaired=False)
+    return None, reply
+
+
+def dump_json(model: BaseModel) -> str:
+    """A validated model back to the JSON string the next stage expects."""
+    return json.dumps(model.model_dump())
@@ -0,0 +1,166 @@
+# agents/usage_ledger.py
+"""
+Token, request and cost accounting per pipeline run, broken down by stage and provider.
+
+The JobManager gives every job its own UsageLedger through a context variable, so any provider call
+made while that job runs (including in tasks it spawns) is charged to it. `usage_stage("people_research")`
+labels the calls made inside it. Every record also goes into a process-wide ledger.
+
+Costs are estimates from PRICES (USD per 1M tokens, plus a per-request fee where the provider charges one).
+"""
+import contextvars, json, threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+# USD per 1M tokens (input, cached input where the provider discounts cached prompt prefixes, output) and per request, by model
+PRICES = {
+    "sonar": {"input": 1.00, "output": 1.00, "request": 0.012},  # request fee for search_context_size=high
+    "sonar-pro": {"input": 3.00, "output": 15.00, "request": 0.014},
+    "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00, "request": 0.0},
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60, "request": 0.0},
+    "gpt-4.1": {"input": 2.00, "cached_input": 0.50, "output": 8.00, "request": 0.0},
+    "gpt-4.1-mini": {"input": 0.40, "cached_input": 0.10, "output": 1.60, "request": 0.0},
+}
+
+current_ledger: contextvars.ContextVar[Optional["UsageLedger"]] = contextvars.ContextVar("current_ledger", default=None)
+current_stage: contextvars.ContextVar[str] = contextvars.ContextVar("current_stage", default="other")
+
+
+def price_for(model: str) -> Optional[Dict]:
+    """Price of a model, matching dated versions like gpt-4o-2024-08-06 to gpt-4o."""
+    if model in PRICES:
+        return PRICES[model]
+    for name in sorted(PRICES, key=len, reverse=True):
+        if model.startswith(name + "-"):
+            return PRICES[name]
+    return None
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, requests: int) -> float:
+    price = price_for(model)
+    if price is None:
+        return 0.0
+    return (prompt_tokens * price["input"] + completion_tokens * price["output"]) / 1_000_000 + requests * price["request"]
+
+
+class UsageLedger():
+    """
+    Usage totals keyed by (stage, provider, model).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key is (stage, provider, model), value is the totals for that key
+        self.entries: Dict[tuple, Dict] = {}
+
+    def record(self, provider: str, model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+               requests: int = 1, cost: float = None, cached_requests: int = 0, stage: str = None):
+        stage = stage or current_stage.get()
+        if cost is None:
+            cost = estimate_cost(model, prompt_tokens, completion_tokens, requests)
+        with self.lock:
+            entry = self.entries.setdefault((stage, provider, model), {
+                "prompt_tokens": 0, "completion_tokens": 0, "requests": 0, "cached_requests": 0, "cost": 0.0,
+            })
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["requests"] += requests
+            entry["cached_requests"] += cached_requests
+            entry["cost"] += cost
+
+    def summary(self) -> Dict:
+        """Totals overall, per stage and per provider, plus every (stage, provider, model) entry."""
+        with self.lock:
+            entries = [
+                {"stage": stage, "provider": provider, "model": model, **totals}
+                for (stage, provider, model), totals in self.entries.items()
+            ]
+
+        def rollup(key: str) -> Dict:
+            totals = {}
+            for entry in entries:
+                bucket = totals.setdefault(entry[key], {"prompt_tokens": 0, "completion_tokens": 0, "requests": 0, "cached_requests": 0, "cost": 0.0})
+                for field in bucket:
+                    bucket[field] += entry[field]
+            return totals
+
+        return {
+            "total_cost": round(sum(entry["cost"] for entry in entries), 6),
+            "total_requests": sum(entry["requests"] for entry in entries),
+            "total_tokens": sum(entry["prompt_tokens"] + entry["completion_tokens"] for entry in entries),
+            "by_stage": rollup("stage"),
+            "by_provider": rollup("provider"),
+            "entries": entries,
+        }
+
+    def log(self, label: str):
+        print(f"-------------usage for {label}-------------------")
+        print(json.dumps(self.summary(), indent=2))
+
+
+# every record also lands here, for process-wide totals
+process_ledger = UsageLedger()
+
+
+def record_usage(provider: str, model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+                 requests: int = 1, cost: float = None, cached_requests: int = 0):
+    """Charge a provider call to the current job's ledger (if any) and the process ledger."""
+    stage = current_stage.get()
+    if cost is None:
+        cost = estimate_cost(model, prompt_tokens, completion_tokens, requests)
+    for ledger in (current_ledger.get(), process_ledger):
+        if ledger is not None:
+            ledger.record(provider, model, prompt_tokens, completion_tokens, requests, cost, cached_requests, stage)
+
+
+@contextmanager
+def usage_stage(stage: str):
+    """Label every provider call made inside this block (and tasks started in it) with stage."""
+    token = current_stage.set(stage)
+    try:
+        yield
+    finally:
+        current_stage.reset(token)
+
+
+class UsageRecordingClient():
+    """
+    Stands in for an autogen agent's OpenAIWrapper and charges every response's own usage to the job making the call.
+
+    One agent is shared by concurrent shards and jobs, so its cumulative usage can't be split between them,
+    each response's usage can. Everything else is passed through to the wrapped client.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def create(self, **config):
+        response = self.client.create(**config)
+        record_response_usage(response)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def track_agent_usage(agent):
+    """
+    Record the OpenAI usage of every call the autogen agent makes from now on, call once when the agent is created.
+
+    Usage is charged to the ledger and stage of the context making the call, autogen's async replies run in
+    an executor thread that doesn't carry it, so call generate_reply through asyncio.to_thread instead.
+    """
+    if agent.client is not None and not isinstance(agent.client, UsageRecordingClient):
+        agent.client = UsageRecordingClient(agent.client)
+    return agent
+
+
+def record_response_usage(response):
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    # autogen prices the response itself, 0 means it doesn't know the model so estimate it from PRICES
+    cost = getattr(response, "cost", None)
+    record_usage("openai", getattr(response, "model", None) or "unknown", usage.prompt_tokens or 0, usage.completion_tokens or 0,
+                 cost=cost if cost else None)
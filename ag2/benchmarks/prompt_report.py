@@ -0,0 +1,76 @@
+# benchmarks/prompt_report.py
+"""
+Token count of every registered system prompt, before compaction and now.
+
+"before" is benchmarks/prompt_baseline.json, a snapshot of the prompts as they were before they were
+compacted, "after" is the registry in agents/prompts.py. Costs are the input cost of 1000 calls of the
+prompt alone (the per-call data in the user message comes on top), and the cached input cost for
+prompts long enough for the provider to cache them.
+
+Run from /ag2:
+    python -m benchmarks.prompt_report
+    python -m benchmarks.prompt_report --openai-model gpt-4.1-mini --json prompts.json
+    python -m benchmarks.prompt_report --save-baseline   # snapshot the current prompts as the new "before"
+"""
+import argparse, json
+from typing import Dict, List
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Token count of every registered system prompt, before compaction and now")
+    parser.add_argument("--openai-model", default="gpt-4o", help="model priced for the OpenAI prompts")
+    parser.add_argument("--perplexity-model", default="sonar", help="model priced for the Perplexity prompts")
+    parser.add_argument("--json", dest="json_path", default=None, help="also write the report to this file")
+    parser.add_argument("--save-baseline", action="store_true", help="write the current prompts to the baseline file instead of reporting")
+    return parser.parse_args(argv)
+
+
+def format_value(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    return str(value)
+
+
+def print_report(rows: List[Dict], models: Dict[str, str]):
+    print("-------------prompt tokens per call-------------------")
+    print(f"priced as: {json.dumps(models)}, cost columns are USD per 1000 calls for the prompt alone")
+    print(f"{'prompt':<31} {'provider':<10} {'before':>7} {'after':>7} {'saved %':>8} {'$ before':>9} {'$ after':>8} {'cacheable':>9} {'$ cached':>9} {'prefix':>13}")
+    for row in rows:
+        print(
+            f"{row['prompt']:<31} {row['provider']:<10} {format_value(row['tokens_before']):>7} {format_value(row['tokens_after']):>7} "
+            f"{format_value(row['saved_pct']):>8} {format_value(row['cost_per_1k_calls_before']):>9} {format_value(row['cost_per_1k_calls_after']):>8} "
+            f"{format_value(row['cacheable']):>9} {format_value(row['cached_cost_per_1k_calls']):>9} {row['prefix_hash']:>13}"
+        )
+    before = sum(row["tokens_before"] or 0 for row in rows if row["tokens_before"])
+    after = sum(row["tokens_after"] for row in rows if row["tokens_before"])
+    if before:
+        print(f"total over prompts in the baseline: {before} -> {after} tokens ({round(100 * (1 - after / before), 1)}% saved)")
+    print("cacheable means the prompt alone reaches the provider's minimum cached prefix, the job's intake JSON sent right after it extends the shared prefix")
+    if any(row["estimated"] for row in rows):
+        print("token counts are estimated from characters, the baseline was counted with another tokenizer")
+
+
+def main_cli(argv: List[str] = None):
+    args = parse_args(argv)
+
+    # registers every prompt
+    import agents.prompts  # noqa: F401
+    from agents.prompt_registry import BASELINE_PATH, prompt_report, save_baseline
+
+    if args.save_baseline:
+        save_baseline()
+        print(f"-------------saved prompt baseline to {BASELINE_PATH}-------------------")
+        return
+
+    models = {"openai": args.openai_model, "perplexity": args.perplexity_model}
+    rows = prompt_report(models=models)
+    print_report(rows, models)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"models": models, "prompts": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
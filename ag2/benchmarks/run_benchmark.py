@@ -0,0 +1,255 @@
+# benchmarks/run_benchmark.py
+"""
+Offline end-to-end benchmark of the lead pipeline.
+
+Starts the provider stand-ins from benchmarks/stub_providers.py on a local port, points the OpenAI,
+Perplexity and Apollo clients at them, then runs --jobs lead generation jobs through the JobManager
+at each --concurrency setting, using the built-in test fixtures from main.py. For every setting it
+reports jobs/minute, per-stage and per-provider latency percentiles, errors and peak memory.
+
+Run from /ag2:
+    python -m benchmarks.run_benchmark --jobs 8 --concurrency 1,2,4
+    python -m benchmarks.run_benchmark --perplexity 1.5,0.6,0.02 --openai 2,0.4 --json results.json
+
+Provider profiles are "median_seconds[,sigma[,error_rate[,rate_limit_rate]]]" (log-normal latency).
+"""
+import argparse, asyncio, contextlib, json, os, resource, socket, sys, time, tracemalloc
+from typing import Dict, List
+import numpy as np
+
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the lead pipeline")
+    parser.add_argument("--jobs", type=int, default=8, help="jobs to run at each concurrency setting")
+    parser.add_argument("--concurrency", default="1,2,4", help="comma separated MAX_CONCURRENT_JOBS settings to compare")
+    parser.add_argument("--openai", default="1.0,0.4", help="OpenAI latency profile")
+    parser.add_argument("--perplexity", default="2.0,0.6", help="Perplexity latency profile")
+    parser.add_argument("--apollo", default="0.3,0.3", help="Apollo latency profile")
+    parser.add_argument("--scoring-mode", default="local", choices=["local", "sharded", "llm"], help="LEAD_SCORING_MODE for the run")
+    parser.add_argument("--stream", action="store_true", help="stream the scoring reply (LEAD_SCORING_STREAM, llm mode)")
+    parser.add_argument("--perplexity-rpm", type=float, default=None,
+                        help="rate limit Perplexity calls to this many per minute (rate limiting is off unless a limit is given)")
+    parser.add_argument("--apollo-rpm", type=float, default=None, help="rate limit Apollo calls to this many per minute")
+    parser.add_argument("--single-flight", action="store_true",
+                        help="let concurrent jobs join identical in-flight provider calls (off by default, every job sends the same fixture prompts)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for latency and error sampling")
+    parser.add_argument("--json", dest="json_path", default=None, help="also write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's own logging on stdout")
+    return parser.parse_args(argv)
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure_environment(base_url: str, scoring_mode: str, stream: bool = False, single_flight: bool = False,
+                          perplexity_rpm: float = None, apollo_rpm: float = None):
+    """Point every provider at the stand-ins and switch off the caches, must run before the agents are imported."""
+    os.environ["OAI_CONFIG_LIST"] = json.dumps([
+        {"model": "gpt-4o", "api_type": "openai", "api_key": "benchmark", "base_url": f"{base_url}/openai/v1"}
+    ])
+    os.environ["PERPLEXITY_API_URL"] = f"{base_url}/perplexity/chat/completions"
+    os.environ["PERPLEXITY_API_KEY"] = "benchmark"
+    os.environ["APOLLO_BASE_URL"] = f"{base_url}/apollo/api/v1"
+    os.environ["APOLLO_API_KEY"] = "benchmark"
+    # every job should pay for its provider calls, not read the previous job's answers
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ["PEOPLE_STORE_ENABLED"] = "false"
+    # every job sends the same fixture prompts, so with single-flight on concurrent jobs would share one call
+    os.environ["SINGLE_FLIGHT_ENABLED"] = "true" if single_flight else "false"
+    # the default limits are below what one job sends, so the benchmark would measure the token bucket, not the pipeline
+    os.environ["RATE_LIMITING_ENABLED"] = "true" if perplexity_rpm or apollo_rpm else "false"
+    # a provider without a limit on the command line gets one no benchmark reaches
+    os.environ["PERPLEXITY_REQUESTS_PER_MINUTE"] = str(perplexity_rpm or 1_000_000)
+    os.environ["APOLLO_REQUESTS_PER_MINUTE"] = str(apollo_rpm or 1_000_000)
+    # the benchmark is a single process, so it gets the whole limit
+    os.environ["WEB_CONCURRENCY"] = "1"
+    os.environ["STATE_BACKEND"] = "memory"
+    os.environ["LEAD_SCORING_MODE"] = scoring_mode
+    os.environ["LEAD_SCORING_STREAM"] = "true" if stream else "false"
+
+
+def percentiles(samples: List[float]) -> Dict:
+    if not samples:
+        return {"count": 0}
+    values = np.percentile(np.array(samples), PERCENTILES)
+    summary = {f"p{percentile}": round(float(value), 4) for percentile, value in zip(PERCENTILES, values)}
+    summary["count"] = len(samples)
+    summary["max"] = round(max(samples), 4)
+    return summary
+
+
+def samples_by_label(histogram, label: str) -> Dict[str, Dict]:
+    """Percentiles of a histogram's raw samples grouped by one label (stage or provider/operation)."""
+    grouped: Dict[str, List[float]] = {}
+    for labels, values in histogram.samples().items():
+        labels = dict(labels)
+        name = "/".join(labels.get(key, "") for key in label.split("/"))
+        grouped.setdefault(name, []).extend(values)
+    return {name: percentiles(values) for name, values in sorted(grouped.items())}
+
+
+def counter_totals(counter) -> Dict[str, float]:
+    totals = {}
+    with counter.lock:
+        for labels, value in counter.values.items():
+            name = "/".join(value for key, value in labels if key != "error")
+            totals[name] = totals.get(name, 0) + value
+    return totals
+
+
+async def run_setting(main, concurrency: int, jobs: int, intake_json: str) -> Dict:
+    """Run `jobs` lead generation jobs with at most `concurrency` at once and collect the report for this setting."""
+    from agents.job_manager import JobManager, DONE, FINISHED_STATES
+    from agents.metrics import registry, stage_duration, provider_duration, stage_errors, provider_errors
+    from agents.rate_limiter import reset_rate_limiters
+
+    registry.reset()
+    # the adaptive window and any Retry-After pause would otherwise carry over from the previous setting
+    reset_rate_limiters()
+    tracemalloc.reset_peak()
+
+    jobManager = JobManager(max_concurrent_jobs=concurrency, max_queued_jobs=jobs)
+    await jobManager.start()
+
+    start = time.perf_counter()
+    submitted = []
+    for index in range(jobs):
+        session_id = f"benchmark-{concurrency}-{index}"
+        main.intakeSessions.intake_data[session_id] = intake_json
+        submitted.append(jobManager.submit(session_id, lambda session_id=session_id: main.runLeadJob(session_id)))
+
+    while any(job.state not in FINISHED_STATES for job in submitted):
+        await asyncio.sleep(0.05)
+    wall_seconds = time.perf_counter() - start
+    await jobManager.stop()
+
+    _, peak_traced = tracemalloc.get_traced_memory()
+    done = [job for job in submitted if job.state == DONE]
+    for job in submitted:
+        main.final_results.pop(job.session_id, None)
+        main.leadEvents.clear(job.session_id)
+
+    return {
+        "concurrency": concurrency,
+        "jobs": jobs,
+        "jobs_done": len(done),
+        "jobs_failed": len(submitted) - len(done),
+        "wall_seconds": round(wall_seconds, 3),
+        "jobs_per_minute": round(len(done) / wall_seconds * 60, 2) if wall_seconds > 0 else 0.0,
+        "job_latency": percentiles([job.finished_at - job.started_at for job in done]),
+        "queue_wait": percentiles([job.started_at - job.created_at for job in submitted if job.started_at]),
+        "stages": samples_by_label(stage_duration, "stage"),
+        "providers": samples_by_label(provider_duration, "provider/operation"),
+        "stage_errors": counter_totals(stage_errors),
+        "provider_errors": counter_totals(provider_errors),
+        "peak_traced_mb": round(peak_traced / (1024 * 1024), 2),
+        # ru_maxrss is the process high-water mark (KB on linux), so it never goes down between settings
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+    }
+
+
+def print_report(report: Dict):
+    print("-------------benchmark results-------------------")
+    print(f"profiles: {json.dumps(report['profiles'])}")
+    print(f"{'concurrency':>11} {'done':>5} {'failed':>6} {'jobs/min':>9} {'job p50':>8} {'job p95':>8} {'peak MB':>8} {'rss MB':>8}")
+    for result in report["results"]:
+        job_latency = result["job_latency"]
+        print(
+            f"{result['concurrency']:>11} {result['jobs_done']:>5} {result['jobs_failed']:>6} {result['jobs_per_minute']:>9} "
+            f"{job_latency.get('p50', '-'):>8} {job_latency.get('p95', '-'):>8} {result['peak_traced_mb']:>8} {result['peak_rss_mb']:>8}"
+        )
+    for result in report["results"]:
+        print(f"-------------concurrency {result['concurrency']}: latency percentiles (seconds)-------------------")
+        for section in ("stages", "providers"):
+            for name, summary in result[section].items():
+                columns = " ".join(f"{key}={summary[key]}" for key in ["count"] + [f"p{p}" for p in PERCENTILES] if key in summary)
+                print(f"  {section[:-1]:<9} {name:<40} {columns}")
+        if result["stage_errors"] or result["provider_errors"]:
+            print(f"  errors: stages={result['stage_errors']} providers={result['provider_errors']}")
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict:
+    import random
+    from benchmarks.stub_providers import LatencyProfile, StubReplies, StubServer, create_stub_app
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    port = free_port()
+    configure_environment(f"http://127.0.0.1:{port}", args.scoring_mode, args.stream, args.single_flight, args.perplexity_rpm, args.apollo_rpm)
+
+    # imported only now, the agents read their provider URLs and settings at import time
+    import main
+    from agents import prompts
+    from agents.prompt_registry import prompt_registry
+    from agents.http_client import close_async_clients
+
+    # registered prompt name -> kind of canned reply, the perplexity prompts are told apart by PROMPT_TYPES
+    reply_kinds = {
+        "intake": "intake",
+        "intake_structured": "intake_turn",
+        "intake_summary": "intake",
+        "company_research": "company_research",
+        "company_list_formatter": "company_list_formatter",
+        "lead_scoring": "lead_scoring",
+        "approach": "approach",
+    }
+    system_messages = {prompt_registry.get(name).text: kind for name, kind in reply_kinds.items()}
+    replies = StubReplies(
+        fixtures={
+            "company_list": main.companyTestData,
+            "company_list_with_people": main.companyListWithPeopleTestData,
+            "leads_list": main.leadsTestData,
+            "intake": prompts.INTAKE_JSON_EXAMPLE,
+        },
+        system_messages={message.strip(): kind for message, kind in system_messages.items()},
+    )
+    profiles = {
+        "openai": LatencyProfile.parse(args.openai),
+        "perplexity": LatencyProfile.parse(args.perplexity),
+        "apollo": LatencyProfile.parse(args.apollo),
+    }
+    stubApp = create_stub_app(replies, profiles)
+    server = StubServer(stubApp, port=port)
+    server.start()
+
+    results = []
+    tracemalloc.start()
+    try:
+        for concurrency in [int(value) for value in args.concurrency.split(",") if value.strip()]:
+            # the pipeline prints every intermediate result, keep the report readable unless asked not to
+            with open(os.devnull, "w") as devnull, (contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)):
+                results.append(await run_setting(main, concurrency, args.jobs, prompts.INTAKE_JSON_EXAMPLE))
+    finally:
+        tracemalloc.stop()
+        await close_async_clients()
+        server.stop()
+
+    return {
+        "profiles": {provider: profile.to_dict() for provider, profile in profiles.items()},
+        "scoring_mode": args.scoring_mode,
+        "single_flight": args.single_flight,
+        "rate_limits": {"perplexity": args.perplexity_rpm, "apollo": args.apollo_rpm},
+        "stub_requests": stubApp.state.counts,
+        "results": results,
+    }
+
+
+def main_cli(argv: List[str] = None):
+    args = parse_args(argv)
+    report = asyncio.run(run_benchmark(args))
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"-------------wrote {args.json_path}-------------------")
+
+
+if __name__ == "__main__":
+    main_cli(sys.argv[1:])
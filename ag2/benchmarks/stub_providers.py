@@ -0,0 +1,266 @@
+# benchmarks/stub_providers.py
+"""
+Local stand-ins for the OpenAI, Perplexity and Apollo APIs, so the whole lead pipeline can run offline.
+
+One FastAPI app serves all three under their own prefix:
+  • /openai/v1/chat/completions         OpenAI chat completions, streamed or not (point base_url at /openai/v1)
+  • /perplexity/chat/completions        Perplexity search (PERPLEXITY_API_URL)
+  • /apollo/api/v1/people/match         Apollo single and bulk match (APOLLO_BASE_URL = /apollo/api/v1)
+  • /apollo/api/v1/people/bulk_match
+
+Every request waits for a latency drawn from its provider's LatencyProfile, fails a configurable
+fraction of requests with a 500 or 429, and answers with canned data built from the fixtures in main.py.
+"""
+import asyncio, json, math, random, re, threading, time, uuid
+from typing import Dict, Optional
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from agents.perplexity_client import PROMPT_TYPES
+
+
+class LatencyProfile():
+    """
+    Log-normal latency (median seconds, sigma) plus the fraction of requests that fail with a 500 / 429.
+    """
+
+    def __init__(self, median: float = 0.5, sigma: float = 0.5, error_rate: float = 0.0, rate_limit_rate: float = 0.0):
+        self.median = median
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyProfile":
+        """Profile from "median[,sigma[,error_rate[,rate_limit_rate]]]", e.g. "0.8,0.6,0.02"."""
+        values = [float(value) for value in spec.split(",") if value.strip()]
+        return cls(*values)
+
+    def sample_latency(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        return random.lognormvariate(math.log(self.median), self.sigma) if self.sigma > 0 else self.median
+
+    def sample_error(self) -> Optional[int]:
+        """Status code to fail this request with, or None to answer normally."""
+        roll = random.random()
+        if roll < self.error_rate:
+            return 500
+        if roll < self.error_rate + self.rate_limit_rate:
+            return 429
+        return None
+
+    def to_dict(self) -> Dict:
+        return {"median": self.median, "sigma": self.sigma, "error_rate": self.error_rate, "rate_limit_rate": self.rate_limit_rate}
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text or "") + 3) // 4
+
+
+def parse_json(text: str):
+    start_index = (text or "").find("{")
+    if start_index == -1:
+        return None
+    try:
+        return json.loads(text[start_index:])
+    except Exception:
+        return None
+
+
+class StubReplies():
+    """
+    Canned replies for every prompt the pipeline sends, picked by the system prompt.
+
+    `fixtures` holds the JSON strings main.py uses as test data:
+    company_list (companyTestData), company_list_with_people, leads_list and intake.
+    """
+
+    def __init__(self, fixtures: Dict[str, str], system_messages: Dict[str, str] = None):
+        self.fixtures = fixtures
+        # key is a system message, value is the kind of reply it expects
+        self.system_messages = system_messages or {}
+        self.people_by_company = {}
+        for company in json.loads(fixtures["company_list_with_people"]).get("company_list", []):
+            company_info = company.get("company_info", company)
+            self.people_by_company[company_info.get("name", "")] = company_info.get("people_list", [])
+
+    def openai(self, messages: list) -> str:
+        system_message = next((message.get("content") or "" for message in messages if message.get("role") == "system"), "")
+        user_message = next((message.get("content") or "" for message in reversed(messages) if message.get("role") == "user"), "")
+        kind = self.system_messages.get(system_message.strip(), "")
+
+        if kind == "approach":
+            leads = (parse_json(user_message[user_message.find('{"leads_list"'):]) or {}).get("leads_list", [])
+            return json.dumps({"approach_reccomendations": [
+                {"index": lead.get("index", index), "approach_reccomendation": "Open with the operational cost savings, then offer a short pilot."}
+                for index, lead in enumerate(leads)
+            ]})
+        if kind == "lead_scoring":
+            return self.fixtures["leads_list"]
+        if kind in ("company_research", "company_list_formatter"):
+            return self.fixtures["company_list"]
+        if kind == "intake_turn":
+            return json.dumps({"message": "Thanks, I'm starting the lead search now.", "complete": True, "intake": json.loads(self.fixtures["intake"])})
+        return self.fixtures["intake"]
+
+    def perplexity(self, system_prompt: str, user_prompt: str) -> str:
+        prompt_type = PROMPT_TYPES.get(system_prompt, "")
+        if prompt_type == "company_research":
+            return self.fixtures["company_list"]
+        if prompt_type == "people_finder":
+            company_name = next((name for name in self.people_by_company if name and name in user_prompt), "")
+            people = self.people_by_company.get(company_name) or next(iter(self.people_by_company.values()), [])
+            return json.dumps({"people_list": people})
+
+        # enrichment prompts read "... for <name>, <title> at <company>" or start with "<name>, <title>"
+        match = re.search(r"\bfor ([^,]+),", user_prompt)
+        person_name = match.group(1) if match else user_prompt.split(",")[0]
+        slug = re.sub(r"[^a-z]+", ".", person_name.lower()).strip(".") or "contact"
+        channel_values = {
+            "email_enrichment": {"email": f"{slug}@example.com"},
+            "phone_enrichment": {"phone": "+1 555 0100"},
+            "linkedin_enrichment": {"linkedin": f"https://www.linkedin.com/in/{slug.replace('.', '-')}"},
+        }
+        return json.dumps({"person_info": {
+            **channel_values.get(prompt_type, {}),
+            "source_urls": ["https://example.com/benchmark"],
+            "notes": "",
+        }})
+
+    def apollo_person(self, details: Dict) -> Dict:
+        slug = re.sub(r"[^a-z]+", ".", (details.get("name") or "contact").lower()).strip(".")
+        return {
+            "id": uuid.uuid4().hex,
+            "name": details.get("name", ""),
+            "title": details.get("title", ""),
+            "linkedin_url": f"https://www.linkedin.com/in/{slug.replace('.', '-')}",
+            "twitter_url": None,
+            "github_url": None,
+            "facebook_url": None,
+            "phone_numbers": [{"raw_number": "+1 555 0100"}],
+            "email_status": "verified",
+            "is_likely_to_engage": True,
+            "contact": {"email": f"{slug}@example.com"},
+        }
+
+
+def create_stub_app(replies: StubReplies, profiles: Dict[str, LatencyProfile]) -> FastAPI:
+    """FastAPI app serving the three provider stand-ins, `profiles` is keyed by openai / perplexity / apollo."""
+    app = FastAPI()
+    # requests served and failures injected, per provider
+    app.state.counts = {provider: {"requests": 0, "errors": 0, "rate_limited": 0} for provider in ("openai", "perplexity", "apollo")}
+
+    async def simulate(provider: str) -> Optional[JSONResponse]:
+        profile = profiles.get(provider) or LatencyProfile()
+        counts = app.state.counts[provider]
+        counts["requests"] += 1
+        await asyncio.sleep(profile.sample_latency())
+        status = profile.sample_error()
+        if status == 429:
+            counts["rate_limited"] += 1
+            return JSONResponse({"error": {"message": "rate limited (benchmark stub)"}}, status_code=429, headers={"Retry-After": "1"})
+        if status is not None:
+            counts["errors"] += 1
+            return JSONResponse({"error": {"message": "injected failure (benchmark stub)"}}, status_code=status)
+        return None
+
+    def completion(model: str, messages: list, content: str) -> Dict:
+        prompt_tokens = sum(estimate_tokens(str(message.get("content") or "")) for message in messages)
+        completion_tokens = estimate_tokens(content)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    async def completion_stream(model: str, messages: list, content: str, chunk_size: int = 40):
+        """The same reply as server-sent chunk events, paced so the whole reply takes about one more latency sample."""
+        pieces = [content[index:index + chunk_size] for index in range(0, len(content), chunk_size)] or [""]
+        pause = (profiles.get("openai") or LatencyProfile()).sample_latency() / len(pieces)
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        for piece in pieces:
+            await asyncio.sleep(pause)
+            chunk = {**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        usage = completion(model, messages, content)["usage"]
+        yield f"data: {json.dumps({**base, 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @app.post("/openai/v1/chat/completions")
+    async def openaiChatCompletions(request: Request):
+        failure = await simulate("openai")
+        if failure is not None:
+            return failure
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "gpt-4o")
+        if body.get("stream"):
+            return StreamingResponse(completion_stream(model, messages, replies.openai(messages)), media_type="text/event-stream")
+        return completion(model, messages, replies.openai(messages))
+
+    @app.post("/perplexity/chat/completions")
+    async def perplexityChatCompletions(request: Request):
+        failure = await simulate("perplexity")
+        if failure is not None:
+            return failure
+        body = await request.json()
+        messages = body.get("messages", [])
+        system_prompt = next((message.get("content") or "" for message in messages if message.get("role") == "system"), "")
+        user_prompt = next((message.get("content") or "" for message in reversed(messages) if message.get("role") == "user"), "")
+        response = completion(body.get("model", "sonar"), messages, replies.perplexity(system_prompt, user_prompt))
+        response["usage"]["search_context_size"] = "high"
+        response["citations"] = ["https://example.com/benchmark"]
+        return response
+
+    @app.post("/apollo/api/v1/people/match")
+    async def apolloPeopleMatch(request: Request):
+        failure = await simulate("apollo")
+        if failure is not None:
+            return failure
+        return {"person": replies.apollo_person(dict(request.query_params))}
+
+    @app.post("/apollo/api/v1/people/bulk_match")
+    async def apolloPeopleBulkMatch(request: Request):
+        failure = await simulate("apollo")
+        if failure is not None:
+            return failure
+        body = await request.json()
+        return {"matches": [replies.apollo_person(details) for details in body.get("details", [])]}
+
+    return app
+
+
+class StubServer():
+    """
+    Runs a stub app with uvicorn on a background thread, so the pipeline under test keeps the main event loop.
+    """
+
+    def __init__(self, app: FastAPI, host: str = "127.0.0.1", port: int = 0):
+        self.app = app
+        self.host = host
+        self.port = port
+        config = uvicorn.Config(app, host=host, port=port, loop="asyncio", log_level="warning", access_log=False)
+        self.server = uvicorn.Server(config)
+        # signal handlers can only be installed on the main thread
+        self.server.install_signal_handlers = lambda: None
+        self.thread = threading.Thread(target=self.server.run, name="benchmark-stub-server", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self, timeout: float = 10.0):
+        self.thread.start()
+        deadline = time.time() + timeout
+        while not self.server.started:
+            if time.time() > deadline or not self.thread.is_alive():
+                raise RuntimeError("benchmark stub server did not start")
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
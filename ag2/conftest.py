@@ -0,0 +1,5 @@
+# conftest.py
+# lets the tests import the agents package when pytest is run from /ag2 or from the repo root
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
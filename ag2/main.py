@@ -1,11 +1,22 @@
-import asyncio, nest_asyncio
+import asyncio, json, nest_asyncio
 from autogen import config_list_from_json
 from agents.company_research_agent import CompanyResearchAgent
-from agents.intake_agent import IntakeAgent
+from agents.http_client import close_async_clients
+from agents.response_cache import get_response_cache
+from agents.state_store import StateMapping, get_state_store
+from agents.metrics import registry as metricsRegistry, stage_span
+from agents.usage_ledger import process_ledger, usage_stage
+from agents.rate_limiter import rate_limiter_stats
+from agents.single_flight import single_flight_stats
+from agents.prompt_registry import prompt_registry
+from agents.intake_session_pool import IntakeSessionPool
+from agents.job_manager import JobManager, JobQueueFullError
+from agents.lead_events import LeadEventBroker, format_sse
 from agents.lead_scoring_agent import LeadScoringAgent
 from agents.people_research_agent import PeopleResearchAgent
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from typing import Any
 
 nest_asyncio.apply()
@@ -409,7 +420,8 @@ leadsTestData = """
                 "location": "Vancouver, BC, Canada",
                 "employee_count": "100-150",
                 "annual_revenue": "$30M-$40M",
-                "relevant_info": "Westport is a good fit for StreamERP due to its focus on clean energy solutions, which likely involves digital transformation, and operates multiple sites."
+                "relevant_info": "Westport is a good fit for StreamERP due to its focus on clean energy solutions, which likely involves digital transformation, and operates multiple sites.",
+                "relevance_score": 85
             }
         },
         {
@@ -435,7 +447,8 @@ leadsTestData = """
                 "location": "Aurora, ON, Canada",
                 "employee_count": "100-200",
                 "annual_revenue": "$20M-$50M",
-                "relevant_info": "As part of Magna, this division likely undergoes digital transformation and operates multiple production sites."
+                "relevant_info": "As part of Magna, this division likely undergoes digital transformation and operates multiple production sites.",
+                "relevance_score": 90
             }
         },
         {
@@ -461,7 +474,8 @@ leadsTestData = """
                 "location": "Vaughan, ON, Canada",
                 "employee_count": "100-200",
                 "annual_revenue": "$20M-$50M",
-                "relevant_info": "Martinrea is a good fit due to its diverse operations and likely need for digital transformation across multiple sites."
+                "relevant_info": "Martinrea is a good fit due to its diverse operations and likely need for digital transformation across multiple sites.",
+                "relevance_score": 92
             }
         },
         {
@@ -487,7 +501,8 @@ leadsTestData = """
                 "location": "Vaughan, ON, Canada",
                 "employee_count": "100-200",
                 "annual_revenue": "$20M-$50M",
-                "relevant_info": "Martinrea is a good fit due to its diverse operations and likely need for digital transformation across multiple sites."
+                "relevant_info": "Martinrea is a good fit due to its diverse operations and likely need for digital transformation across multiple sites.",
+                "relevance_score": 92
             }
         },
         {
@@ -512,7 +527,8 @@ leadsTestData = """
                 "location": "Vaughan, ON, Canada",
                 "employee_count": "100-200",
                 "annual_revenue": "$20M-$50M",
-                "relevant_info": "Martinrea is a good fit due to its diverse operations and likely need for digital transformation across multiple sites."
+                "relevant_info": "Martinrea is a good fit due to its diverse operations and likely need for digital transformation across multiple sites.",
+                "relevance_score": 92
             }
         },
         {
@@ -536,7 +552,8 @@ leadsTestData = """
                 "location": "Evansville, IN, USA",
                 "employee_count": "100-200",
                 "annual_revenue": "$20M-$50M",
-                "relevant_info": "Accuride operates multiple production sites and is likely undergoing digital transformation in its operations."
+                "relevant_info": "Accuride operates multiple production sites and is likely undergoing digital transformation in its operations.",
+                "relevance_score": 88
             }
         },
         {
@@ -560,7 +577,8 @@ leadsTestData = """
                 "location": "Evansville, IN, USA",
                 "employee_count": "100-200",
                 "annual_revenue": "$20M-$50M",
-                "relevant_info": "Accuride operates multiple production sites and is likely undergoing digital transformation in its operations."
+                "relevant_info": "Accuride operates multiple production sites and is likely undergoing digital transformation in its operations.",
+                "relevance_score": 88
             }
         },
         {
@@ -584,7 +602,8 @@ leadsTestData = """
                 "location": "Evansville, IN, USA",
                 "employee_count": "100-200",
                 "annual_revenue": "$20M-$50M",
-                "relevant_info": "Accuride operates multiple production sites and is likely undergoing digital transformation in its operations."
+                "relevant_info": "Accuride operates multiple production sites and is likely undergoing digital transformation in its operations.",
+                "relevance_score": 88
             }
         },
         {
@@ -610,7 +629,8 @@ leadsTestData = """
                 "location": "Guelph, ON, Canada",
                 "employee_count": "100-200",
                 "annual_revenue": "$20M-$50M",
-                "relevant_info": "Linamar operates multiple production sites and is likely undergoing digital transformation in its operations."
+                "relevant_info": "Linamar operates multiple production sites and is likely undergoing digital transformation in its operations.",
+                "relevance_score": 90
             }
         },
         {
@@ -635,7 +655,8 @@ leadsTestData = """
                 "location": "Guelph, ON, Canada",
                 "employee_count": "100-200",
                 "annual_revenue": "$20M-$50M",
-                "relevant_info": "Linamar operates multiple production sites and is likely undergoing digital transformation in its operations."
+                "relevant_info": "Linamar operates multiple production sites and is likely undergoing digital transformation in its operations.",
+                "relevance_score": 90
             }
         },
         {
@@ -661,7 +682,8 @@ leadsTestData = """
                 "location": "Guelph, ON, Canada",
                 "employee_count": "100-200",
                 "annual_revenue": "$20M-$50M",
-                "relevant_info": "Linamar operates multiple production sites and is likely undergoing digital transformation in its operations."
+                "relevant_info": "Linamar operates multiple production sites and is likely undergoing digital transformation in its operations.",
+                "relevance_score": 90
             }
         }
     ]
@@ -671,15 +693,35 @@ leadsTestData = """
 # Load config once at startup
 config_list = config_list_from_json(env_or_file="OAI_CONFIG_LIST")
 
+# session state backend (STATE_BACKEND=memory|sqlite|redis), use sqlite or redis to run with uvicorn --workers N
+stateStore = get_state_store()
+
 # dictionary to store the final results, key is userId, value is the leads list
-final_results = {}
+final_results = StateMapping(stateStore, "final_results")
+
+# progress and leads of each user's current run, streamed on /results/stream
+leadEvents = LeadEventBroker(stateStore)
 
-# Initialize agent once and store as global
-intakeAgent = IntakeAgent()
+# runs lead generation pipelines, bounded by MAX_CONCURRENT_JOBS / MAX_QUEUED_JOBS
+jobManager = JobManager(state_store=stateStore)
+
+# Initialize agents once and store as global, the intake agent is per user (see IntakeSessionPool)
+intakeSessions = IntakeSessionPool(stateStore)
 companyResearchAgent = CompanyResearchAgent()
 peopleResearchAgent = PeopleResearchAgent()
 leadScoringAgent = LeadScoringAgent()
 
+@app.on_event("startup")
+async def startup():
+    """Start the lead generation job workers"""
+    await jobManager.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Cancel running jobs and close the shared provider HTTP connection pool"""
+    await jobManager.stop()
+    await close_async_clients()
+
 @app.post("/chat")
 async def chat(request: Request):
     """API Endpoint that handles intake data and responds to user queries"""
@@ -688,12 +730,22 @@ async def chat(request: Request):
     user_agent = request.headers.get("user-agent")
 
     # Process the message and get response
-    results = await intakeAgent.process_message(user_query, user_agent)
+    results = await intakeSessions.process_message(user_query, user_agent)
     print("-------------results-------------------")
     print(results)
 
     if results["complete"]:
-        asyncio.create_task(processIntakeData(user_agent))
+        try:
+            job = jobManager.submit(user_agent, lambda: runLeadJob(user_agent))
+            # drop the previous run's events now, a subscriber connecting while the job is queued would replay its "complete"
+            leadEvents.reset(user_agent)
+            results["job_id"] = job.id
+        except JobQueueFullError as e:
+            print(f"-------------lead job rejected: {e}-------------------")
+            results = {
+                "response": "We're generating leads for a lot of people right now, please send your last message again in a few minutes.",
+                "complete": False
+            }
     
     return results
 
@@ -708,9 +760,13 @@ async def newSession(request: Request):
     results = { "response": "Error" }
 
     if (should_start_new_session == "true"):
-        intakeAgent.message_history[user_agent] = []
+        intakeSessions.reset(user_agent)
+        job_id = jobManager.latest_job_id_for_session(user_agent)
+        if job_id is not None:
+            jobManager.cancel(job_id)
         if user_agent in final_results:
             del final_results[user_agent]
+        leadEvents.clear(user_agent)
         results = { "response": "session restarted" }
     else:
         results = { "response": "session not restarted" }
@@ -720,30 +776,164 @@ async def newSession(request: Request):
 
     return results
 
+async def runLeadJob(userId: str):
+    """Job entrypoint, tells stream subscribers when a run fails or is cancelled"""
+    try:
+        await processIntakeData(userId)
+    except asyncio.CancelledError:
+        await leadEvents.publish(userId, "cancelled", {})
+        raise
+    except Exception as e:
+        await leadEvents.publish(userId, "failed", { "error": str(e) })
+        raise
+
 async def processIntakeData(userId: str):
     print("-------------started lead generation-------------------")
-    intakeInfoString = intakeAgent.intake_data[userId]
+    intakeInfoString = intakeSessions.intake_data[userId]
     # 1. get companies
-    # companyListString = await companyResearchAgent.process_message(intakeAgent, intakeInfoString) 
+    # companyListString = await companyResearchAgent.process_message(intakeSessions.get(userId).agent, intakeInfoString) 
     companyListString = companyListWithPeopleTestData # TODO: REPLACE WHEN DONE TESTING
     print("-------------Company List results-------------------")
     print(companyListString)
 
-    # 2. get people 
-    companyListAndPeopleString = await peopleResearchAgent.process_message(companyResearchAgent, intakeInfoString, companyListString)
-    # # companyListAndPeopleString = companyListWithPeopleTestData
-    print("-------------Company List and people results-------------------")
-    print(companyListAndPeopleString)
+    try:
+        company_list = json.loads(companyListString).get("company_list", [])
+    except Exception as e:
+        print(f"-------------Company List parsing error: {e}-------------------")
+        company_list = []
+    await leadEvents.publish(userId, "started", { "company_count": len(company_list) })
+
+    # 2. get people for every company at once, each company's leads are ranked and sent as soon as its people are found
+    with stage_span("pipeline"):
+        results = await asyncio.gather(*(researchCompanyPeople(userId, intakeInfoString, company) for company in company_list))
+        companyListAndPeopleString = json.dumps({ "company_list": [entry for company_entries in results for entry in company_entries] })
+        print("-------------Company List and people results-------------------")
+        print(companyListAndPeopleString)
+
+        # 3. score every company's leads in one pass, so scores are calibrated and the top K get approach text across the whole list
+        await leadEvents.publish(userId, "progress", { "stage": "lead_scoring" })
+        with usage_stage("lead_scoring"), stage_span("lead_scoring"):
+            leadsListString = await leadScoringAgent.process_message(peopleResearchAgent, intakeInfoString, companyListAndPeopleString)
 
-    # 3. score leads
-    leadsListString = await leadScoringAgent.process_message(peopleResearchAgent, intakeInfoString, companyListAndPeopleString)
+    leads_list = json.loads(leadsListString).get("leads_list", [])
+    leads_list.sort(key=lambda lead: lead.get("relevance_score") or 0, reverse=True)
+    # the final list replaces the per-company leads sent while the job ran
+    await leadEvents.publish(userId, "leads", { "leads_list": leads_list, "replace": True })
+
+    leadsListString = json.dumps({ "complete": True, "leads_list": leads_list })
     print("-------------Leads List results-------------------")
     print(leadsListString)
     final_results[userId] = leadsListString
+    await leadEvents.publish(userId, "complete", { "lead_count": len(leads_list) })
     return
 
+async def researchCompanyPeople(userId: str, intakeInfoString: str, company: dict) -> list:
+    """Run people research for a single company, returns its company_list entries with their people_list"""
+    company_info = company.get("company_info", company)
+    company_name = company_info.get("name", "")
+    companyListString = json.dumps({ "company_list": [company] })
+
+    try:
+        await leadEvents.publish(userId, "company_progress", { "company": company_name, "stage": "people_research" })
+        with usage_stage("people_research"), stage_span("people_research"):
+            companyListAndPeopleString = await peopleResearchAgent.process_message(companyResearchAgent, intakeInfoString, companyListString)
+        company_entries = json.loads(companyListAndPeopleString).get("company_list", [])
+    except Exception as e:
+        print(f"-------------Error researching people for {company_name}: {e}-------------------")
+        await leadEvents.publish(userId, "company_failed", { "company": company_name, "error": str(e) })
+        return []
+
+    await leadEvents.publish(userId, "company_progress", { "company": company_name, "stage": "people_found" })
+
+    # rank this company's leads with the deterministic engine (no LLM call) so the first leads show up after one company
+    leads_list = leadScoringAgent.rank_provisional(intakeInfoString, { "company_list": company_entries })
+    if leads_list:
+        await leadEvents.publish(userId, "leads", { "company": company_name, "leads_list": leads_list, "partial": True })
+    return company_entries
+
+
+@app.get("/jobs/{job_id}")
+async def getJob(job_id: str):
+    """API Endpoint that returns the state of a lead generation job, whichever worker runs it"""
+    record = jobManager.get_record(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    record.pop("usage", None)
+    return record
+
+@app.get("/jobs/{job_id}/usage")
+async def getJobUsage(job_id: str):
+    """API Endpoint that returns the tokens, requests and estimated cost of a lead generation job"""
+    job = jobManager.get(job_id)
+    if job is not None:
+        return { "job_id": job.id, "state": job.state, **job.ledger.summary() }
+    # run by another worker, its usage is published when it finishes
+    record = jobManager.get_record(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return { "job_id": job_id, "state": record.get("state"), **record.get("usage", {}) }
+
+@app.get("/usage")
+async def getUsage():
+    """API Endpoint that returns the tokens, requests and estimated cost of everything since startup"""
+    return process_ledger.summary()
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancelJob(job_id: str):
+    """API Endpoint that cancels a queued or running lead generation job"""
+    if not jobManager.cancel(job_id):
+        raise HTTPException(status_code=404, detail="job not found or already finished")
+    record = jobManager.get_record(job_id)
+    record.pop("usage", None)
+    return record
+
+@app.get("/jobs")
+async def getJobStats():
+    """API Endpoint that returns how many jobs are in each state"""
+    return jobManager.stats()
 
+@app.get("/metrics")
+async def getMetrics():
+    """API Endpoint that exposes stage and provider latency metrics in the Prometheus text format"""
+    return PlainTextResponse(metricsRegistry.render(), media_type="text/plain; version=0.0.4")
 
+@app.get("/rate_limits")
+async def getRateLimits():
+    """API Endpoint that returns each provider's rate limiter state (adaptive concurrency window, tokens, 429s)"""
+    return rate_limiter_stats()
+
+@app.get("/single_flight")
+async def getSingleFlightStats():
+    """API Endpoint that returns how many provider calls were saved by joining identical in-flight calls"""
+    return single_flight_stats()
+
+@app.get("/prompts")
+async def getPrompts():
+    """API Endpoint that returns every registered system prompt's size and prefix hash (a changed hash means a cold prompt cache)"""
+    return prompt_registry.stats()
+
+@app.get("/intake_sessions")
+async def getIntakeSessionStats():
+    """API Endpoint that returns how many intake agents are live and their estimated memory"""
+    return intakeSessions.stats()
+
+@app.get("/results/stream")
+async def streamResults(request: Request):
+    """API Endpoint that streams per-company progress and scored leads as server-sent events"""
+    user_agent = request.headers.get("user-agent")
+    # the browser sends back the last id it saw on reconnect, anything unparseable replays from the start
+    try:
+        last_event_id = max(0, int(request.headers.get("last-event-id") or 0))
+    except ValueError:
+        last_event_id = 0
+
+    async def eventStream():
+        async for event in leadEvents.subscribe(user_agent, last_event_id):
+            if await request.is_disconnected():
+                return
+            yield format_sse(event)
+
+    return StreamingResponse(eventStream(), media_type="text/event-stream", headers={ "Cache-Control": "no-cache" })
 
 @app.get("/results")
 async def getResults(request: Request):
@@ -756,4 +946,13 @@ async def getResults(request: Request):
 
     # TODO: remove this when done testing
     # return leadsTestData
-    return "Leads haven't been generated yet"
\ No newline at end of file
+    return "Leads haven't been generated yet"
+
+
+@app.get("/cache_stats")
+async def getCacheStats():
+    """API Endpoint that returns the provider response cache hit/miss counters"""
+    cache = get_response_cache()
+    if cache is None:
+        return { "enabled": False }
+    return { "enabled": True, **cache.stats() }
@@ -0,0 +1,75 @@
+# tests/test_incremental_json.py
+import json
+from agents.incremental_json import IncrementalJSONArrayParser
+
+
+LEADS = [
+    {"name": "Jane Doe", "title": "COO", "notes": "likes {braces} and [brackets]"},
+    {"name": "John \"JR\" Roe", "title": "CFO", "company_info": {"name": "Acme", "tags": ["a", "b"]}},
+    {"name": "Ann Poe", "title": "VP of Operations"},
+]
+REPLY = json.dumps({"intro": "ranked", "leads_list": LEADS, "summary": {"count": 3}})
+
+
+def feed_in_chunks(parser, text, size):
+    emitted = []
+    for start in range(0, len(text), size):
+        emitted.extend(parser.feed(text[start:start + size]))
+    return emitted
+
+
+def test_emits_each_element_across_chunk_boundaries():
+    for size in (1, 3, 7, len(REPLY)):
+        parser = IncrementalJSONArrayParser("leads_list")
+        assert feed_in_chunks(parser, REPLY, size) == LEADS
+        assert parser.complete
+        assert parser.result() == json.loads(REPLY)
+
+
+def test_emits_an_element_as_soon_as_it_closes():
+    parser = IncrementalJSONArrayParser("leads_list")
+    first_end = REPLY.index(json.dumps(LEADS[0])) + len(json.dumps(LEADS[0]))
+
+    assert parser.feed(REPLY[:first_end - 1]) == []
+    assert parser.feed(REPLY[first_end - 1:first_end]) == [LEADS[0]]
+    assert not parser.complete
+
+
+def test_ignores_other_arrays_and_a_key_inside_a_string():
+    reply = '{"note": "the \\"leads_list\\": [{}] key", "other": [{"name": "x"}], "leads_list": [{"name": "y"}]}'
+    parser = IncrementalJSONArrayParser("leads_list")
+
+    assert parser.feed(reply) == [{"name": "y"}]
+
+
+def test_truncated_stream_keeps_every_closed_element():
+    cut = REPLY.index(json.dumps(LEADS[2])) + 10
+    parser = IncrementalJSONArrayParser("leads_list")
+
+    assert feed_in_chunks(parser, REPLY[:cut], 5) == LEADS[:2]
+    assert not parser.complete
+    assert parser.result() == {"complete": False, "leads_list": LEADS[:2]}
+
+
+def test_malformed_element_is_skipped_and_parsing_recovers():
+    reply = '{"leads_list": [{"name": "Jane Doe"}, {"name": "broken",}, {"name": "Ann Poe"}]}'
+    parser = IncrementalJSONArrayParser("leads_list")
+
+    assert feed_in_chunks(parser, reply, 4) == [{"name": "Jane Doe"}, {"name": "Ann Poe"}]
+    assert parser.complete
+    assert parser.result() == {"complete": False, "leads_list": [{"name": "Jane Doe"}, {"name": "Ann Poe"}]}
+
+
+def test_reply_in_a_code_fence():
+    reply = "Here are the leads:\n```json\n" + REPLY + "\n```"
+    parser = IncrementalJSONArrayParser("leads_list")
+
+    assert feed_in_chunks(parser, reply, 11) == LEADS
+    assert parser.result() == json.loads(REPLY)
+
+
+def test_reply_without_the_array():
+    parser = IncrementalJSONArrayParser("leads_list")
+
+    assert parser.feed("I could not find any leads.") == []
+    assert parser.result() == {"complete": False, "leads_list": []}
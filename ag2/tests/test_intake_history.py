@@ -0,0 +1,41 @@
+# tests/test_intake_history.py
+import asyncio
+from agents.intake_history import IntakeHistoryManager, empty_like
+
+
+def turns(count):
+    return [{"role": "user" if index % 2 == 0 else "assistant", "content": f"message {index} " + "word " * 40} for index in range(count)]
+
+
+def test_compact_folds_older_turns_into_facts_without_blocking():
+    calls = []
+
+    async def summarizer(facts, messages):
+        calls.append((facts, len(messages)))
+        # yields to the loop like a real LLM round trip would
+        await asyncio.sleep(0)
+        return '{"facts": "summarized"}'
+
+    manager = IntakeHistoryManager(summarizer, token_budget=100, keep_turns=1)
+    history, facts = asyncio.run(manager.compact(turns(6), ""))
+
+    assert calls == [("", 4)]
+    assert [message["content"].split()[1] for message in history] == ["4", "5"]
+    assert facts == '{"facts": "summarized"}'
+    assert manager.build_messages(history, facts)[0]["content"].endswith(facts)
+
+
+def test_compact_keeps_history_under_budget_or_when_the_summary_fails():
+    async def failing_summarizer(facts, messages):
+        raise ValueError("not intake JSON")
+
+    manager = IntakeHistoryManager(failing_summarizer, token_budget=100, keep_turns=1)
+    history = turns(6)
+
+    assert asyncio.run(manager.compact(history, "old facts")) == (history, "old facts")
+    assert asyncio.run(IntakeHistoryManager(failing_summarizer).compact(turns(2), "")) == (turns(2), "")
+
+
+def test_empty_like_leaves_numbers_null():
+    template = {"name": "x", "features": ["a"], "range": {"min": 20, "max": 2.5}, "complete": True}
+    assert empty_like(template) == {"name": "", "features": [], "range": {"min": None, "max": None}, "complete": ""}
@@ -0,0 +1,52 @@
+# tests/test_job_manager.py
+import asyncio
+from agents.job_manager import CANCELLED, DONE, RUNNING, JobManager
+
+
+def test_stop_cancels_a_running_job_and_returns():
+    async def scenario():
+        manager = JobManager(max_concurrent_jobs=1, max_queued_jobs=1)
+        await manager.start()
+        started = asyncio.Event()
+
+        async def run():
+            started.set()
+            await asyncio.sleep(60)
+
+        job = manager.submit("session", run)
+        await started.wait()
+        assert job.state == RUNNING
+
+        await asyncio.wait_for(manager.stop(), timeout=1)
+        return job, manager
+
+    job, manager = asyncio.run(scenario())
+    assert job.state == CANCELLED
+    assert job.finished_at is not None
+    assert manager.workers == []
+
+
+def test_cancel_stops_one_job_and_the_worker_keeps_going():
+    async def scenario():
+        manager = JobManager(max_concurrent_jobs=1, max_queued_jobs=2)
+        await manager.start()
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(60)
+
+        async def fast():
+            return None
+
+        slow_job = manager.submit("a", slow)
+        fast_job = manager.submit("b", fast)
+        await started.wait()
+        assert manager.cancel(slow_job.id)
+        await asyncio.wait_for(manager.queue.join(), timeout=1)
+        await manager.stop()
+        return slow_job, fast_job
+
+    slow_job, fast_job = asyncio.run(scenario())
+    assert slow_job.state == CANCELLED
+    assert fast_job.state == DONE
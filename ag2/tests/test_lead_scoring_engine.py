@@ -0,0 +1,128 @@
+# tests/test_lead_scoring_engine.py
+import numpy as np
+from agents.lead_scoring_engine import FEATURES, UNKNOWN_REGION_SCORE, build_feature_matrix, calibrate_shard_scores, flatten_leads, rank_leads, region_match
+
+
+INTAKE_INFO = {
+    "ICP": {
+        "target_titles": ["VP of Operations", "Supply Chain Director"],
+        "company_industry": "Automotive manufacturing",
+        "target_regions": ["United States", "Canada"],
+        "additional_notes": "",
+    }
+}
+
+
+def company(name, people, location="Detroit, MI, USA", industry="Automotive parts manufacturing", relevance_score=80):
+    return {
+        "company_info": {
+            "name": name,
+            "location": location,
+            "industry": industry,
+            "relevance_score": relevance_score,
+            "people_list": people,
+        }
+    }
+
+
+def test_rank_leads_puts_matching_titles_first():
+    company_list = {"company_list": [company("Acme", [
+        {"name": "Intern", "title": "Marketing Intern"},
+        {"name": "Ops", "title": "VP, Ops", "email": "ops@acme.com", "source_urls": ["https://acme.com/team"]},
+        {"name": "Supply", "title": "Director of Supply Chain"},
+    ])]}
+
+    leads = rank_leads(company_list, INTAKE_INFO)
+
+    assert [lead["name"] for lead in leads] == ["Ops", "Supply", "Intern"]
+    for lead in leads:
+        assert isinstance(lead["relevance_score"], int)
+        assert 0 <= lead["relevance_score"] <= 100
+        assert lead["company_info"]["name"] == "Acme"
+        assert "people_list" not in lead["company_info"]
+
+
+def test_rank_leads_keeps_company_order_for_ties():
+    person = {"title": "VP of Operations"}
+    company_list = {"company_list": [
+        company("First", [{**person, "name": "A"}]),
+        company("Second", [{**person, "name": "B"}]),
+    ]}
+
+    assert [lead["name"] for lead in rank_leads(company_list, INTAKE_INFO)] == ["A", "B"]
+
+
+def test_rank_leads_with_no_people():
+    assert rank_leads({"company_list": [company("Empty", [])]}, INTAKE_INFO) == []
+    assert rank_leads({}, INTAKE_INFO) == []
+
+
+def test_flatten_leads_unwraps_person_info():
+    leads = flatten_leads({"company_list": [company("Acme", [{"person_info": {"name": "A", "title": "CEO"}}, "not a person"])]})
+
+    assert len(leads) == 1
+    assert leads[0]["name"] == "A"
+    assert leads[0]["company_info"]["name"] == "Acme"
+
+
+def test_feature_matrix_is_bounded():
+    leads = flatten_leads({"company_list": [
+        company("Acme", [{"name": "A", "title": "CEO", "phone": ["555"], "source_urls": ["u"] * 9}], relevance_score="not a number"),
+        company("Elsewhere", [{"name": "B", "title": ""}], location="", industry=None, relevance_score=None),
+    ]})
+
+    matrix = build_feature_matrix(leads, INTAKE_INFO)
+
+    assert matrix.shape == (2, len(FEATURES))
+    assert ((matrix >= 0) & (matrix <= 1)).all()
+    assert build_feature_matrix([], INTAKE_INFO).shape == (0, len(FEATURES))
+
+
+def test_region_match_uses_whole_words_and_state_codes():
+    locations = ["Houston, TX", "Sydney, Australia", "Detroit, MI", "Guelph, ON, Canada", "Austin, Texas, U.S.A.", "Born on the bayou", ""]
+
+    assert region_match(locations, ["US"]).tolist() == [1, 0, 1, 0, 1, 0, UNKNOWN_REGION_SCORE]
+    assert region_match(locations, ["United States"]).tolist() == [1, 0, 1, 0, 1, 0, UNKNOWN_REGION_SCORE]
+    assert region_match(locations, ["Canada"]).tolist() == [0, 0, 0, 1, 0, 0, UNKNOWN_REGION_SCORE]
+    assert region_match(["Paris, France", "Frankfurt, Germany"], ["France"]).tolist() == [1, 0]
+    assert region_match(locations, []).tolist() == [UNKNOWN_REGION_SCORE] * len(locations)
+
+
+def test_calibration_evens_out_harsh_and_generous_shards():
+    # the same two people graded generously in one shard and harshly in the other, equal anchors
+    generous, harsh = np.array([90.0, 80.0]), np.array([40.0, 30.0])
+    anchors = [np.array([50.0, 50.0]), np.array([50.0, 50.0])]
+
+    calibrated = calibrate_shard_scores([generous, harsh], anchors)
+
+    assert calibrated[0].tolist() == [65.0, 55.0]
+    assert calibrated[1].tolist() == [65.0, 55.0]
+
+
+def test_calibration_shifts_shards_by_their_anchor():
+    scores = [np.array([60.0, 50.0]), np.array([60.0, 50.0])]
+    anchors = [np.array([70.0, 70.0]), np.array([30.0, 30.0])]
+
+    calibrated = calibrate_shard_scores(scores, anchors)
+
+    # the spread within a shard is kept, the better anchored shard ranks above the other
+    assert calibrated[0].tolist() == [80.0, 70.0]
+    assert calibrated[1].tolist() == [40.0, 30.0]
+
+
+def test_calibration_clips_and_skips_empty_shards():
+    calibrated = calibrate_shard_scores(
+        [np.array([100.0, 0.0]), np.zeros(0), np.array([100.0])],
+        [np.array([0.0, 0.0]), np.zeros(0), np.array([100.0])],
+    )
+
+    assert len(calibrated[1]) == 0
+    for scores in calibrated:
+        assert ((scores >= 0) & (scores <= 100)).all()
+    assert calibrated[2][0] == 100.0
+
+
+def test_calibration_of_a_single_shard_is_a_no_op():
+    scores = np.array([83.0, 41.0, 12.0])
+    assert calibrate_shard_scores([scores], [np.array([10.0, 20.0, 30.0])])[0].tolist() == scores.tolist()
+    assert calibrate_shard_scores([np.zeros(0)], [np.zeros(0)])[0].tolist() == []
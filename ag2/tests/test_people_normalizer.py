@@ -0,0 +1,72 @@
+# tests/test_people_normalizer.py
+import json
+from agents.people_normalizer import PERSON_FIELDS, normalize_people_results
+
+
+def people_of(result, index=0):
+    return result["company_list"][index]["company_info"]["people_list"]
+
+
+def test_drops_people_without_a_real_name():
+    result = normalize_people_results({"company_list": [{"company_info": {"name": "Acme", "people_list": [
+        {"name": "", "title": "CEO"},
+        {"name": "Plant Manager", "title": "plant manager"},
+        {"name": "Jane Doe", "title": "COO"},
+    ]}}]})
+
+    assert [person["name"] for person in people_of(result)] == ["Jane Doe"]
+
+
+def test_fills_every_field_and_leaves_a_missing_score_as_none():
+    person = people_of(normalize_people_results({"company_list": [{"company_info": {"name": "Acme", "people_list": [
+        {"name": "Jane Doe", "title": "COO", "relevance_score": ""},
+        {"name": "John Roe", "title": "CFO", "linkedin_url": "https://linkedin.com/in/john", "sources": "https://acme.com"},
+    ]}}]}))
+
+    for record in person:
+        assert set(PERSON_FIELDS) <= set(record)
+        assert record["relevance_score"] is None
+    assert person[1]["linkedin"] == "https://linkedin.com/in/john"
+    assert person[1]["source_urls"] == ["https://acme.com"]
+
+
+def test_merges_the_same_person_at_the_same_company():
+    result = normalize_people_results({"company_list": [
+        {"company_info": {"name": "Acme Inc.", "website": "https://www.acme.com", "people_list": [
+            {"name": "Jane Doe", "title": "COO", "email": "", "relevance_score": 60, "source_urls": ["a"]},
+        ]}},
+        {"company_info": {"name": "Acme", "website": "acme.com", "people_list": [
+            {"name": "jane  doe", "title": "COO", "email": "jane@acme.com", "relevance_score": 80, "source_urls": ["a", "b"]},
+        ]}},
+    ]})
+
+    assert len(result["company_list"]) == 1
+    (jane,) = people_of(result)
+    assert jane["email"] == "jane@acme.com"
+    assert jane["relevance_score"] == 80
+    assert jane["source_urls"] == ["a", "b"]
+
+
+def test_folds_enrichment_replies_into_the_person():
+    email_reply = "Here is what I found:\n```json\n" + json.dumps({"email": "jane@acme.com", "source_urls": ["https://acme.com/team"]}) + "\n```"
+    result = normalize_people_results({"company_list": [{"company_info": {"name": "Acme", "people_list": [
+        {
+            "person_info": {"name": "Jane Doe", "title": "COO", "email": "guess@acme.com"},
+            "email_info": email_reply,
+            "phone_info": "no phone number could be found",
+        },
+    ]}}]})
+
+    (jane,) = people_of(result)
+    # the dedicated lookup wins for its own field
+    assert jane["email"] == "jane@acme.com"
+    assert jane["phone"] == ""
+    assert jane["source_urls"] == ["https://acme.com/team"]
+
+
+def test_reads_a_raw_people_finder_reply():
+    raw = json.dumps({"people_list": [{"name": "Jane Doe", "title": "COO"}]})
+    result = normalize_people_results({"company_list": [{"company_info": {"name": "Acme"}, "people_list": raw}]})
+
+    assert [person["name"] for person in people_of(result)] == ["Jane Doe"]
+    assert normalize_people_results("not json") == {"company_list": []}
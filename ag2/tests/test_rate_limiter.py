@@ -0,0 +1,40 @@
+# tests/test_rate_limiter.py
+import asyncio
+from agents import rate_limiter
+from agents.rate_limiter import AdaptiveRateLimiter, RATE_LIMITED_DECREASE, get_rate_limiter, reset_rate_limiters
+
+
+def test_reset_forgets_a_429_and_its_retry_after():
+    limiter = AdaptiveRateLimiter("perplexity", requests_per_minute=60, max_concurrency=4, latency_target=30)
+
+    async def rate_limited_call():
+        async with limiter.slot() as permit:
+            permit.rate_limited(retry_after=10)
+
+    asyncio.run(rate_limited_call())
+    stats = limiter.stats()
+    assert stats["concurrency_limit"] == 4 * RATE_LIMITED_DECREASE
+    assert stats["blocked_for"] > 0 and stats["rate_limited"] == 1
+
+    limiter.reset()
+    stats = limiter.stats()
+    assert stats["concurrency_limit"] == 4
+    assert stats["tokens"] == 4
+    assert stats["blocked_for"] == 0 and stats["rate_limited"] == 0
+
+
+def test_reset_rate_limiters_resets_the_shared_limiters():
+    limiter = get_rate_limiter("apollo")
+    if limiter is None:
+        return  # RATE_LIMITING_ENABLED=false
+    limiter.decrease(limiter.last_decrease + 10, RATE_LIMITED_DECREASE)
+    assert limiter.stats()["concurrency_limit"] < limiter.max_concurrency
+
+    reset_rate_limiters()
+    assert limiter.stats()["concurrency_limit"] == limiter.max_concurrency
+
+
+def test_each_worker_takes_its_share_of_a_limit(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "WEB_CONCURRENCY", 4)
+
+    assert rate_limiter.worker_share(100) == 25
@@ -0,0 +1,50 @@
+# tests/test_response_cache.py
+import itertools
+from types import SimpleNamespace
+import agents.response_cache as response_cache
+from agents.response_cache import ResponseCache, make_cache_key
+
+
+def test_make_cache_key_ignores_dict_order():
+    assert make_cache_key(model="sonar", request={"a": 1, "b": 2}) == make_cache_key(request={"b": 2, "a": 1}, model="sonar")
+    assert make_cache_key(model="sonar") != make_cache_key(model="sonar-pro")
+
+
+def test_hits_do_not_write(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("a", "answer")
+    assert cache.connection.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    writes = cache.connection.total_changes
+    for _ in range(5):
+        assert cache.get("a") == "answer"
+    assert cache.get("missing") is None
+    assert cache.connection.total_changes == writes
+    assert cache.stats()["hits"] == {"default": 5}
+
+
+def test_eviction_sees_hits_that_are_not_written_yet(tmp_path, monkeypatch):
+    # one second per call, so no two writes share a last_accessed
+    clock = itertools.count(1000)
+    monkeypatch.setattr(response_cache, "time", SimpleNamespace(time=lambda: float(next(clock))))
+    monkeypatch.setattr(response_cache, "LRU_TOUCH_INTERVAL", 0)
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.set("old", "1")
+    cache.set("new", "2")
+
+    # "old" is hit after "new" was stored, so "new" is now the least recently used
+    assert cache.get("old") == "1"
+    assert cache.pending_touches
+    cache.set("newest", "3")
+
+    assert cache.get("old") == "1"
+    assert cache.get("new") is None
+    assert cache.get("newest") == "3"
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttls={"default": 0})
+    cache.set("a", "answer")
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
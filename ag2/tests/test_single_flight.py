@@ -0,0 +1,65 @@
+# tests/test_single_flight.py
+import asyncio
+from agents.single_flight import SingleFlight
+
+
+def test_identical_calls_share_one_call():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def scenario():
+        group = SingleFlight("test", enabled=True)
+        return await asyncio.gather(group.do("key", call), group.do("key", call))
+
+    results = asyncio.run(scenario())
+    assert results == [("answer", False), ("answer", True)]
+    assert len(calls) == 1
+
+
+def test_cancelled_caller_leaves_the_call_running_for_the_others():
+    async def scenario():
+        group = SingleFlight("test", enabled=True)
+        release = asyncio.Event()
+
+        async def call():
+            await release.wait()
+            return "answer"
+
+        first = asyncio.ensure_future(group.do("key", call))
+        second = asyncio.ensure_future(group.do("key", call))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await second
+
+    assert asyncio.run(scenario()) == ("answer", True)
+
+
+def test_last_waiter_cancelled_cancels_the_call():
+    async def scenario():
+        group = SingleFlight("test", enabled=True)
+        started, cancelled = asyncio.Event(), asyncio.Event()
+
+        async def call():
+            started.set()
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiters = [asyncio.ensure_future(group.do("key", call)) for _ in range(2)]
+        await started.wait()
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        return group.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["in_flight"] == 0
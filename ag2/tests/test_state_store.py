@@ -0,0 +1,87 @@
+# tests/test_state_store.py
+import pytest
+from agents.state_store import InMemoryStateStore, SQLiteStateStore, StateMapping, StateStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        store = SQLiteStateStore(str(tmp_path / "state.sqlite3"), ttl_seconds=60)
+        yield store
+        store.connection.close()
+    else:
+        yield InMemoryStateStore(ttl_seconds=60)
+
+
+def test_state_store_is_abstract():
+    with pytest.raises(TypeError):
+        StateStore()
+
+
+def test_get_set_delete_keys(store):
+    assert store.get("jobs", "a") is None
+    assert store.get("jobs", "a", "missing") == "missing"
+
+    store.set("jobs", "a", {"status": "running", "leads": [1, 2]})
+    store.set("jobs", "b", [])
+    store.set("results", "a", "other namespace")
+
+    assert store.get("jobs", "a") == {"status": "running", "leads": [1, 2]}
+    assert store.get("jobs", "b") == []
+    assert sorted(store.keys("jobs")) == ["a", "b"]
+
+    store.delete("jobs", "a")
+    store.delete("jobs", "never set")
+    assert store.get("jobs", "a") is None
+    assert store.keys("jobs") == ["b"]
+    assert store.get("results", "a") == "other namespace"
+
+
+def test_expired_values_are_hidden_and_purged(store):
+    store.set("jobs", "old", 1, ttl_seconds=0)
+    store.set("jobs", "new", 2)
+
+    assert store.get("jobs", "old") is None
+    assert store.keys("jobs") == ["new"]
+    assert store.purge_expired() == 1
+    assert store.purge_expired() == 0
+    assert store.get("jobs", "new") == 2
+
+
+def test_state_mapping(store):
+    jobs = StateMapping(store, "jobs")
+    events = StateMapping(store, "events", ttl_seconds=0)
+
+    jobs["a"] = {"status": "queued"}
+    assert "a" in jobs and jobs["a"] == {"status": "queued"}
+    assert jobs.get("b") is None
+    assert list(jobs) == ["a"] and len(jobs) == 1
+
+    # mutate then assign back
+    job = jobs["a"]
+    job["status"] = "done"
+    jobs["a"] = job
+    assert jobs["a"]["status"] == "done"
+
+    del jobs["a"]
+    assert "a" not in jobs
+    with pytest.raises(KeyError):
+        del jobs["a"]
+    with pytest.raises(KeyError):
+        jobs["a"]
+
+    # the mapping's own TTL overrides the store's
+    events["a"] = [{"event": "complete"}]
+    assert "a" not in events
+    assert events.pop("a", None) is None
+
+
+def test_sqlite_state_survives_reopening(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    first = SQLiteStateStore(path)
+    first.set("results", "a", {"leads": ["x"]})
+    first.connection.close()
+
+    second = SQLiteStateStore(path)
+    assert second.get("results", "a") == {"leads": ["x"]}
+    second.connection.close()
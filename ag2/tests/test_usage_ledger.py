@@ -0,0 +1,43 @@
+# tests/test_usage_ledger.py
+import asyncio, threading
+from types import SimpleNamespace
+from agents.usage_ledger import UsageLedger, current_ledger, track_agent_usage, usage_stage
+
+
+class FakeClient():
+    """Answers create() with a response using `tokens` prompt tokens, every caller is held until all of them are in."""
+
+    def __init__(self, callers: int):
+        self.barrier = threading.Barrier(callers)
+        self.actual_usage_summary = {}
+
+    def create(self, **config):
+        self.barrier.wait(timeout=5)
+        tokens = config["tokens"]
+        return SimpleNamespace(model="gpt-4o-mini", cost=0, usage=SimpleNamespace(prompt_tokens=tokens, completion_tokens=1))
+
+
+def test_overlapping_calls_on_a_shared_agent_are_each_charged_once():
+    agent = track_agent_usage(SimpleNamespace(client=FakeClient(callers=2)))
+    # installing twice doesn't wrap twice
+    assert track_agent_usage(agent).client.client.__class__ is FakeClient
+
+    async def job(tokens: int) -> UsageLedger:
+        ledger = UsageLedger()
+        current_ledger.set(ledger)
+        with usage_stage("lead_scoring"):
+            await asyncio.to_thread(agent.client.create, tokens=tokens)
+        return ledger
+
+    async def run():
+        return await asyncio.gather(job(100), job(7))
+
+    first, second = asyncio.run(run())
+
+    assert first.summary()["total_tokens"] == 101
+    assert second.summary()["total_tokens"] == 8
+    assert list(first.summary()["by_stage"]) == ["lead_scoring"]
+    # autogen didn't price it, so it is estimated from PRICES
+    assert first.summary()["total_cost"] > 0
+    # everything else is the wrapped client's
+    assert agent.client.actual_usage_summary == {}
@@ -60,4 +60,60 @@ export default class AG2Client {
         }
       };
 
+    AG2_StreamResults = (
+        onLeads: (leadsList: any[], replace: boolean) => void,
+        onComplete: () => void,
+        onError: (message: string) => void,
+      ): EventSource => {
+        console.log("AG2_StreamResults");
+
+        const source = new EventSource(BASE_URL + "/results/stream");
+
+        source.addEventListener("company_progress", (event) => {
+          console.log("company_progress: ", (event as MessageEvent).data);
+        });
+
+        // one company's people research failed, the other companies' leads still arrive
+        source.addEventListener("company_failed", (event) => {
+          console.log("company_failed: ", (event as MessageEvent).data);
+        });
+
+        source.addEventListener("leads", (event) => {
+          const data = JSON.parse((event as MessageEvent).data);
+          console.log("leads for: ", data.company ?? "every company");
+          // the final scored list replaces the per-company leads sent before it
+          onLeads(data.leads_list, data.replace === true);
+        });
+
+        source.addEventListener("complete", () => {
+          console.log("lead generation complete");
+          source.close();
+          onComplete();
+        });
+
+        // the run ended without leads, close the stream so EventSource doesn't reconnect to it
+        source.addEventListener("failed", (event) => {
+          const data = JSON.parse((event as MessageEvent).data);
+          console.log("lead generation failed: ", data.error);
+          source.close();
+          onError("Lead generation failed: " + data.error);
+        });
+
+        source.addEventListener("cancelled", () => {
+          console.log("lead generation cancelled");
+          source.close();
+          onError("Lead generation was cancelled.");
+        });
+
+        source.onerror = (error) => {
+          console.log(error);
+          // EventSource retries on its own unless the server refused the stream
+          if (source.readyState === EventSource.CLOSED) {
+            onError("Lost the connection to the server while generating leads.");
+          }
+        };
+
+        return source;
+      };
+
 }
@@ -19,34 +19,38 @@ const ag2 = new AG2Client();
 export default function App() {
   const [tableData, setTableData] = useState<LeadInfo[]>([]);
   const [isLoadingLeads, setIsLoadingLeads] = useState(false);
+  const [leadsError, setLeadsError] = useState<string | null>(null);
 
   const bottomRef = useRef<HTMLDivElement>(null);
+  const leadsSourceRef = useRef<EventSource | null>(null);
 
   const handleGetLeads = async () => {
     console.log("handleGetLeads");
     setIsLoadingLeads(true);
-    try {
-      const leads: string = await ag2.AG2_GetResults();
+    setLeadsError(null);
+    setTableData([]);
 
-      if (leads === "couldn't get results" || leads === "Leads haven't been generated yet") {
-        console.log("Leads not ready");
-        return;
-      }
+    // a stream left open by an earlier click would append its leads to this one's
+    leadsSourceRef.current?.close();
 
-      const leadsList = JSON.parse(leads);
-
-      console.log("leadsListLength: ", leadsList.leads_list.length);
-      console.log(leadsList.leads_list[0]);
-      console.log(leadsList.leads_list[0].lead_info);
-      console.log(Object.keys(leadsList.leads_list[0]));
-
-      setTableData(leadsList.leads_list);
-    } catch (error) {
-      console.error("Error getting leads: ", error);
-    } finally {
-      setIsLoadingLeads(false);
-      scrollToBottom();
-    }
+    // each company's leads arrive as soon as it's researched, then the final scored list replaces them,
+    // keep the table sorted by score as they come in
+    leadsSourceRef.current = ag2.AG2_StreamResults(
+      (leadsList: LeadInfo[], replace: boolean) => {
+        setTableData((previous) =>
+          [...(replace ? [] : previous), ...leadsList].sort((a, b) => (b.relevance_score ?? 0) - (a.relevance_score ?? 0))
+        );
+        scrollToBottom();
+      },
+      () => {
+        setIsLoadingLeads(false);
+        scrollToBottom();
+      },
+      (message: string) => {
+        setIsLoadingLeads(false);
+        setLeadsError(message);
+      },
+    );
   };
 
   const scrollToBottom = () => {
@@ -104,6 +108,8 @@ export default function App() {
             </Button>
         </Box>}
 
+        {leadsError && <Text fontSize="lg" color="red.500">{leadsError}</Text>}
+
         <Box w="full">
           {tableData.length > 0 && <DataTable data={tableData} />}
         </Box>